@@ -0,0 +1,155 @@
+"""
+Sparse Pincode x Date Activity Matrix
+=====================================
+Holds each cleaned dataset as a scipy CSR matrix with one row per pincode
+and one column per calendar day (the daily totals of its age columns;
+days without rows are implicit zeros). Most pincodes report on only a
+fraction of the days, so the matrix stores little more than the rows do.
+
+The sustained-activity detector works on the CSR arrays directly:
+- baseline: median of the pincode's active days (sorted within each row)
+- elevated day: total >= ELEVATION_FACTOR x baseline and >= MIN_DAY_COUNT
+- run: MIN_RUN_DAYS or more consecutive elevated calendar days
+
+Run boundaries come from one diff over the elevated entries' (row, column)
+pairs, so every pincode is scanned in a few vectorized passes.
+
+Output: cleaned_data/sustained_activity_runs.csv
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+DATASET_COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+ELEVATION_FACTOR = 3.0   # day total vs the pincode's median active day
+MIN_DAY_COUNT = 10       # ignore "elevated" days with tiny absolute counts
+MIN_RUN_DAYS = 3         # consecutive elevated days that make a run
+
+
+class ActivityMatrix:
+    """Daily activity of one dataset as a CSR pincode x day matrix."""
+
+    def __init__(self, matrix, pincodes, start):
+        self.matrix = matrix
+        self.pincodes = pincodes
+        self.start = start
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.start, periods=self.matrix.shape[1], freq='D')
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns) -> 'ActivityMatrix':
+        from scipy import sparse
+
+        dates = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
+        keep = dates.notna().to_numpy()
+        rows, pincodes = pd.factorize(df['pincode'].to_numpy()[keep], sort=True)
+        start = dates[keep].min()
+        days = (dates[keep] - start).dt.days.to_numpy()
+        totals = df[columns].to_numpy()[keep].sum(axis=1)
+        if not len(totals):
+            totals = totals.astype(float)  # an empty slice from the store has object columns
+
+        n_days = int(days.max()) + 1 if len(days) else 0
+        matrix = sparse.coo_matrix((totals, (rows, days)),
+                                   shape=(len(pincodes), n_days)).tocsr()  # sums duplicates
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+        return cls(matrix, pincodes, start)
+
+    def row_of_entries(self) -> np.ndarray:
+        """Row index of every stored entry."""
+        return np.repeat(np.arange(self.matrix.shape[0]), np.diff(self.matrix.indptr))
+
+    def baselines(self) -> np.ndarray:
+        """Median activity of each pincode over its active days."""
+        m = self.matrix
+        active = np.diff(m.indptr)
+        if not m.nnz:
+            return np.zeros(m.shape[0])
+        values = m.data[np.lexsort((m.data, self.row_of_entries()))].astype(float)
+        lower = np.minimum(m.indptr[:-1] + np.maximum(active - 1, 0) // 2, m.nnz - 1)
+        upper = np.minimum(m.indptr[:-1] + active // 2, m.nnz - 1)
+        return np.where(active > 0, (values[lower] + values[upper]) / 2, 0.0)
+
+
+def find_sustained_runs(activity: ActivityMatrix, factor=ELEVATION_FACTOR,
+                        min_count=MIN_DAY_COUNT, min_days=MIN_RUN_DAYS) -> pd.DataFrame:
+    """
+    Runs of at least ``min_days`` consecutive days on which a pincode's
+    activity is ``factor`` times its median active day (and >= ``min_count``).
+    """
+    m = activity.matrix
+    rows = activity.row_of_entries()
+    baseline = activity.baselines()
+    ratio = m.data / np.maximum(baseline[rows], 1e-9)
+    elevated = (ratio >= factor) & (m.data >= min_count)
+
+    rows, cols = rows[elevated], m.indices[elevated]
+    values, ratio = m.data[elevated], ratio[elevated]
+    columns = ['pincode', 'start_date', 'end_date', 'days', 'activity',
+               'baseline', 'peak_ratio']
+    if not len(rows):
+        return pd.DataFrame(columns=columns)
+
+    # A run starts wherever the row changes or a calendar day is skipped
+    run = np.cumsum(np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1] + 1)]) - 1
+    long = np.bincount(run)[run] >= min_days
+    if not long.any():
+        return pd.DataFrame(columns=columns)
+    _, run = np.unique(run[long], return_inverse=True)
+    rows, cols, values, ratio = rows[long], cols[long], values[long], ratio[long]
+    lengths = np.bincount(run)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    first_day = activity.start + pd.to_timedelta(cols[starts], unit='D')
+
+    runs = pd.DataFrame({
+        'pincode': activity.pincodes[rows[starts]],
+        'start_date': first_day.strftime('%Y-%m-%d'),
+        'end_date': (first_day + pd.to_timedelta(lengths - 1, unit='D')).strftime('%Y-%m-%d'),
+        'days': lengths,
+        'activity': np.bincount(run, weights=values).astype(np.int64),
+        'baseline': baseline[rows[starts]].round(1),
+        'peak_ratio': np.maximum.reduceat(ratio, starts).round(2),
+    })
+    return runs.sort_values(['days', 'activity'], ascending=False).reset_index(drop=True)
+
+
+@traced()
+def detect_sustained_activity(enrolment_df, demographic_df, biometric_df, **thresholds) -> pd.DataFrame:
+    """Sustained-activity runs in every dataset, labelled by dataset."""
+    found = []
+    for name, df in zip(DATASET_COLUMNS, (enrolment_df, demographic_df, biometric_df)):
+        runs = find_sustained_runs(ActivityMatrix.from_frame(df, DATASET_COLUMNS[name]),
+                                   **thresholds)
+        found.append(runs.assign(dataset=name))
+    runs = pd.concat(found, ignore_index=True)
+    return runs[['dataset'] + [c for c in runs.columns if c != 'dataset']]
+
+
+def main():
+    from anomaly_detection import load_cleaned_data
+
+    enrolment_df, demographic_df, biometric_df = load_cleaned_data()
+    for name, df in zip(DATASET_COLUMNS, (enrolment_df, demographic_df, biometric_df)):
+        t0 = time.perf_counter()
+        activity = ActivityMatrix.from_frame(df, DATASET_COLUMNS[name])
+        t1 = time.perf_counter()
+        runs = find_sustained_runs(activity)
+        t2 = time.perf_counter()
+        print(f"{name:12} {activity.matrix.shape[0]:>7,} pincodes x {activity.matrix.shape[1]} days, "
+              f"{activity.matrix.nnz:,} entries: built {t1 - t0:.2f}s, scanned {t2 - t1:.3f}s, "
+              f"{len(runs)} runs")
+
+
+if __name__ == "__main__":
+    main()
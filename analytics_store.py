@@ -0,0 +1,212 @@
+"""
+Indexed Embedded Store for the Cleaned Datasets
+================================================
+Optional SQLite copy of the ``data_cleaning_sync`` output so that selective
+lookups ("all activity for pincode 465113", "district X in October") hit an
+index instead of re-reading every cleaned CSV.
+
+Each dataset is a table with the cleaned columns. Dates are stored as ISO
+``YYYY-MM-DD`` text so range filters use the index, and are returned in the
+original ``DD-MM-YYYY`` form so existing consumers need no changes.
+
+Indexes per table:
+    (pincode, date), (state, district, date), (date)
+
+Usage:
+    python analytics_store.py build
+    python analytics_store.py query biometric --pincode 465113
+    python analytics_store.py query enrolment --state Bihar --district Patna \\
+        --start 2025-10-01 --end 2025-10-31
+"""
+
+import argparse
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "cleaned_data"
+STORE_PATH = DATA_DIR / "uidai_store.sqlite"
+
+DATASETS = {
+    'enrolment': 'enrolment_cleaned.csv',
+    'demographic': 'demographic_cleaned.csv',
+    'biometric': 'biometric_cleaned.csv',
+}
+
+INDEXES = {
+    'pincode_date': ('pincode', 'date'),
+    'state_district_date': ('state', 'district', 'date'),
+    'date': ('date',),
+}
+
+
+def _to_iso(dates: pd.Series) -> pd.Series:
+    """DD-MM-YYYY -> YYYY-MM-DD without per-row parsing."""
+    dates = dates.astype(str).str.strip()
+    return dates.str[6:10] + '-' + dates.str[3:5] + '-' + dates.str[0:2]
+
+
+def _create_table(conn, name, df):
+    columns = []
+    for col in df.columns:
+        if col in ('state', 'district'):
+            columns.append(f'"{col}" TEXT COLLATE NOCASE')
+        elif col == 'date':
+            columns.append('"date" TEXT')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            columns.append(f'"{col}" INTEGER')
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            columns.append(f'"{col}" REAL')
+        else:
+            columns.append(f'"{col}" TEXT')
+    conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+    conn.execute(f'CREATE TABLE "{name}" ({", ".join(columns)})')
+
+
+def build_store(enrolment_df, demographic_df, biometric_df, db_path: Path = STORE_PATH):
+    """
+    (Re)build the store from cleaned DataFrames.
+
+    The database is written to a temporary file and moved into place so
+    readers never see a half-built store.
+    """
+    tmp_path = db_path.with_suffix('.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        for name, df in (('enrolment', enrolment_df), ('demographic', demographic_df),
+                         ('biometric', biometric_df)):
+            df = df.copy()
+            df['date'] = _to_iso(df['date'])
+            df['pincode'] = pd.to_numeric(df['pincode'], errors='coerce').astype('Int64')
+            _create_table(conn, name, df)
+            placeholders = ', '.join('?' * len(df.columns))
+            conn.executemany(
+                f'INSERT INTO "{name}" VALUES ({placeholders})',
+                df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
+            )
+            for index_name, cols in INDEXES.items():
+                col_list = ', '.join(f'"{c}"' for c in cols)
+                conn.execute(f'CREATE INDEX "idx_{name}_{index_name}" ON "{name}" ({col_list})')
+            print(f"  Stored {name}: {len(df):,} rows")
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+    tmp_path.replace(db_path)
+    print(f"  Saved: {db_path}")
+    return db_path
+
+
+def build_store_from_csv(data_dir: Path = DATA_DIR, db_path: Path = STORE_PATH):
+    """Build the store from the cleaned CSVs on disk."""
+    frames = [pd.read_csv(data_dir / DATASETS[name]) for name in ('enrolment', 'demographic', 'biometric')]
+    return build_store(*frames, db_path=db_path)
+
+
+def query(dataset, pincode=None, state=None, district=None, start=None, end=None,
+          columns=None, db_path: Path = STORE_PATH) -> pd.DataFrame:
+    """
+    Fetch rows of one cleaned dataset through the store's indexes.
+
+    ``state``/``district`` match case-insensitively; ``start``/``end`` are
+    inclusive and accept anything ``pd.Timestamp`` parses. Rows come back
+    with the cleaned CSV's columns and ``DD-MM-YYYY`` dates.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'. Choose from {list(DATASETS)}")
+    if not Path(db_path).exists():
+        raise FileNotFoundError(f"No store at {db_path}. Run: python analytics_store.py build")
+
+    clauses, params = [], []
+    if pincode is not None:
+        clauses.append('pincode = ?')
+        params.append(int(pincode))
+    if state is not None:
+        clauses.append('state = ?')
+        params.append(state.strip())
+    if district is not None:
+        clauses.append('district = ?')
+        params.append(district.strip())
+    if start is not None:
+        clauses.append('date >= ?')
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append('date <= ?')
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        table_cols = [row[1] for row in conn.execute(f'PRAGMA table_info("{dataset}")')]
+        wanted = columns or table_cols
+        select = ', '.join(
+            "substr(date, 9, 2) || '-' || substr(date, 6, 2) || '-' || substr(date, 1, 4) AS date"
+            if c == 'date' else f'"{c}"'
+            for c in wanted
+        )
+        sql = f'SELECT {select} FROM "{dataset}"'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def load_datasets(db_path: Path = STORE_PATH, **filters):
+    """Return (enrolment, demographic, biometric) filtered through the store."""
+    return tuple(query(name, db_path=db_path, **filters)
+                 for name in ('enrolment', 'demographic', 'biometric'))
+
+
+def slice_dir(base: Path, **filters) -> Path:
+    """
+    Output folder for a run over a filtered slice, e.g.
+    ``base/slices/state-bihar_start-2025-10-01``, so slice outputs never
+    replace the full-dataset files in ``base``. No filters returns ``base``.
+    """
+    parts = [f"{name}-{value}" for name, value in filters.items() if value is not None]
+    if not parts:
+        return base
+    return base / "slices" / re.sub(r'[^a-z0-9_-]+', '-', '_'.join(parts).lower()).strip('-')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexed SQLite store for the cleaned datasets")
+    parser.add_argument('--db', type=Path, default=STORE_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('build', help="Build the store from cleaned_data/*.csv")
+
+    p_query = sub.add_parser('query', help="Run a selective query")
+    p_query.add_argument('dataset', choices=list(DATASETS))
+    p_query.add_argument('--pincode', type=int)
+    p_query.add_argument('--state')
+    p_query.add_argument('--district')
+    p_query.add_argument('--start')
+    p_query.add_argument('--end')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        print("Building analytics store...")
+        build_store_from_csv(db_path=args.db)
+    else:
+        t0 = time.perf_counter()
+        rows = query(args.dataset, args.pincode, args.state, args.district,
+                     args.start, args.end, db_path=args.db)
+        elapsed = (time.perf_counter() - t0) * 1000
+        print(rows.to_string(index=False, max_rows=50))
+        print(f"\n{len(rows):,} rows in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,15 @@ Analyzes cleaned datasets to identify:
 1. High enrolment + low biometric updates (misuse detection)
 2. High adult demographics + low child enrolment (data imbalance)
 3. Sudden spikes across all datasets (mass registration events)
+4. Pincodes running hot for several consecutive days (sustained activity)
 """
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-from scipy import stats
 import warnings
+
+from instrumentation import traced
 warnings.filterwarnings('ignore')
 
 # Configuration
@@ -21,17 +21,38 @@ BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "cleaned_data"
 OUTPUT_DIR = DATA_DIR  # Save outputs in same directory
 
-# Set plot style
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("husl")
+SPIKE_THRESHOLD = 2.0  # |z-score| of daily activity marking a spike
+
+
+def init_plot_style():
+    """Import the plotting libraries on demand and apply the shared style."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    plt.style.use('seaborn-v0_8-whitegrid')
+    sns.set_palette("husl")
+    return plt
+
 
+@traced()
+def load_cleaned_data(data_dir: Path = DATA_DIR, store_path=None, **filters):
+    """
+    Load all cleaned datasets.
 
-def load_cleaned_data():
-    """Load all cleaned datasets."""
-    print("Loading cleaned datasets...")
-    enrolment_df = pd.read_csv(DATA_DIR / "enrolment_cleaned.csv")
-    demographic_df = pd.read_csv(DATA_DIR / "demographic_cleaned.csv")
-    biometric_df = pd.read_csv(DATA_DIR / "biometric_cleaned.csv")
+    When ``store_path`` or any filter (pincode, state, district, start, end)
+    is given, rows are fetched through the indexed analytics store instead
+    of scanning the CSVs.
+    """
+    if store_path is not None or filters:
+        import analytics_store
+        print("Loading cleaned datasets from analytics store...")
+        enrolment_df, demographic_df, biometric_df = analytics_store.load_datasets(
+            store_path or analytics_store.STORE_PATH, **filters)
+    else:
+        print("Loading cleaned datasets...")
+        enrolment_df = pd.read_csv(data_dir / "enrolment_cleaned.csv")
+        demographic_df = pd.read_csv(data_dir / "demographic_cleaned.csv")
+        biometric_df = pd.read_csv(data_dir / "biometric_cleaned.csv")
     
     print(f"  Enrolment:   {enrolment_df.shape[0]:,} rows")
     print(f"  Demographic: {demographic_df.shape[0]:,} rows")
@@ -44,15 +65,8 @@ def load_cleaned_data():
 # PATTERN 1: High Enrolment + Low Biometric Updates (Misuse Detection)
 # =============================================================================
 
-def analyze_misuse_pattern(enrolment_df, biometric_df):
-    """
-    Detect pincodes with high enrolment but low biometric update rates.
-    This may indicate potential misuse or fraud.
-    """
-    print("\n" + "="*70)
-    print("PATTERN 1: Misuse Detection (High Enrolment + Low Biometric)")
-    print("="*70)
-    
+def misuse_table(enrolment_df, biometric_df) -> pd.DataFrame:
+    """Per-pincode enrolment and biometric totals with the biometric update rate."""
     # Calculate total enrolments per pincode (sum all age groups)
     enrolment_df['total_enrolment'] = (
         enrolment_df['age_0_5'] + 
@@ -78,17 +92,51 @@ def analyze_misuse_pattern(enrolment_df, biometric_df):
     
     # Merge datasets
     merged = enrolment_by_pincode.merge(biometric_by_pincode, on='pincode', how='outer').fillna(0)
-    
-    # Calculate biometric update rate
+    return add_biometric_rate(merged)
+
+
+def add_biometric_rate(merged) -> pd.DataFrame:
+    """Add the biometric update rate (% of enrolments) to a per-pincode table."""
     merged['biometric_rate'] = np.where(
         merged['enrolment_count'] > 0,
         (merged['biometric_update_count'] / merged['enrolment_count']) * 100,
         0
     )
+    return merged
+
+
+def misuse_thresholds(merged):
+    """(75th percentile of enrolment, 25th percentile of non-zero biometric rate)."""
+    return (merged['enrolment_count'].quantile(0.75),
+            merged[merged['biometric_rate'] > 0]['biometric_rate'].quantile(0.25))
+
+
+def is_misuse(merged, high_enrol_threshold, low_bio_threshold) -> pd.Series:
+    """High enrolment with a low but non-zero biometric update rate."""
+    return ((merged['enrolment_count'] >= high_enrol_threshold) & 
+            (merged['biometric_rate'] <= low_bio_threshold) &
+            (merged['biometric_rate'] > 0))
+
+
+@traced()
+def analyze_misuse_pattern(enrolment_df, biometric_df, plot=True, output_dir: Path = OUTPUT_DIR,
+                           merged=None):
+    """
+    Detect pincodes with high enrolment but low biometric update rates.
+    This may indicate potential misuse or fraud.
+
+    ``merged`` may carry the per-pincode table (see ``misuse_table``)
+    already built, e.g. shard by shard in mapreduce.py.
+    """
+    print("\n" + "="*70)
+    print("PATTERN 1: Misuse Detection (High Enrolment + Low Biometric)")
+    print("="*70)
+    
+    if merged is None:
+        merged = misuse_table(enrolment_df, biometric_df)
     
     # Define thresholds (top 25% enrolment, bottom 25% biometric rate)
-    high_enrol_threshold = merged['enrolment_count'].quantile(0.75)
-    low_bio_threshold = merged[merged['biometric_rate'] > 0]['biometric_rate'].quantile(0.25)
+    high_enrol_threshold, low_bio_threshold = misuse_thresholds(merged)
     
     print(f"\nThresholds:")
     print(f"  High Enrolment (75th percentile): {high_enrol_threshold:,.0f}")
@@ -96,9 +144,7 @@ def analyze_misuse_pattern(enrolment_df, biometric_df):
     
     # Identify suspicious pincodes
     suspicious = merged[
-        (merged['enrolment_count'] >= high_enrol_threshold) & 
-        (merged['biometric_rate'] <= low_bio_threshold) &
-        (merged['biometric_rate'] > 0)
+        is_misuse(merged, high_enrol_threshold, low_bio_threshold)
     ].sort_values('enrolment_count', ascending=False)
     
     print(f"\nSuspicious Pincodes Found: {len(suspicious)}")
@@ -109,10 +155,66 @@ def analyze_misuse_pattern(enrolment_df, biometric_df):
         print(suspicious[['pincode', 'state', 'district', 'enrolment_count', 'biometric_rate']].head(10).to_string(index=False))
     
     # Save to CSV
-    suspicious.to_csv(OUTPUT_DIR / "suspicious_pincodes_misuse.csv", index=False)
+    suspicious.to_csv(output_dir / "suspicious_pincodes_misuse.csv", index=False)
     print(f"\n✓ Saved: suspicious_pincodes_misuse.csv")
     
-    # Create visualization
+    if plot:
+        plot_misuse_pattern(suspicious, merged, high_enrol_threshold, low_bio_threshold, output_dir)
+    
+    return suspicious, merged, high_enrol_threshold, low_bio_threshold
+
+
+def misuse_score_tables(score_tables, top_candidates, names):
+    """
+    Misuse score and top-k tables with each pincode's state and district,
+    from the ``score_table``/``top_candidates`` of one or more scorers over
+    disjoint pincodes (see misuse_score.py). ``names`` is indexed by pincode.
+    """
+    import misuse_score
+    
+    scores = pd.concat(score_tables, ignore_index=True).join(names, on='pincode')
+    top = misuse_score.merge_top_tables(top_candidates).join(names, on='pincode')
+    scores = scores[['pincode', 'state', 'district'] + list(scores.columns[1:-2])]
+    top = top[['window_days', 'rank', 'pincode', 'state', 'district'] + list(top.columns[3:-2])]
+    return scores, top
+
+
+@traced()
+def analyze_misuse_scores(enrolment_df, biometric_df, output_dir: Path = OUTPUT_DIR, tables=None):
+    """
+    Continuous misuse score per pincode over trailing 7/30/90-day windows,
+    with the top-k pincodes per window (see misuse_score.py). ``tables``
+    may supply prebuilt (scores, top-k, window end date).
+    """
+    import misuse_score
+    
+    if tables is None:
+        scorer = misuse_score.score_history(enrolment_df, biometric_df)
+        names = enrolment_df.groupby('pincode')[['state', 'district']].first()
+        tables = (*misuse_score_tables([scorer.score_table()], [scorer.top_candidates()], names),
+                  scorer.last_date)
+    scores, top, last_date = tables
+    
+    if last_date is None:
+        print("\nContinuous Misuse Score: no cleaned rows to score")
+    else:
+        print(f"\nContinuous Misuse Score (windows ending {last_date:%Y-%m-%d}):")
+    for w in misuse_score.WINDOWS if last_date is not None else ():
+        best = top[top['window_days'] == w].head(3)
+        print(f"  {w:>3}-day top pincodes: " +
+              ", ".join(f"{p} ({s:.2f})" for p, s in zip(best['pincode'], best['score'])))
+    
+    scores.to_csv(output_dir / "misuse_scores.csv", index=False)
+    top.to_csv(output_dir / "misuse_top_k.csv", index=False)
+    print(f"\n✓ Saved: misuse_scores.csv, misuse_top_k.csv")
+    
+    return scores, top
+
+
+def plot_misuse_pattern(suspicious, merged, high_enrol_threshold, low_bio_threshold,
+                        output_dir: Path = OUTPUT_DIR):
+    """Scatter enrolment against biometric rate, highlighting suspicious pincodes."""
+    plt = init_plot_style()
     fig, ax = plt.subplots(figsize=(12, 7))
     
     # Normal points
@@ -140,26 +242,17 @@ def analyze_misuse_pattern(enrolment_df, biometric_df):
     ax.grid(alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "pattern1_misuse_detection.png", dpi=150, bbox_inches='tight')
+    plt.savefig(output_dir / "pattern1_misuse_detection.png", dpi=150, bbox_inches='tight')
     plt.close()
     print("✓ Saved: pattern1_misuse_detection.png")
-    
-    return suspicious, merged, high_enrol_threshold, low_bio_threshold
 
 
 # =============================================================================
 # PATTERN 2: High Adult Demographics + Low Child Enrolment (Data Imbalance)
 # =============================================================================
 
-def analyze_imbalance_pattern(enrolment_df, demographic_df):
-    """
-    Detect pincodes with high adult demographic updates but low child enrolments.
-    This indicates potential data collection imbalance.
-    """
-    print("\n" + "="*70)
-    print("PATTERN 2: Data Imbalance (High Adult Demo + Low Child Enrolment)")
-    print("="*70)
-    
+def imbalance_table(enrolment_df, demographic_df) -> pd.DataFrame:
+    """Per-pincode child enrolment and adult demographic updates with their ratio."""
     # Calculate child enrolments (age_0_5 + age_5_17)
     enrolment_df['child_enrolment'] = enrolment_df['age_0_5'] + enrolment_df['age_5_17']
     
@@ -177,8 +270,11 @@ def analyze_imbalance_pattern(enrolment_df, demographic_df):
     
     # Merge datasets
     imbalance = child_by_pincode.merge(adult_demo_by_pincode, on='pincode', how='outer').fillna(0)
-    
-    # Calculate adult-to-child ratio
+    return add_adult_child_ratio(imbalance)
+
+
+def add_adult_child_ratio(imbalance) -> pd.DataFrame:
+    """Add the adult-to-child ratio (NaN without child enrolments) to a per-pincode table."""
     imbalance['adult_child_ratio'] = np.where(
         imbalance['child_enrolment'] > 0,
         imbalance['adult_demographic_count'] / imbalance['child_enrolment'],
@@ -187,10 +283,41 @@ def analyze_imbalance_pattern(enrolment_df, demographic_df):
     
     # Handle inf values for display
     imbalance['adult_child_ratio'] = imbalance['adult_child_ratio'].replace([np.inf], np.nan)
+    return imbalance
+
+
+def imbalance_thresholds(imbalance):
+    """(75th percentile of adult demographics, 25th percentile of non-zero child enrolment)."""
+    return (imbalance['adult_demographic_count'].quantile(0.75),
+            imbalance[imbalance['child_enrolment'] > 0]['child_enrolment'].quantile(0.25))
+
+
+def is_imbalanced(imbalance, high_adult_threshold, low_child_threshold) -> pd.Series:
+    """High adult demographic updates with low but non-zero child enrolment."""
+    return ((imbalance['adult_demographic_count'] >= high_adult_threshold) & 
+            (imbalance['child_enrolment'] <= low_child_threshold) &
+            (imbalance['child_enrolment'] > 0))
+
+
+@traced()
+def analyze_imbalance_pattern(enrolment_df, demographic_df, plot=True, output_dir: Path = OUTPUT_DIR,
+                              imbalance=None):
+    """
+    Detect pincodes with high adult demographic updates but low child enrolments.
+    This indicates potential data collection imbalance.
+
+    ``imbalance`` may carry the per-pincode table (see ``imbalance_table``)
+    already built.
+    """
+    print("\n" + "="*70)
+    print("PATTERN 2: Data Imbalance (High Adult Demo + Low Child Enrolment)")
+    print("="*70)
+    
+    if imbalance is None:
+        imbalance = imbalance_table(enrolment_df, demographic_df)
     
     # Define thresholds
-    high_adult_threshold = imbalance['adult_demographic_count'].quantile(0.75)
-    low_child_threshold = imbalance[imbalance['child_enrolment'] > 0]['child_enrolment'].quantile(0.25)
+    high_adult_threshold, low_child_threshold = imbalance_thresholds(imbalance)
     
     print(f"\nThresholds:")
     print(f"  High Adult Demographics (75th percentile): {high_adult_threshold:,.0f}")
@@ -198,9 +325,7 @@ def analyze_imbalance_pattern(enrolment_df, demographic_df):
     
     # Identify imbalanced pincodes
     imbalanced = imbalance[
-        (imbalance['adult_demographic_count'] >= high_adult_threshold) & 
-        (imbalance['child_enrolment'] <= low_child_threshold) &
-        (imbalance['child_enrolment'] > 0)
+        is_imbalanced(imbalance, high_adult_threshold, low_child_threshold)
     ].sort_values('adult_child_ratio', ascending=False)
     
     print(f"\nImbalanced Pincodes Found: {len(imbalanced)}")
@@ -211,10 +336,19 @@ def analyze_imbalance_pattern(enrolment_df, demographic_df):
                           'child_enrolment', 'adult_child_ratio']].head(10).to_string(index=False))
     
     # Save to CSV
-    imbalanced.to_csv(OUTPUT_DIR / "imbalanced_pincodes.csv", index=False)
+    imbalanced.to_csv(output_dir / "imbalanced_pincodes.csv", index=False)
     print(f"\n✓ Saved: imbalanced_pincodes.csv")
     
-    # Create visualization
+    if plot:
+        plot_imbalance_pattern(imbalanced, imbalance, high_adult_threshold, low_child_threshold, output_dir)
+    
+    return imbalanced, imbalance
+
+
+def plot_imbalance_pattern(imbalanced, imbalance, high_adult_threshold, low_child_threshold,
+                           output_dir: Path = OUTPUT_DIR):
+    """Scatter adult demographic updates against child enrolment."""
+    plt = init_plot_style()
     fig, ax = plt.subplots(figsize=(12, 7))
     
     # Normal points
@@ -242,40 +376,66 @@ def analyze_imbalance_pattern(enrolment_df, demographic_df):
     ax.grid(alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "pattern2_data_imbalance.png", dpi=150, bbox_inches='tight')
+    plt.savefig(output_dir / "pattern2_data_imbalance.png", dpi=150, bbox_inches='tight')
     plt.close()
     print("✓ Saved: pattern2_data_imbalance.png")
-    
-    return imbalanced, imbalance
 
 
 # =============================================================================
 # PATTERN 3: Sudden Spikes Across All Datasets (Mass Registration Events)
 # =============================================================================
 
-def analyze_spike_pattern(enrolment_df, demographic_df, biometric_df):
+def daily_activity(enrolment_df, demographic_df, biometric_df):
+    """Total activity per date for each dataset (enrolment, demographic, biometric)."""
+    # Calculate total activity per date
+    enrolment_df['total'] = (enrolment_df['age_0_5'] + enrolment_df['age_5_17'] + 
+                             enrolment_df['age_18_greater'])
+    demographic_df['total'] = demographic_df['demo_age_5_17'] + demographic_df['demo_age_17_']
+    biometric_df['total'] = biometric_df['bio_age_5_17'] + biometric_df['bio_age_17_']
+    
+    return (enrolment_df.groupby('date')['total'].sum(),
+            demographic_df.groupby('date')['total'].sum(),
+            biometric_df.groupby('date')['total'].sum())
+
+
+def _zscore(values):
+    """
+    scipy.stats.zscore (population std) in numpy, so the spike check does
+    not import scipy.stats and its ~45 MB of modules.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (values - values.mean()) / values.std()
+
+
+@traced()
+def analyze_spike_pattern(enrolment_df, demographic_df, biometric_df, plot=True,
+                          output_dir: Path = OUTPUT_DIR, daily=None):
     """
     Detect dates with sudden spikes in activity across all three datasets.
     These may indicate mass registration events.
+
+    ``daily`` may carry the per-date totals (see ``daily_activity``)
+    already built.
     """
     print("\n" + "="*70)
     print("PATTERN 3: Mass Registration Events (Sudden Spikes)")
     print("="*70)
     
-    # Calculate total activity per date
-    enrolment_df['total'] = (enrolment_df['age_0_5'] + enrolment_df['age_5_17'] + 
-                             enrolment_df['age_18_greater'])
-    demographic_df['total'] = demographic_df['demo_age_5_17'] + demographic_df['demo_age_17_']
-    biometric_df['total'] = biometric_df['bio_age_5_17'] + biometric_df['bio_age_17_']
+    if daily is None:
+        daily = daily_activity(enrolment_df, demographic_df, biometric_df)
+    enrol_totals, demo_totals, bio_totals = daily
     
     # Aggregate by date
-    enrol_daily = enrolment_df.groupby('date')['total'].sum().reset_index()
+    enrol_daily = enrol_totals.reset_index()
     enrol_daily.columns = ['date', 'enrolment_count']
     
-    demo_daily = demographic_df.groupby('date')['total'].sum().reset_index()
+    demo_daily = demo_totals.reset_index()
     demo_daily.columns = ['date', 'demographic_count']
     
-    bio_daily = biometric_df.groupby('date')['total'].sum().reset_index()
+    bio_daily = bio_totals.reset_index()
     bio_daily.columns = ['date', 'biometric_count']
     
     # Convert dates
@@ -289,11 +449,9 @@ def analyze_spike_pattern(enrolment_df, demographic_df, biometric_df):
     bio_daily = bio_daily.sort_values('date')
     
     # Calculate z-scores for spike detection
-    SPIKE_THRESHOLD = 2.0
-    
-    enrol_daily['z_score'] = np.abs(stats.zscore(enrol_daily['enrolment_count']))
-    demo_daily['z_score'] = np.abs(stats.zscore(demo_daily['demographic_count']))
-    bio_daily['z_score'] = np.abs(stats.zscore(bio_daily['biometric_count']))
+    enrol_daily['z_score'] = np.abs(_zscore(enrol_daily['enrolment_count']))
+    demo_daily['z_score'] = np.abs(_zscore(demo_daily['demographic_count']))
+    bio_daily['z_score'] = np.abs(_zscore(bio_daily['biometric_count']))
     
     # Identify spike dates
     enrol_spikes = set(enrol_daily[enrol_daily['z_score'] > SPIKE_THRESHOLD]['date'])
@@ -324,17 +482,30 @@ def analyze_spike_pattern(enrolment_df, demographic_df, biometric_df):
             'total_activity': int(enrol_count + demo_count + bio_count)
         })
     
-    mass_reg_df = pd.DataFrame(mass_reg_report).sort_values('total_activity', ascending=False)
+    mass_reg_df = pd.DataFrame(mass_reg_report, columns=['date', 'enrolment_count', 'demographic_count',
+                                                         'biometric_count', 'total_activity'])
+    mass_reg_df = mass_reg_df.sort_values('total_activity', ascending=False)
     
     if len(mass_reg_df) > 0:
         print(f"\nMass Registration Events:")
         print(mass_reg_df.to_string(index=False))
     
     # Save to CSV
-    mass_reg_df.to_csv(OUTPUT_DIR / "mass_registration_events.csv", index=False)
+    mass_reg_df.to_csv(output_dir / "mass_registration_events.csv", index=False)
     print(f"\n✓ Saved: mass_registration_events.csv")
     
-    # Create visualization
+    if plot and len(enrol_daily):
+        plot_spike_pattern(enrol_daily, demo_daily, bio_daily,
+                           enrol_spikes, demo_spikes, bio_spikes, mass_reg_dates, output_dir)
+    
+    return mass_reg_df, enrol_daily, demo_daily, bio_daily
+
+
+def plot_spike_pattern(enrol_daily, demo_daily, bio_daily,
+                       enrol_spikes, demo_spikes, bio_spikes, mass_reg_dates,
+                       output_dir: Path = OUTPUT_DIR):
+    """Plot the three daily series with mass registration dates marked."""
+    plt = init_plot_style()
     fig, axes = plt.subplots(3, 1, figsize=(14, 10), sharex=True)
     
     colors = ['#3498db', '#27ae60', '#f39c12']
@@ -370,40 +541,147 @@ def analyze_spike_pattern(enrolment_df, demographic_df, biometric_df):
                         fontsize=9, color='#e74c3c', fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "pattern3_mass_registration_spikes.png", dpi=150, bbox_inches='tight')
+    plt.savefig(output_dir / "pattern3_mass_registration_spikes.png", dpi=150, bbox_inches='tight')
     plt.close()
     print("✓ Saved: pattern3_mass_registration_spikes.png")
+
+
+# =============================================================================
+# PATTERN 4: Sustained Activity (Consecutive Elevated Days per Pincode)
+# =============================================================================
+
+@traced()
+def analyze_sustained_pattern(enrolment_df, demographic_df, biometric_df,
+                              output_dir: Path = OUTPUT_DIR, runs=None):
+    """
+    Find pincodes whose daily activity stays well above their own typical
+    day for several days in a row, scanned on sparse pincode x date
+    matrices (see activity_matrix.py). ``runs`` may supply prebuilt runs.
+    """
+    import activity_matrix
     
-    return mass_reg_df, enrol_daily, demo_daily, bio_daily
+    print("\n" + "="*70)
+    print("PATTERN 4: Sustained Activity (Consecutive Elevated Days)")
+    print("="*70)
+    
+    if runs is None:
+        runs = activity_matrix.detect_sustained_activity(enrolment_df, demographic_df, biometric_df)
+    
+    print(f"\nRuns of >= {activity_matrix.MIN_RUN_DAYS} days at "
+          f">= {activity_matrix.ELEVATION_FACTOR:g}x the pincode's median active day:")
+    for name, count in runs['dataset'].value_counts().reindex(
+            list(activity_matrix.DATASET_COLUMNS), fill_value=0).items():
+        print(f"  {name.capitalize():12} {count}")
+    
+    if len(runs) > 0:
+        print(f"\nLongest Runs (Top 10):")
+        print(runs.head(10).to_string(index=False))
+    
+    runs.to_csv(output_dir / "sustained_activity_runs.csv", index=False)
+    print(f"\n✓ Saved: sustained_activity_runs.csv")
+    
+    return runs
 
 
 # =============================================================================
 # MAIN EXECUTION
 # =============================================================================
 
-def main():
+def main(enrolment_df=None, demographic_df=None, biometric_df=None, plot=True,
+         sample=None, seed=None, shards=None, workers=None, memory_budget=None, facts=None,
+         **filters):
+    """
+    Run all four anomaly patterns.
+
+    Cleaned DataFrames may be passed in to reuse data already held in
+    memory; otherwise they are loaded from ``DATA_DIR``, or from the
+    analytics store when filters are given. With ``sample`` (a fraction)
+    the run uses a stratified pincode sample and writes to
+    ``cleaned_data/sample/`` instead (see sampling.py); slice filters write
+    under ``slices/`` (see analytics_store.slice_dir). With ``shards``
+    the per-pincode and per-date tables are built by hash-partitioned
+    map-reduce over ``workers`` processes (see mapreduce.py); the outputs
+    are identical. With ``memory_budget`` (e.g. '512M', or the MemoryBudget
+    shared by a pipeline run) every table is aggregated from budget-sized
+    chunks of the cleaned CSVs instead, and no full dataset is loaded (see
+    memory_budget.py).
+
+    ``facts`` (a fact_table.FactTable) supplies the per-pincode and per-date
+    tables without joins, and per-dataset views for the rest; unless frames,
+    filters or a sample are given, the saved fact table is used when it is
+    newer than the cleaned CSVs.
+    """
     print("="*70)
     print("ANOMALY DETECTION AND PATTERN ANALYSIS")
     print("="*70)
     
-    # Load data
-    enrolment_df, demographic_df, biometric_df = load_cleaned_data()
+    # Load data (or, within a memory budget, aggregate it chunk by chunk)
+    tables = {}
+    if memory_budget:
+        if sample or filters:
+            raise ValueError("memory_budget cannot be combined with sampling or slice filters")
+        import memory_budget as budgeting
+        budget = budgeting.as_budget(memory_budget)
+        tables = budgeting.anomaly_tables(budget)
+    elif enrolment_df is None or demographic_df is None or biometric_df is None:
+        if facts is None and not (filters or sample):
+            import fact_table
+            facts = fact_table.load_current()
+        if facts is not None:
+            print(f"Reading the activity fact table ({len(facts):,} facts)...")
+            enrolment_df, demographic_df, biometric_df = facts.frames()
+        else:
+            enrolment_df, demographic_df, biometric_df = load_cleaned_data(**filters)
+    
+    output_dir = OUTPUT_DIR / "sample" if sample else OUTPUT_DIR
+    if filters:
+        import analytics_store
+        output_dir = analytics_store.slice_dir(output_dir, **filters)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if sample:
+        import sampling
+        enrolment_df, demographic_df, biometric_df, estimates = sampling.sample_for_exploration(
+            enrolment_df, demographic_df, biometric_df, sample,
+            sampling.DEFAULT_SEED if seed is None else seed)
+        estimates.to_csv(output_dir / "sample_estimates.csv", index=False)
+    
+    if shards and not tables:
+        import mapreduce
+        tables = mapreduce.anomaly_tables(enrolment_df, demographic_df, biometric_df,
+                                          shards, workers)
+    elif facts is not None and not (tables or sample):
+        import fact_table
+        tables = fact_table.anomaly_tables(facts)
+    
+    def frames(*dfs):
+        # The per-row helpers add columns, so they work on copies
+        return [None] * len(dfs) if tables else [df.copy() for df in dfs]
     
     # Pattern 1: Misuse Detection
     suspicious, merged_misuse, high_enrol, low_bio = analyze_misuse_pattern(
-        enrolment_df.copy(), biometric_df.copy()
+        *frames(enrolment_df, biometric_df), plot=plot, output_dir=output_dir,
+        merged=tables.get('misuse')
     )
+    misuse_scores, misuse_top = analyze_misuse_scores(enrolment_df, biometric_df,
+                                                      output_dir=output_dir,
+                                                      tables=tables.get('scores'))
     
     # Pattern 2: Data Imbalance
     imbalanced, merged_imbalance = analyze_imbalance_pattern(
-        enrolment_df.copy(), demographic_df.copy()
+        *frames(enrolment_df, demographic_df), plot=plot, output_dir=output_dir,
+        imbalance=tables.get('imbalance')
     )
     
     # Pattern 3: Mass Registration Spikes
     mass_reg, enrol_daily, demo_daily, bio_daily = analyze_spike_pattern(
-        enrolment_df.copy(), demographic_df.copy(), biometric_df.copy()
+        *frames(enrolment_df, demographic_df, biometric_df), plot=plot,
+        output_dir=output_dir, daily=tables.get('daily')
     )
     
+    # Pattern 4: Sustained Activity
+    sustained = analyze_sustained_pattern(enrolment_df, demographic_df, biometric_df,
+                                          output_dir=output_dir, runs=tables.get('runs'))
+    
     # Final Summary
     print("\n" + "="*70)
     print("ANOMALY DETECTION SUMMARY REPORT")
@@ -414,6 +692,10 @@ def main():
     if len(suspicious) > 0:
         print(f"   Total Enrolments in Suspicious Areas: {suspicious['enrolment_count'].sum():,.0f}")
         print(f"   Avg Biometric Rate: {suspicious['biometric_rate'].mean():.2f}%")
+    longest = misuse_top[misuse_top['window_days'] == misuse_top['window_days'].max()]
+    if len(longest) > 0:
+        print(f"   Top Continuous Score ({longest['window_days'].iloc[0]}-day): "
+              f"{longest['pincode'].iloc[0]} ({longest['score'].iloc[0]:.2f})")
     
     print(f"\n2. DATA IMBALANCE (High Adult + Low Child)")
     print(f"   Imbalanced Pincodes: {len(imbalanced)}")
@@ -426,17 +708,27 @@ def main():
         print(f"   Date Range: {mass_reg['date'].min()} to {mass_reg['date'].max()}")
         print(f"   Peak Activity: {mass_reg['total_activity'].max():,}")
     
+    print(f"\n4. SUSTAINED ACTIVITY (Consecutive Elevated Days)")
+    print(f"   Runs: {len(sustained)} across {sustained['pincode'].nunique()} pincodes")
+    if len(sustained) > 0:
+        print(f"   Longest Run: {sustained['days'].max()} days")
+    
     print("\n" + "="*70)
-    print("OUTPUT FILES (saved to cleaned_data/):")
+    print(f"OUTPUT FILES (saved to {output_dir.relative_to(BASE_DIR).as_posix()}/):")
     print("="*70)
     print("  CSV Reports:")
     print("    - suspicious_pincodes_misuse.csv")
+    print("    - misuse_scores.csv, misuse_top_k.csv")
     print("    - imbalanced_pincodes.csv")
     print("    - mass_registration_events.csv")
-    print("  Visualizations:")
-    print("    - pattern1_misuse_detection.png")
-    print("    - pattern2_data_imbalance.png")
-    print("    - pattern3_mass_registration_spikes.png")
+    print("    - sustained_activity_runs.csv")
+    if plot:
+        print("  Visualizations:")
+        print("    - pattern1_misuse_detection.png")
+        print("    - pattern2_data_imbalance.png")
+        print("    - pattern3_mass_registration_spikes.png")
+    if memory_budget:
+        budget.report()
     print("\n✓ Analysis complete!")
     
     return suspicious, imbalanced, mass_reg
@@ -6,30 +6,42 @@ import os
 from pathlib import Path
 import glob
 
+import data_validation
+import raw_chunks
+from instrumentation import traced
+
 # Configuration
 BASE_DIR = Path(__file__).parent
 ENROLMENT_DIR = BASE_DIR / "api_data_aadhar_enrolment" / "api_data_aadhar_enrolment"
 DEMOGRAPHIC_DIR = BASE_DIR / "api_data_aadhar_demographic" / "api_data_aadhar_demographic"
 BIOMETRIC_DIR = BASE_DIR / "api_data_aadhar_biometric" / "api_data_aadhar_biometric"
 OUTPUT_DIR = BASE_DIR / "cleaned_data"
+WRITE_CHUNK_ROWS = 250_000  # cleaned rows written (and folded into the variance) at a time
 
 # Column names
 DATE_COL = "date"
 PINCODE_COL = "pincode"
 
 
-def load_all_chunks(directory: Path, pattern: str = "*.csv") -> pd.DataFrame:
-    """Load and concatenate all CSV chunks from a directory."""
-    csv_files = sorted(glob.glob(str(directory / pattern)))
+def load_all_chunks(directory: Path, pattern: str = None) -> pd.DataFrame:
+    """
+    Load and concatenate all CSV chunks from a directory. Chunks may be plain
+    CSV or gzip/zstd compressed (``.csv.gz`` / ``.csv.zst``); compressed ones
+    are decompressed on a background thread while they are parsed.
+    """
+    if pattern is None:
+        csv_files = raw_chunks.find_chunks(directory)
+    else:
+        csv_files = [Path(f) for f in sorted(glob.glob(str(directory / pattern)))]
     if not csv_files:
         raise FileNotFoundError(f"No CSV files found in {directory}")
     
     print(f"  Loading {len(csv_files)} file(s) from {directory.name}...")
     dfs = []
     for f in csv_files:
-        df = pd.read_csv(f)
+        df = raw_chunks.read_chunk(f)
         dfs.append(df)
-        print(f"    - {Path(f).name}: {len(df):,} rows")
+        print(f"    - {f.name}: {len(df):,} rows")
     
     combined = pd.concat(dfs, ignore_index=True)
     return combined
@@ -51,24 +63,23 @@ def standardize_pincode(df: pd.DataFrame, pincode_col: str) -> pd.DataFrame:
     return df
 
 
-def main():
-    print("=" * 70)
-    print("Data Cleaning - Synchronize Dates and Pincodes Across Three Datasets")
-    print("=" * 70)
-    
-    # Step 1: Load All Three Datasets
-    print("\n[Step 1] Loading datasets...")
-    
+@traced()
+def load_raw_datasets():
+    """Load the raw enrolment, demographic and biometric chunks."""
     enrolment_df = load_all_chunks(ENROLMENT_DIR)
     demographic_df = load_all_chunks(DEMOGRAPHIC_DIR)
     biometric_df = load_all_chunks(BIOMETRIC_DIR)
-    
-    print("\nInitial Dataset Shapes:")
-    print(f"  Enrolment:   {enrolment_df.shape[0]:>10,} rows x {enrolment_df.shape[1]} columns")
-    print(f"  Demographic: {demographic_df.shape[0]:>10,} rows x {demographic_df.shape[1]} columns")
-    print(f"  Biometric:   {biometric_df.shape[0]:>10,} rows x {biometric_df.shape[1]} columns")
-    
-    
+    return enrolment_df, demographic_df, biometric_df
+
+
+@traced()
+def synchronize_datasets(enrolment_df, demographic_df, biometric_df):
+    """
+    Keep only the dates and pincodes present in all three datasets.
+
+    Returns the three cleaned DataFrames followed by the common date and
+    pincode sets.
+    """
     # Step 2: Standardize Date and Pincode Formats
     
     print("\n[Step 2] Standardizing date and pincode formats...")
@@ -135,16 +146,24 @@ def main():
     print(f"  Demographic: {demographic_clean.shape[0]:>10,} rows (removed {demographic_df.shape[0] - demographic_clean.shape[0]:,} rows)")
     print(f"  Biometric:   {biometric_clean.shape[0]:>10,} rows (removed {biometric_df.shape[0] - biometric_clean.shape[0]:,} rows)")
     
+    return enrolment_clean, demographic_clean, biometric_clean, common_dates, common_pincodes
+
+
+@traced()
+def verify_consistency(enrolment_clean, demographic_clean, biometric_clean):
+    """Check that the cleaned datasets share identical date and pincode sets."""
     # Step 6: Verify Data Consistency
+    return report_consistency(
+        [set(df[DATE_COL].unique()) for df in (enrolment_clean, demographic_clean, biometric_clean)],
+        [set(df[PINCODE_COL].unique()) for df in (enrolment_clean, demographic_clean, biometric_clean)])
+
+
+def report_consistency(date_sets, pincode_sets):
+    """Compare the (enrolment, demographic, biometric) date and pincode sets."""
     print("\n[Step 6] Verifying data consistency...")
     
-    clean_enrol_dates = set(enrolment_clean[DATE_COL].unique())
-    clean_demo_dates = set(demographic_clean[DATE_COL].unique())
-    clean_bio_dates = set(biometric_clean[DATE_COL].unique())
-    
-    clean_enrol_pins = set(enrolment_clean[PINCODE_COL].unique())
-    clean_demo_pins = set(demographic_clean[PINCODE_COL].unique())
-    clean_bio_pins = set(biometric_clean[PINCODE_COL].unique())
+    clean_enrol_dates, clean_demo_dates, clean_bio_dates = date_sets
+    clean_enrol_pins, clean_demo_pins, clean_bio_pins = pincode_sets
     
     dates_match = clean_enrol_dates == clean_demo_dates == clean_bio_dates
     pins_match = clean_enrol_pins == clean_demo_pins == clean_bio_pins
@@ -159,26 +178,39 @@ def main():
     print(f"  Unique pincodes in cleaned Biometric:   {len(clean_bio_pins):,}")
     print(f"  Pincodes match across all datasets:     {'✓ YES' if pins_match else '✗ NO'}")
     
+    return dates_match, pins_match
+
+
+@traced()
+def save_cleaned_datasets(enrolment_clean, demographic_clean, biometric_clean,
+                          output_dir: Path = OUTPUT_DIR, daily=None):
+    """
+    Write the cleaned datasets to ``output_dir`` in chunks of
+    WRITE_CHUNK_ROWS rows. ``daily`` (a region_variance.DailyTotals) is fed
+    every chunk as it is written, so the variance needs no pass of its own.
+    """
     # Step 7: Save Cleaned Datasets
     print("\n[Step 7] Saving cleaned datasets...")
     
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    
-    enrolment_clean.to_csv(OUTPUT_DIR / "enrolment_cleaned.csv", index=False)
-    print(f"  Saved: {OUTPUT_DIR / 'enrolment_cleaned.csv'}")
-    
-    demographic_clean.to_csv(OUTPUT_DIR / "demographic_cleaned.csv", index=False)
-    print(f"  Saved: {OUTPUT_DIR / 'demographic_cleaned.csv'}")
-    
-    biometric_clean.to_csv(OUTPUT_DIR / "biometric_cleaned.csv", index=False)
-    print(f"  Saved: {OUTPUT_DIR / 'biometric_cleaned.csv'}")
-    
-    # Step 8: Generate Cleaning Report Summary
-    print("\n[Step 8] Generating cleaning summary report...")
-    
-    original_rows = [enrolment_df.shape[0], demographic_df.shape[0], biometric_df.shape[0]]
-    cleaned_rows = [enrolment_clean.shape[0], demographic_clean.shape[0], biometric_clean.shape[0]]
-    
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    for name, dataset, df in (('enrolment', 'enrol', enrolment_clean),
+                              ('demographic', 'demo', demographic_clean),
+                              ('biometric', 'bio', biometric_clean)):
+        path = output_dir / f"{name}_cleaned.csv"
+        for start in range(0, max(len(df), 1), WRITE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + WRITE_CHUNK_ROWS]
+            chunk.to_csv(path, mode='a' if start else 'w', header=not start, index=False)
+            if daily is not None:
+                daily.add(dataset, chunk)
+        print(f"  Saved: {path}")
+
+
+def build_cleaning_summary(original_rows, cleaned_rows, rule_counts=None) -> pd.DataFrame:
+    """
+    Tabulate original vs. cleaned row counts per dataset, plus the
+    quarantine counts per validation rule when ``rule_counts`` is given.
+    """
     cleaning_report = {
         'Dataset': ['Enrolment', 'Demographic', 'Biometric'],
         'Original_Rows': original_rows,
@@ -191,6 +223,102 @@ def main():
     }
     
     cleaning_summary = pd.DataFrame(cleaning_report)
+    if rule_counts is not None:
+        for column in ['Quarantined_Rows'] + data_validation.RULES:
+            cleaning_summary[column] = [counts[column] for counts in rule_counts]
+    return cleaning_summary
+
+
+@traced()
+def quarantine_invalid_rows(enrolment_df, demographic_df, biometric_df, output_dir: Path = OUTPUT_DIR):
+    """Drop rows failing validation and write them to quarantine.csv."""
+    print("\n[Step 1b] Validating rows (pincode, date, counts, state)...")
+    enrolment_df, demographic_df, biometric_df, quarantine, rule_counts = \
+        data_validation.validate_datasets(enrolment_df, demographic_df, biometric_df)
+    
+    for name, counts in zip(['Enrolment', 'Demographic', 'Biometric'], rule_counts):
+        detail = ", ".join(f"{rule}: {counts[rule]:,}" for rule in data_validation.RULES if counts[rule])
+        print(f"  {name + ':':<13} {counts['Quarantined_Rows']:>8,} quarantined" + (f" ({detail})" if detail else ""))
+    
+    output_dir.mkdir(parents=True, exist_ok=True)
+    quarantine.to_csv(output_dir / "quarantine.csv", index=False)
+    print(f"  Saved: {output_dir / 'quarantine.csv'}")
+    return enrolment_df, demographic_df, biometric_df, rule_counts
+
+
+def main(enrolment_df=None, demographic_df=None, biometric_df=None, variance=True, validate=True,
+         shards=None, workers=None, memory_budget=None):
+    """
+    Run the full synchronization stage.
+
+    Raw DataFrames may be passed in to reuse data already held in memory;
+    otherwise the raw chunks are loaded from disk. With ``validate`` rows
+    failing the data-quality rules are quarantined before synchronizing
+    (see data_validation.py). With ``variance`` the
+    high-variance region table is accumulated from the cleaned rows as they
+    are written (see region_variance.py). HyperLogLog sketches of the active
+    pincodes per (dataset, state, date) are saved alongside the cleaned
+    data for the Power BI coverage table (see hyperloglog.py). With
+    ``shards`` the date and
+    pincode synchronization runs as map-reduce over pincode shards on
+    ``workers`` processes (see mapreduce.py), with identical output.
+    With ``memory_budget`` (e.g. '512M', or the MemoryBudget shared by a
+    pipeline run) the raw chunks are streamed in budget-sized pieces
+    instead (see memory_budget.py) and no cleaned DataFrames are returned.
+    """
+    print("=" * 70)
+    print("Data Cleaning - Synchronize Dates and Pincodes Across Three Datasets")
+    print("=" * 70)
+    
+    streamed = {}
+    if memory_budget:
+        import memory_budget as budgeting
+        budget = budgeting.as_budget(memory_budget)
+        streamed = budgeting.synchronize_within_budget(budget, validate, variance)
+        enrolment_clean = demographic_clean = biometric_clean = None
+        original_rows, cleaned_rows = streamed['original_rows'], streamed['cleaned_rows']
+        rule_counts = streamed['rule_counts']
+        common_dates, common_pincodes = streamed['common_dates'], streamed['common_pincodes']
+    else:
+        # Step 1: Load All Three Datasets
+        print("\n[Step 1] Loading datasets...")
+        
+        if enrolment_df is None or demographic_df is None or biometric_df is None:
+            enrolment_df, demographic_df, biometric_df = load_raw_datasets()
+        
+        print("\nInitial Dataset Shapes:")
+        print(f"  Enrolment:   {enrolment_df.shape[0]:>10,} rows x {enrolment_df.shape[1]} columns")
+        print(f"  Demographic: {demographic_df.shape[0]:>10,} rows x {demographic_df.shape[1]} columns")
+        print(f"  Biometric:   {biometric_df.shape[0]:>10,} rows x {biometric_df.shape[1]} columns")
+        
+        original_rows = [enrolment_df.shape[0], demographic_df.shape[0], biometric_df.shape[0]]
+        rule_counts = None
+        if validate:
+            enrolment_df, demographic_df, biometric_df, rule_counts = \
+                quarantine_invalid_rows(enrolment_df, demographic_df, biometric_df)
+        
+        if shards:
+            import mapreduce
+            enrolment_clean, demographic_clean, biometric_clean, common_dates, common_pincodes = \
+                mapreduce.synchronize_sharded(enrolment_df, demographic_df, biometric_df, shards, workers)
+        else:
+            enrolment_clean, demographic_clean, biometric_clean, common_dates, common_pincodes = \
+                synchronize_datasets(enrolment_df, demographic_df, biometric_df)
+        
+        verify_consistency(enrolment_clean, demographic_clean, biometric_clean)
+        
+        daily = None
+        if variance:
+            import region_variance
+            daily = region_variance.DailyTotals()
+        save_cleaned_datasets(enrolment_clean, demographic_clean, biometric_clean, daily=daily)
+        
+        cleaned_rows = [enrolment_clean.shape[0], demographic_clean.shape[0], biometric_clean.shape[0]]
+    
+    # Step 8: Generate Cleaning Report Summary
+    print("\n[Step 8] Generating cleaning summary report...")
+    
+    cleaning_summary = build_cleaning_summary(original_rows, cleaned_rows, rule_counts)
     
     print("\nData Cleaning Summary:")
     print(cleaning_summary.to_string(index=False))
@@ -198,6 +326,26 @@ def main():
     cleaning_summary.to_csv(OUTPUT_DIR / "cleaning_summary.csv", index=False)
     print(f"\n  Saved: {OUTPUT_DIR / 'cleaning_summary.csv'}")
     
+    # Step 8b: Coverage sketches of active pincodes per state and day
+    import hyperloglog
+    print("\n[Step 8b] Sketching active pincodes per (dataset, state, date)...")
+    sketches = streamed.get('sketches')
+    if sketches is None:
+        sketches = hyperloglog.build_coverage_sketches(enrolment_clean, demographic_clean,
+                                                       biometric_clean)
+    print(f"  {len(sketches.keys):,} sketches, {sketches.registers.nbytes / 1e6:,.1f} MB "
+          f"(+/-{hyperloglog.relative_error():.1%} per estimate)")
+    print(f"  Saved: {sketches.save()}")
+    
+    # Step 9: Region variance, from the daily totals gathered while saving
+    if variance:
+        import region_variance
+        print("\n[Step 9] Accumulating daily variance per region...")
+        accumulated = streamed.get('variance')
+        if accumulated is None:
+            accumulated = daily.variance()
+        region_variance.save_high_variance_regions(accumulated)
+    
     # Final Summary
     print("\n" + "=" * 70)
     print("CLEANING COMPLETE!")
@@ -207,8 +355,13 @@ def main():
     print(f"  - demographic_cleaned.csv")
     print(f"  - biometric_cleaned.csv")
     print(f"  - cleaning_summary.csv")
+    print(f"  - coverage_sketches.npz")
+    if validate:
+        print(f"  - quarantine.csv")
     print(f"\nCommon dates:    {len(common_dates):,}")
     print(f"Common pincodes: {len(common_pincodes):,}")
+    if memory_budget:
+        budget.report()
     
     return enrolment_clean, demographic_clean, biometric_clean, cleaning_summary
 
@@ -0,0 +1,99 @@
+"""
+Row-Level Data Validation and Quarantine
+========================================
+Vectorized checks run on the raw extracts before synchronization. Every
+rule is a boolean mask over whole columns; rows failing any rule are moved
+to a quarantine file with the codes of every rule they broke.
+
+Rules (reason codes):
+    BAD_PINCODE    not a 6-digit pincode (100000-999999)
+    BAD_DATE       not a valid DD-MM-YYYY date
+    BAD_COUNT      an age count that is missing, non-numeric, negative or fractional
+    UNKNOWN_STATE  state name not recognised (case, spacing, '&', former names
+                   and close misspellings are tolerated - see name_normalization)
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from name_normalization import canonical_state
+
+RULES = ['BAD_PINCODE', 'BAD_DATE', 'BAD_COUNT', 'UNKNOWN_STATE']
+
+COUNT_COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+
+_DATE_PATTERN = re.compile(r'^\d{2}-\d{2}-\d{4}$')
+
+
+def rule_masks(df: pd.DataFrame, dataset: str) -> dict:
+    """Boolean failure mask per rule for every row of ``df``."""
+    pincode = pd.to_numeric(df['pincode'], errors='coerce')
+    bad_pincode = ~(pincode.between(100000, 999999) & (pincode % 1 == 0))
+
+    # Dates and states repeat heavily: check each distinct value once
+    date_codes, date_values = pd.factorize(df['date'])
+    dates = pd.Series(date_values).astype('string').str.strip()
+    date_ok = (pd.to_datetime(dates, format='%d-%m-%Y', errors='coerce').notna()
+               & dates.str.match(_DATE_PATTERN).fillna(False)).to_numpy(dtype=bool)
+    bad_date = (date_codes < 0) | ~np.append(date_ok, False)[date_codes]
+
+    bad_count = pd.Series(False, index=df.index)
+    for col in COUNT_COLUMNS[dataset]:
+        values = pd.to_numeric(df[col], errors='coerce')
+        bad_count |= values.isna() | (values < 0) | (values % 1 != 0)
+
+    state_codes, state_values = pd.factorize(df['state'])
+    state_ok = np.array([canonical_state(v) is not None for v in state_values], dtype=bool)
+    unknown_state = (state_codes < 0) | ~np.append(state_ok, False)[state_codes]
+
+    return {
+        'BAD_PINCODE': bad_pincode.to_numpy(),
+        'BAD_DATE': bad_date,
+        'BAD_COUNT': bad_count.to_numpy(),
+        'UNKNOWN_STATE': unknown_state,
+    }
+
+
+def validate_dataset(df: pd.DataFrame, dataset: str):
+    """
+    Split ``df`` into valid and quarantined rows.
+    Returns (valid, quarantined, per-rule failure counts).
+    """
+    masks = rule_masks(df, dataset)
+    failed = np.logical_or.reduce(list(masks.values()))
+
+    quarantined = df[failed].copy()
+    reasons = pd.Series('', index=quarantined.index)
+    for rule in RULES:
+        reasons += np.where(masks[rule][failed], rule + ';', '')
+    quarantined.insert(0, 'reasons', reasons.str.rstrip(';'))
+    quarantined.insert(0, 'source_row', quarantined.index)
+    quarantined.insert(0, 'dataset', dataset)
+
+    valid = df[~failed].copy()
+    for col in COUNT_COLUMNS[dataset]:
+        valid[col] = pd.to_numeric(valid[col]).astype('int64')
+
+    counts = {rule: int(mask.sum()) for rule, mask in masks.items()}
+    counts['Quarantined_Rows'] = int(failed.sum())
+    return valid, quarantined, counts
+
+
+def validate_datasets(enrolment_df, demographic_df, biometric_df):
+    """
+    Validate the three raw datasets.
+    Returns (enrolment, demographic, biometric, quarantine, rule_counts) where
+    ``rule_counts`` is a list of per-dataset dicts in that order.
+    """
+    results = [validate_dataset(df, name) for name, df in
+               (('enrolment', enrolment_df), ('demographic', demographic_df),
+                ('biometric', biometric_df))]
+    quarantine = pd.concat([q for _, q, _ in results], ignore_index=True)
+    return (results[0][0], results[1][0], results[2][0], quarantine,
+            [counts for _, _, counts in results])
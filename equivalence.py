@@ -0,0 +1,372 @@
+"""
+Golden-Output Equivalence Harness
+=================================
+Proves that a faster execution path produces the same outputs as the
+reference path. The reference run and each alternative run use the same
+inputs, either synthetic raw chunks or a pincode sample of the real ones.
+Each run happens in its own scratch copy of the code, through
+``pipeline.py --trace``. The harness then diffs every CSV that the runs
+write to cleaned_data/, powerbi_data/ and outputs/.
+
+Diffs ignore row order. Both tables are sorted on all columns, with the
+text and integer columns first. Numeric columns are compared with
+np.isclose (RTOL / ATOL, NaN equal to NaN); all other columns must match
+exactly. A missing or extra file, a changed column set, a changed row
+count or any differing cell is a divergence. Divergences are all printed
+and then raised as DivergenceError, which gives a non-zero exit code.
+
+The per-stage wall times come from the traces. They are reported as a
+speed-up ratio (reference / alternative), taking the best of ``repeat``
+runs; a ratio below 1 is the alternative's slowdown factor (as for the
+memory-budget variant, which trades speed for bounded memory). The peak
+RSS of every stage is reported too, and for a ``--memory-budget`` run each
+budgeted stage's peak is checked against the budget.
+
+Usage:
+    python equivalence.py                          # reference vs every variant
+    python equivalence.py --variant sharded --pincodes 2000 --days 90
+    python equivalence.py --source raw --fraction 0.05
+    python equivalence.py --alt-args "all --shards 8 --workers 4"
+"""
+
+import argparse
+import json
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent
+OUTPUT_DIRS = ('cleaned_data', 'powerbi_data', 'outputs')
+RAW_DIRS = {
+    'enrolment': Path('api_data_aadhar_enrolment') / 'api_data_aadhar_enrolment',
+    'demographic': Path('api_data_aadhar_demographic') / 'api_data_aadhar_demographic',
+    'biometric': Path('api_data_aadhar_biometric') / 'api_data_aadhar_biometric',
+}
+RAW_COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+
+RTOL = 1e-9
+ATOL = 1e-9
+MAX_REPORTED_CELLS = 5
+MAX_REPORTED_COLUMNS = 3
+
+REFERENCE = ['all']
+
+
+class DivergenceError(AssertionError):
+    """An alternative path wrote different outputs than the reference path."""
+
+
+# =============================================================================
+# INPUTS
+# =============================================================================
+
+def synthetic_raw_data(root: Path, pincodes=500, days=60, seed=0):
+    """
+    Write reproducible raw chunks (two per dataset) under ``root``, with
+    spelling variants of state and district names and a few spike days.
+    """
+    from name_normalization import CANONICAL_STATES
+
+    rng = np.random.default_rng(seed)
+    states = np.array(sorted(CANONICAL_STATES))[:12]
+    pin_state = rng.integers(0, len(states), pincodes)
+    pin_district = rng.integers(0, 4, pincodes)
+    pin_codes = 110000 + np.arange(pincodes) * 37
+    dates = pd.date_range('2025-03-01', periods=days).strftime('%d-%m-%Y').to_numpy()
+    spikes = rng.choice(days, size=max(days // 30, 1), replace=False)
+
+    for offset, (name, columns) in enumerate(RAW_COLUMNS.items()):
+        pin, day = np.nonzero(rng.random((pincodes, days)) < 0.6 + 0.1 * offset)
+        counts = rng.poisson(3 * (offset + 1), (len(pin), len(columns)))
+        counts[np.isin(day, spikes)] *= 8
+        state = states[pin_state[pin]]
+        variant = rng.random(len(pin))
+        state = np.where(variant < 0.05, np.char.upper(state.astype(str)), state)
+        district = np.char.add(np.char.add(state.astype(str), ' District '),
+                               pin_district[pin].astype(str))
+        frame = pd.DataFrame({'date': dates[day], 'state': state, 'district': district,
+                              'pincode': pin_codes[pin]})
+        frame[columns] = counts
+        frame = frame.sample(frac=1, random_state=seed + offset).reset_index(drop=True)
+        _write_chunks(root, name, frame)
+
+
+def sample_raw_data(root: Path, fraction=0.05, source: Path = BASE_DIR):
+    """Copy the rows of a deterministic pincode sample of the real raw chunks."""
+    import raw_chunks
+
+    for name in RAW_DIRS:
+        parts = []
+        for path in raw_chunks.find_chunks(source / RAW_DIRS[name]):
+            chunk = raw_chunks.read_chunk(path)
+            pins = pd.to_numeric(chunk['pincode'], errors='coerce').fillna(0).astype(np.int64)
+            keep = pd.util.hash_array(pins.to_numpy()) % 10_000 < fraction * 10_000
+            parts.append(chunk[keep])
+        if not parts:
+            raise FileNotFoundError(f"No raw {name} chunks under {source / RAW_DIRS[name]}")
+        _write_chunks(root, name, pd.concat(parts, ignore_index=True))
+
+
+def _write_chunks(root, name, frame, chunks=2):
+    out = Path(root) / RAW_DIRS[name]
+    out.mkdir(parents=True, exist_ok=True)
+    bounds = np.linspace(0, len(frame), chunks + 1).astype(int)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        frame.iloc[lo:hi].to_csv(out / f"api_data_aadhar_{name}_{lo}_{hi}.csv", index=False)
+
+
+def compress_raw(workspace: Path):
+    """Input preparation: replace every raw chunk by a .csv.gz copy."""
+    import raw_chunks
+    for directory in RAW_DIRS.values():
+        raw_chunks.compress_directory(workspace / directory, 'gz', remove=True)
+
+
+VARIANTS = {
+    # name -> (pipeline arguments, input preparation run in the scratch copy)
+    'sharded': (['all', '--shards', '4', '--workers', '2'], None),
+    'gzip-chunks': (['all'], compress_raw),
+    'memory-budget': (['all', '--memory-budget', '256M'], None),
+}
+
+# Stages that run within --memory-budget (the others still load the cleaned data whole)
+BUDGETED_STAGES = ('sync', 'anomalies', 'powerbi')
+
+
+# =============================================================================
+# RUNS
+# =============================================================================
+
+def make_workspace(inputs: Path) -> Path:
+    """Scratch copy of the code with the given raw chunks and empty output folders."""
+    workspace = Path(tempfile.mkdtemp(prefix='uidai-equiv-'))
+    for path in BASE_DIR.glob('*.py'):
+        shutil.copy2(path, workspace / path.name)
+    for folder in ('notebooks', 'powerbi_data'):
+        (workspace / folder).mkdir()
+        for path in (BASE_DIR / folder).glob('*.py'):
+            shutil.copy2(path, workspace / folder / path.name)
+    for folder in ('cleaned_data', 'outputs', 'visualizations'):
+        (workspace / folder).mkdir(exist_ok=True)
+    for directory in RAW_DIRS.values():
+        shutil.copytree(inputs / directory, workspace / directory)
+    return workspace
+
+
+def run_path(inputs: Path, argv, prepare=None):
+    """
+    Run ``pipeline.py --no-plots --trace`` with ``argv`` in a fresh
+    workspace. Returns ({relative csv path: DataFrame}, {stage: wall s},
+    {stage: peak RSS MB}).
+    """
+    workspace = make_workspace(inputs)
+    try:
+        if prepare:
+            prepare(workspace)
+        command = [sys.executable, 'pipeline.py', '--no-plots', '--trace', 'trace.json'] + list(argv)
+        with open(workspace / 'run.log', 'w') as log:
+            result = subprocess.run(command, cwd=workspace, stdout=log, stderr=subprocess.STDOUT)
+        if result.returncode != 0:
+            tail = (workspace / 'run.log').read_text().splitlines()[-20:]
+            raise RuntimeError(f"'{' '.join(argv)}' failed (exit {result.returncode}):\n" +
+                               '\n'.join(tail))
+
+        outputs = {}
+        for folder in OUTPUT_DIRS:
+            for path in sorted((workspace / folder).rglob('*.csv')):
+                outputs[path.relative_to(workspace).as_posix()] = pd.read_csv(path)
+        stages = json.loads((workspace / 'trace.json').read_text())['stages']
+        top = [s for s in sorted(stages, key=lambda s: (s['depth'], s['start_s'])) if s['depth'] <= 1]
+        timings = {s['name']: s['wall_s'] for s in top}
+        peaks = {s['name']: s['peak_rss_mb'] for s in top}
+        return outputs, timings, peaks
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def best_of(inputs, argv, prepare=None, repeat=1):
+    """
+    Outputs and peak RSS of the first run, and the fastest wall time per
+    stage over ``repeat`` runs.
+    """
+    outputs, timings, peaks = run_path(inputs, argv, prepare)
+    for _ in range(repeat - 1):
+        _, again, _ = run_path(inputs, argv, prepare)
+        timings = {name: min(wall, again.get(name, wall)) for name, wall in timings.items()}
+    return outputs, timings, peaks
+
+
+# =============================================================================
+# DIFFS
+# =============================================================================
+
+def _canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """Columns in name order, rows sorted on every column (exact columns first)."""
+    df = df[sorted(df.columns)]
+    floats = [c for c in df.columns if pd.api.types.is_float_dtype(df[c])]
+    order = [c for c in df.columns if c not in floats] + floats
+    return df.sort_values(order, kind='mergesort', na_position='last').reset_index(drop=True)
+
+
+def diff_tables(expected: pd.DataFrame, actual: pd.DataFrame, rtol=RTOL, atol=ATOL) -> list:
+    """Human-readable differences between two tables, ignoring row order."""
+    if set(expected.columns) != set(actual.columns):
+        missing = sorted(set(expected.columns) - set(actual.columns))
+        extra = sorted(set(actual.columns) - set(expected.columns))
+        return [f"columns differ (missing {missing}, extra {extra})"]
+    if len(expected) != len(actual):
+        return [f"row count {len(actual):,} != {len(expected):,}"]
+
+    expected, actual = _canonical(expected), _canonical(actual[expected.columns])
+    problems = []
+    for column in expected.columns:
+        a, b = expected[column], actual[column]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            same = np.isclose(a.to_numpy(float), b.to_numpy(float), rtol=rtol, atol=atol,
+                              equal_nan=True)
+        else:
+            same = (a.astype(str) == b.astype(str)).to_numpy()
+        bad = np.flatnonzero(~same)
+        if len(bad):
+            cells = ', '.join(f"row {i}: {a.iloc[i]} vs {b.iloc[i]}" for i in bad[:MAX_REPORTED_CELLS])
+            problems.append(f"column '{column}': {len(bad):,} cells differ ({cells})")
+    if len(problems) > MAX_REPORTED_COLUMNS:
+        problems = problems[:MAX_REPORTED_COLUMNS] + [
+            f"... and {len(problems) - MAX_REPORTED_COLUMNS} more columns"]
+    return problems
+
+
+def diff_outputs(expected: dict, actual: dict, rtol=RTOL, atol=ATOL) -> dict:
+    """{file: [differences]} for every file that is missing, extra or different."""
+    divergent = {}
+    for name in sorted(set(expected) | set(actual)):
+        if name not in actual:
+            divergent[name] = ["missing from the alternative path"]
+        elif name not in expected:
+            divergent[name] = ["not written by the reference path"]
+        else:
+            problems = diff_tables(expected[name], actual[name], rtol, atol)
+            if problems:
+                divergent[name] = problems
+    return divergent
+
+
+# =============================================================================
+# HARNESS
+# =============================================================================
+
+def speedups(reference: dict, alternative: dict, ref_peaks=None, alt_peaks=None) -> pd.DataFrame:
+    """Per-stage wall times, the reference / alternative ratio and the peak RSS of both."""
+    ref_peaks, alt_peaks = ref_peaks or {}, alt_peaks or {}
+    rows = [{'stage': name, 'reference_s': ref, 'alternative_s': alternative[name],
+             'speedup': ref / alternative[name] if alternative[name] > 0 else np.nan,
+             'reference_mb': ref_peaks.get(name), 'alternative_mb': alt_peaks.get(name)}
+            for name, ref in reference.items() if name in alternative]
+    return pd.DataFrame(rows, columns=['stage', 'reference_s', 'alternative_s', 'speedup',
+                                       'reference_mb', 'alternative_mb'])
+
+
+def budget_report(argv, peaks) -> list:
+    """Lines comparing each budgeted stage's peak RSS with ``--memory-budget``, if given."""
+    if '--memory-budget' not in argv:
+        return []
+    import memory_budget
+    size = argv[argv.index('--memory-budget') + 1]
+    limit = memory_budget.parse_size(size) / 2 ** 20
+    lines = []
+    for name in BUDGETED_STAGES:
+        if peaks.get(name) is not None:
+            within = 'within' if peaks[name] <= limit else 'OVER'
+            lines.append(f"  {name}: peak RSS {peaks[name]:,.0f} MB ({within} the {size} budget)")
+    return lines
+
+
+def check(variants=None, source='synthetic', pincodes=500, days=60, fraction=0.05,
+          repeat=1, rtol=RTOL, atol=ATOL, reference=REFERENCE):
+    """
+    Run the reference path and every variant on the same inputs; raise
+    DivergenceError listing every difference if any output diverges.
+    ``variants`` maps name -> (pipeline arguments, preparation or None).
+    """
+    variants = VARIANTS if variants is None else variants
+    inputs = Path(tempfile.mkdtemp(prefix='uidai-equiv-inputs-'))
+    try:
+        if source == 'synthetic':
+            synthetic_raw_data(inputs, pincodes, days)
+            described = f"synthetic: {pincodes:,} pincodes x {days} days"
+        else:
+            sample_raw_data(inputs, fraction)
+            described = f"raw sample: {fraction:.1%} of pincodes"
+
+        print("=" * 70)
+        print(f"EQUIVALENCE CHECK ({described})")
+        print("=" * 70)
+        print(f"\n[reference] pipeline.py {' '.join(reference)}")
+        t0 = time.perf_counter()
+        expected, ref_times, ref_peaks = best_of(inputs, reference, repeat=repeat)
+        print(f"  {len(expected)} output tables in {time.perf_counter() - t0:.1f}s")
+
+        failures = {}
+        for name, (argv, prepare) in variants.items():
+            print(f"\n[{name}] pipeline.py {' '.join(argv)}" + (f" (after {prepare.__name__})" if prepare else ""))
+            actual, alt_times, alt_peaks = best_of(inputs, argv, prepare, repeat)
+            divergent = diff_outputs(expected, actual, rtol, atol)
+            print(f"  Outputs: {len(actual) - len(divergent)}/{len(set(expected) | set(actual))} identical"
+                  f" within rtol={rtol:g}, atol={atol:g}")
+            for file, problems in divergent.items():
+                for problem in problems:
+                    print(f"  DIVERGED {file}: {problem}")
+            print(speedups(ref_times, alt_times, ref_peaks, alt_peaks).to_string(
+                index=False, float_format='%.2f'))
+            for line in budget_report(argv, alt_peaks):
+                print(line)
+            if divergent:
+                failures[name] = divergent
+    finally:
+        shutil.rmtree(inputs, ignore_errors=True)
+
+    if failures:
+        raise DivergenceError(
+            "Outputs diverged from the reference path in: " +
+            '; '.join(f"{name} ({', '.join(files)})" for name, files in failures.items()))
+    print("\n✓ Every variant matches the reference outputs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check optimized paths against the reference outputs")
+    parser.add_argument('--variant', action='append', choices=list(VARIANTS),
+                        help="Variant to check (repeatable; default: all)")
+    parser.add_argument('--alt-args', help="Check a custom alternative, e.g. \"all --shards 8\"")
+    parser.add_argument('--source', choices=['synthetic', 'raw'], default='synthetic')
+    parser.add_argument('--pincodes', type=int, default=500, help="Synthetic pincodes")
+    parser.add_argument('--days', type=int, default=60, help="Synthetic days")
+    parser.add_argument('--fraction', type=float, default=0.05, help="Raw pincode sample fraction")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per path for timing")
+    parser.add_argument('--rtol', type=float, default=RTOL)
+    parser.add_argument('--atol', type=float, default=ATOL)
+    args = parser.parse_args()
+
+    variants = {name: VARIANTS[name] for name in (args.variant or [])}
+    if args.alt_args:
+        variants['custom'] = (shlex.split(args.alt_args), None)
+    try:
+        check(variants or None, args.source, args.pincodes, args.days, args.fraction,
+              args.repeat, args.rtol, args.atol)
+    except DivergenceError as exc:
+        print(f"\n✗ {exc}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Unified Activity Fact Table
+===========================
+Aligns the three cleaned datasets once, into one wide table at
+(pincode, date) grain that carries every age-bucket column:
+
+    pincode, date, state, district,
+    age_0_5, age_5_17, age_18_greater,          (enrolment)
+    demo_age_5_17, demo_age_17_,                (demographic)
+    bio_age_5_17, bio_age_17_,                  (biometric)
+    <dataset>_rows, <dataset>_first_row         (per dataset)
+
+Each dataset is reduced to one integer key per row (pincode, day and
+(state, district) spelling codes packed into an int64), sorted, and summed
+per key; the three sorted key runs are then merged in one pass and every
+dataset's sums are placed by binary search, with zeros where it has no
+rows. A pincode whose rows carry more than one spelling of its state or
+district keeps one fact per spelling, so name-level summaries stay exact.
+
+``<dataset>_rows`` counts the cleaned rows folded into a fact (0 where the
+dataset has none, which tells a zero count from a missing one) and
+``<dataset>_first_row`` is the position of the first of them, so the
+per-dataset views (``FactTable.frames``) come back in the cleaned files'
+first-occurrence order and "first state per pincode" is unchanged.
+
+The anomaly, Power BI, lag and correlation stages read the table instead
+of joining the datasets themselves. It is saved to
+cleaned_data/activity_facts.pkl, and standalone stage runs use it when it
+is newer than the cleaned CSVs (``load_current``). The report stage keeps
+reading the cleaned rows, since it deduplicates them.
+
+Usage:
+    python pipeline.py facts
+    python fact_table.py
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_validation import COUNT_COLUMNS
+from instrumentation import traced
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "cleaned_data"
+FACT_PATH = DATA_DIR / "activity_facts.pkl"
+
+DATASETS = ('enrolment', 'demographic', 'biometric')
+KEY_COLUMNS = ['pincode', 'date', 'state', 'district']
+
+
+# =============================================================================
+# INTEGER KEYS
+# =============================================================================
+
+def _pincode_values(values: pd.Series) -> pd.Series:
+    """Pincodes as integers when they all are (as the cleaned CSVs read back)."""
+    if values.dtype == object:
+        numeric = pd.to_numeric(values, errors='coerce')
+        if numeric.notna().all() and (numeric % 1 == 0).all():
+            return numeric.astype(np.int64)
+    return values
+
+
+def _dimension(values: pd.Series, order=None):
+    """(integer code per value, distinct values); codes follow ``order`` when given."""
+    codes, uniques = pd.factorize(values, sort=order is None, use_na_sentinel=False)
+    if order is not None:
+        rank = order(pd.Series(uniques))
+        codes = rank[codes]
+        uniques = np.asarray(uniques, dtype=object)[np.argsort(rank)]
+    return codes.astype(np.int64), np.asarray(uniques)
+
+
+def _date_order(dates: pd.Series) -> np.ndarray:
+    """Rank of each distinct date string: chronological, unparseable last."""
+    parsed = pd.to_datetime(dates, format='%d-%m-%Y', errors='coerce')
+    order = pd.DataFrame({'parsed': parsed, 'raw': dates.astype(str)}).sort_values(
+        ['parsed', 'raw'], na_position='last', kind='stable').index.to_numpy()
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank
+
+
+def _name_dimension(states: pd.Series, districts: pd.Series):
+    """(code per row, DataFrame of distinct raw (state, district) spellings)."""
+    state_codes, state_values = pd.factorize(states, use_na_sentinel=False)
+    district_codes, district_values = pd.factorize(districts, use_na_sentinel=False)
+    pairs = state_codes.astype(np.int64) * len(district_values) + district_codes
+    codes, uniques = pd.factorize(pairs, sort=True)
+    names = pd.DataFrame({'state': np.asarray(state_values, dtype=object)[uniques // len(district_values)],
+                          'district': np.asarray(district_values, dtype=object)[uniques % len(district_values)]})
+    return codes.astype(np.int64), names
+
+
+def _sorted_sums(keys: np.ndarray, counts: np.ndarray):
+    """
+    Distinct keys in order, with the counts summed per key, the rows per
+    key and the first row of each key (the sort is stable, so that is the
+    earliest row).
+    """
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    sums = (np.add.reduceat(counts[order], starts, axis=0) if len(keys)
+            else np.zeros((0, counts.shape[1]), dtype=counts.dtype))
+    rows = np.diff(np.r_[starts, len(keys)])
+    return keys[starts], sums, rows, order[starts]
+
+
+def merge_sorted(*runs: np.ndarray) -> np.ndarray:
+    """
+    Distinct keys of several sorted key arrays, in order. The stable sort
+    (timsort) finds the pre-sorted runs and merges them in linear time.
+    """
+    merged = np.concatenate(runs)
+    merged.sort(kind='stable')
+    return merged[np.r_[True, merged[1:] != merged[:-1]]] if len(merged) else merged
+
+
+# =============================================================================
+# THE TABLE
+# =============================================================================
+
+class FactTable:
+    """The wide (pincode, date) table and the column layout of each dataset."""
+
+    def __init__(self, table: pd.DataFrame, columns: dict):
+        self.table = table
+        self.columns = columns
+        self._views = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def dataset(self, name) -> pd.DataFrame:
+        """
+        One dataset's facts shaped like its cleaned frame (same columns, in
+        first-occurrence order); sums over them match sums over its rows.
+        Built once and shared, so callers must not modify it.
+        """
+        if name not in self._views:
+            rows = self.table[self.table[f'{name}_rows'].to_numpy() > 0]
+            rows = rows.iloc[np.argsort(rows[f'{name}_first_row'].to_numpy(), kind='stable')]
+            self._views[name] = rows[self.columns[name]].reset_index(drop=True)
+        return self._views[name]
+
+    def frames(self):
+        """(enrolment, demographic, biometric) views, see ``dataset``."""
+        return tuple(self.dataset(name) for name in DATASETS)
+
+    def name_counts(self) -> dict:
+        """Cleaned rows per raw (state, district) pair, as name_normalization.name_counts."""
+        rows = self.table[[f'{name}_rows' for name in DATASETS]].sum(axis=1)
+        counts = rows.groupby([self.table['state'], self.table['district']], dropna=False).sum()
+        return {(None if pd.isna(state) else state, None if pd.isna(district) else district): int(n)
+                for (state, district), n in counts.items()}
+
+    def save(self, path: Path = FACT_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle({'table': self.table, 'columns': self.columns}, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path = FACT_PATH) -> 'FactTable':
+        data = pd.read_pickle(path)
+        return cls(data['table'], data['columns'])
+
+
+@traced()
+def build_fact_table(enrolment_df, demographic_df, biometric_df) -> FactTable:
+    """Sort-merge the three cleaned datasets into one ``FactTable``."""
+    frames = dict(zip(DATASETS, (enrolment_df, demographic_df, biometric_df)))
+    bounds = np.cumsum([0] + [len(df) for df in frames.values()])
+
+    def stacked(column):
+        return pd.concat([df[column] for df in frames.values()], ignore_index=True)
+
+    # Shared dimensions, so every dataset's keys are comparable
+    pincode_codes, pincodes = _dimension(_pincode_values(stacked('pincode')))
+    date_codes, dates = _dimension(stacked('date'), order=_date_order)
+    name_codes, names = _name_dimension(stacked('state'), stacked('district'))
+    if len(pincodes) * len(dates) * len(names) >= 2 ** 63:
+        raise ValueError("Too many distinct pincodes, dates and names to pack into int64 keys")
+    keys = (pincode_codes * len(dates) + date_codes) * len(names) + name_codes
+
+    runs = {}
+    for (name, df), lo, hi in zip(frames.items(), bounds[:-1], bounds[1:]):
+        counts = df[COUNT_COLUMNS[name]].fillna(0).to_numpy()
+        runs[name] = _sorted_sums(keys[lo:hi], counts)
+    merged = merge_sorted(*(run[0] for run in runs.values()))
+    index_dtype = np.int32 if bounds[-1] < 2 ** 31 else np.int64
+
+    width, depth = max(len(names), 1), max(len(dates), 1)
+    table = pd.DataFrame({'pincode': pincodes[merged // width // depth],
+                          'date': dates[merged // width % depth],
+                          'state': names['state'].to_numpy()[merged % width],
+                          'district': names['district'].to_numpy()[merged % width]})
+    for name, (run_keys, sums, rows, first_rows) in runs.items():
+        at = np.searchsorted(merged, run_keys)
+        for i, column in enumerate(COUNT_COLUMNS[name]):
+            values = np.zeros(len(merged), dtype=sums.dtype)
+            values[at] = sums[:, i]
+            table[column] = values
+        for column, values, missing in ((f'{name}_rows', rows, 0), (f'{name}_first_row', first_rows, -1)):
+            placed = np.full(len(merged), missing, dtype=index_dtype)
+            placed[at] = values
+            table[column] = placed
+
+    columns = {name: [c for c in df.columns if c in KEY_COLUMNS + COUNT_COLUMNS[name]]
+               for name, df in frames.items()}
+    print(f"  {len(table):,} facts from {bounds[-1]:,} cleaned rows "
+          f"({len(pincodes):,} pincodes x {len(dates):,} dates)")
+    return FactTable(table, columns)
+
+
+def load_current(path: Path = FACT_PATH, data_dir: Path = DATA_DIR):
+    """The saved table, or None when it is missing or older than any cleaned CSV."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    built = path.stat().st_mtime
+    sources = [Path(data_dir) / f"{name}_cleaned.csv" for name in DATASETS]
+    if any(source.exists() and source.stat().st_mtime > built for source in sources):
+        return None
+    return FactTable.load(path)
+
+
+# =============================================================================
+# STAGE INPUTS
+# =============================================================================
+
+@traced()
+def anomaly_tables(facts: FactTable) -> dict:
+    """
+    The per-pincode and per-date tables behind anomaly patterns 1-3, each
+    from one group-by of the wide table instead of per-dataset group-bys
+    and an outer merge: {'misuse', 'imbalance', 'daily'}, laid out as
+    ``mapreduce.anomaly_tables`` returns them.
+    """
+    import anomaly_detection
+
+    table = facts.table
+    totals = pd.DataFrame({
+        'pincode': table['pincode'],
+        'date': table['date'],
+        'enrolment': table[COUNT_COLUMNS['enrolment']].sum(axis=1),
+        'child': table['age_0_5'] + table['age_5_17'],
+        'demographic': table[COUNT_COLUMNS['demographic']].sum(axis=1),
+        'adult': table['demo_age_17_'],
+        'biometric': table[COUNT_COLUMNS['biometric']].sum(axis=1),
+        **{f'{name}_rows': table[f'{name}_rows'] for name in DATASETS},
+    })
+    names = facts.dataset('enrolment').groupby('pincode')[['state', 'district']].first()
+    by_pincode = totals.drop(columns='date').groupby('pincode').sum()
+    has = {name: by_pincode[f'{name}_rows'] > 0 for name in DATASETS}
+
+    def per_pincode(left, right):
+        # One row per pincode with rows in either dataset; a dataset's total
+        # is missing (then 0) where it has none, as after an outer merge
+        present = has[left[0]] | has[right[0]]
+        pincodes = by_pincode.index[present]
+
+        def values(dataset, total):
+            kept = by_pincode.loc[present, total]
+            return (kept if has[dataset][present].all() else kept.where(has[dataset][present])).to_numpy()
+
+        return pd.DataFrame({'pincode': pincodes,
+                             left[2]: values(*left[:2]),
+                             'state': names['state'].reindex(pincodes).to_numpy(),
+                             'district': names['district'].reindex(pincodes).to_numpy(),
+                             right[2]: values(*right[:2])}).fillna(0)
+
+    misuse = per_pincode(('enrolment', 'enrolment', 'enrolment_count'),
+                         ('biometric', 'biometric', 'biometric_update_count'))
+    imbalance = per_pincode(('enrolment', 'child', 'child_enrolment'),
+                            ('demographic', 'adult', 'adult_demographic_count'))
+
+    by_date = totals.drop(columns='pincode').groupby('date').sum()
+    daily = tuple(by_date.loc[by_date[f'{name}_rows'] > 0, name].rename('total')
+                  for name in DATASETS)
+    return {
+        'misuse': anomaly_detection.add_biometric_rate(misuse),
+        'imbalance': anomaly_detection.add_adult_child_ratio(imbalance),
+        'daily': daily,
+    }
+
+
+@traced()
+def powerbi_partials(facts: FactTable) -> dict:
+    """
+    Partial sums for the Power BI summaries, keyed by grain as (bio, demo,
+    enrol) frames like ``mapreduce.powerbi_partials``, from one group-by of
+    the prepared wide table per grain.
+    """
+    import mapreduce
+    import name_normalization
+
+    table = facts.table
+    prepared = table[KEY_COLUMNS].copy()
+    prepared['date'] = pd.to_datetime(prepared['date'], format='%d-%m-%Y', errors='coerce')
+    prepared['bio_total'] = table[COUNT_COLUMNS['biometric']].sum(axis=1)
+    prepared['demo_total'] = table[COUNT_COLUMNS['demographic']].sum(axis=1)
+    prepared['enrol_total'] = table[COUNT_COLUMNS['enrolment']].sum(axis=1)
+    prepared['child_count'] = table['age_0_5'] + table['age_5_17']
+    prepared['adult_count'] = table['age_18_greater']
+    rows = [f'{name}_rows' for name in mapreduce.POWERBI_COLUMNS]
+    prepared[rows] = table[rows]
+
+    names = name_normalization.resolve_names(facts.name_counts())
+    (prepared,) = name_normalization.normalize_frames(prepared, region_col='region', names=names)
+
+    partials = {}
+    values = [c for columns in mapreduce.POWERBI_COLUMNS.values() for c in columns] + rows
+    for key, by in mapreduce.POWERBI_KEYS.items():
+        sums = prepared.groupby(by)[values].sum()
+        partials[key] = tuple(sums.loc[sums[f'{name}_rows'] > 0, columns].reset_index()
+                              for name, columns in mapreduce.POWERBI_COLUMNS.items())
+    return partials
+
+
+def main(enrolment_df=None, demographic_df=None, biometric_df=None, path: Path = FACT_PATH):
+    """
+    Build the fact table and save it. Cleaned DataFrames may be passed in
+    to reuse data already held in memory; otherwise they are loaded from
+    ``DATA_DIR``.
+    """
+    print("=" * 70)
+    print("ACTIVITY FACT TABLE")
+    print("=" * 70)
+
+    if enrolment_df is None or demographic_df is None or biometric_df is None:
+        print("\nLoading cleaned datasets...")
+        enrolment_df = pd.read_csv(DATA_DIR / "enrolment_cleaned.csv")
+        demographic_df = pd.read_csv(DATA_DIR / "demographic_cleaned.csv")
+        biometric_df = pd.read_csv(DATA_DIR / "biometric_cleaned.csv")
+
+    print("\nMerging the datasets on (pincode, date)...")
+    facts = build_fact_table(enrolment_df, demographic_df, biometric_df)
+    saved = facts.save(path)
+    print(f"\n✓ Saved: {saved.name}")
+    return facts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Per-State Volume Forecasts for Capacity Planning
+=================================================
+Fits a weekly-seasonal model to each state's daily enrolment, demographic
+and biometric volumes (and to the national totals) and writes forecast
+tables with 95% intervals to the Power BI folder:
+
+    powerbi_data/state_volume_forecast.csv
+    powerbi_data/national_volume_forecast.csv
+
+Model: SARIMAX(1,0,0)x(1,0,0,7) with a constant, on log1p(volume), over a
+calendar-day axis. Days without data are treated as missing observations
+by the Kalman filter, so gaps in the extracts need no imputation.
+
+Fitted parameters are kept in powerbi_data/forecast_state.json. On a
+refresh each model is re-filtered through the new days with its stored
+parameters (no optimization); parameters are re-estimated only when a
+series is new or its last fit is more than REFIT_DAYS old, starting from
+the stored values. Series are fitted across a process pool.
+"""
+
+import argparse
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+POWERBI_DIR = BASE_DIR / "powerbi_data"
+STATE_PATH = POWERBI_DIR / "forecast_state.json"
+
+HORIZON_DAYS = 28
+REFIT_DAYS = 28
+MIN_OBSERVATIONS = 21
+ORDER = (1, 0, 0)
+SEASONAL_ORDER = (1, 0, 0, 7)
+MODEL_SPEC = f"sarimax{ORDER}x{SEASONAL_ORDER}+c/log1p"
+
+NATIONAL = 'All India'
+
+# dataset -> column in state_date_trends.csv / daily_national_summary.csv
+DATASETS = {
+    'enrolment': ('enrolment', 'enrol_total'),
+    'demographic': ('demographic', 'demo_total'),
+    'biometric': ('biometric', 'bio_total'),
+}
+
+
+def load_series(state_trends: pd.DataFrame, national: pd.DataFrame) -> dict:
+    """Daily volume series keyed by (scope, dataset), scope a state or NATIONAL."""
+    series = {}
+    state_trends = state_trends.assign(date=pd.to_datetime(state_trends['date']))
+    for state, group in state_trends.groupby('state', sort=True):
+        group = group.groupby('date').sum(numeric_only=True)
+        for dataset, (state_col, _) in DATASETS.items():
+            series[(state, dataset)] = group[state_col]
+    national = national.assign(date=pd.to_datetime(national['date'])).groupby('date').sum(numeric_only=True)
+    for dataset, (_, national_col) in DATASETS.items():
+        series[(NATIONAL, dataset)] = national[national_col]
+    return series
+
+
+def state_key(scope, dataset):
+    return f"{dataset}|{scope}"
+
+
+def load_model_state(path: Path = STATE_PATH) -> dict:
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_model_state(state: dict, path: Path = STATE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+
+def _forecast_one(task):
+    """
+    Fit or update one series and forecast it. Runs in a worker process.
+    Returns (key, forecast frame or None, new model state or None, status).
+    """
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    key, dates, values, stored, horizon = task
+    observed = pd.Series(values, index=pd.DatetimeIndex(dates)).sort_index()
+    if observed.gt(0).sum() < MIN_OBSERVATIONS:
+        return key, None, stored, 'skipped'
+
+    endog = np.log1p(observed.asfreq('D'))
+    last = endog.index[-1]
+    model = SARIMAX(endog, order=ORDER, seasonal_order=SEASONAL_ORDER, trend='c')
+
+    reusable = (stored is not None and stored.get('spec') == MODEL_SPEC
+                and len(stored.get('params', [])) == len(model.param_names))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if reusable and (last - pd.Timestamp(stored['fitted_through'])).days < REFIT_DAYS:
+            result = model.filter(np.asarray(stored['params']))
+            status, fitted_through = 'updated', stored['fitted_through']
+        else:
+            start = np.asarray(stored['params']) if reusable else None
+            result = model.fit(start_params=start, disp=False, maxiter=200)
+            status, fitted_through = ('refitted' if reusable else 'fitted'), last.strftime('%Y-%m-%d')
+        frame = result.get_forecast(horizon).summary_frame(alpha=0.05)
+
+    forecast = pd.DataFrame({
+        'date': frame.index.strftime('%Y-%m-%d'),
+        'forecast': np.expm1(frame['mean']).clip(lower=0).round(1).to_numpy(),
+        'lower_95': np.expm1(frame['mean_ci_lower']).clip(lower=0).round(1).to_numpy(),
+        'upper_95': np.expm1(frame['mean_ci_upper']).clip(lower=0).round(1).to_numpy(),
+    })
+    new_state = {
+        'spec': MODEL_SPEC,
+        'params': [float(p) for p in result.params],
+        'fitted_through': fitted_through,
+        'data_through': last.strftime('%Y-%m-%d'),
+    }
+    return key, forecast, new_state, status
+
+
+@traced()
+def run_forecasts(series: dict, model_state: dict, horizon=HORIZON_DAYS, max_workers=None):
+    """
+    Forecast every series, reusing ``model_state``. Returns
+    (forecast frames keyed by (scope, dataset), updated model state, status counts).
+    """
+    tasks = [((scope, dataset), s.index.to_numpy(), s.to_numpy(dtype=float),
+              model_state.get(state_key(scope, dataset)), horizon)
+             for (scope, dataset), s in series.items()]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_forecast_one, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_forecast_one(task) for task in tasks]
+
+    forecasts, new_state, counts = {}, dict(model_state), {}
+    for (scope, dataset), forecast, stored, status in results:
+        counts[status] = counts.get(status, 0) + 1
+        if forecast is not None:
+            forecasts[(scope, dataset)] = forecast
+            new_state[state_key(scope, dataset)] = stored
+    return forecasts, new_state, counts
+
+
+def build_forecast_tables(forecasts: dict) -> dict:
+    """Long-format state and national forecast tables."""
+    frames = [f.assign(state=scope, dataset=dataset) for (scope, dataset), f in forecasts.items()]
+    columns = ['state', 'dataset', 'date', 'forecast', 'lower_95', 'upper_95']
+    combined = (pd.concat(frames, ignore_index=True)[columns] if frames
+                else pd.DataFrame(columns=columns))
+    national = combined[combined['state'] == NATIONAL].drop(columns='state')
+    states = combined[combined['state'] != NATIONAL]
+    return {
+        'state_volume_forecast.csv': states.sort_values(['state', 'dataset', 'date']).reset_index(drop=True),
+        'national_volume_forecast.csv': national.sort_values(['dataset', 'date']).reset_index(drop=True),
+    }
+
+
+def main(tables=None, powerbi_dir: Path = POWERBI_DIR, horizon=HORIZON_DAYS, max_workers=None,
+         refit=False):
+    """
+    Forecast from the Power BI summaries. ``tables`` may hold
+    ``state_date_trends.csv`` and ``daily_national_summary.csv`` already in
+    memory; otherwise they are read from ``powerbi_dir``.
+    """
+    print("=" * 60)
+    print("VOLUME FORECASTS FOR CAPACITY PLANNING")
+    print("=" * 60)
+
+    tables = tables or {}
+    state_trends = tables.get('state_date_trends.csv')
+    national = tables.get('daily_national_summary.csv')
+    if state_trends is None:
+        state_trends = pd.read_csv(powerbi_dir / 'state_date_trends.csv')
+    if national is None:
+        national = pd.read_csv(powerbi_dir / 'daily_national_summary.csv')
+
+    series = load_series(state_trends, national)
+    state_path = powerbi_dir / STATE_PATH.name
+    model_state = {} if refit else load_model_state(state_path)
+    print(f"\nForecasting {len(series)} series, {horizon} days ahead...")
+
+    forecasts, model_state, counts = run_forecasts(series, model_state, horizon, max_workers)
+    print("  " + ", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+
+    forecast_tables = build_forecast_tables(forecasts)
+    for name, df in forecast_tables.items():
+        df.to_csv(powerbi_dir / name, index=False)
+        print(f"  Saved: {name} ({len(df)} rows)")
+    save_model_state(model_state, state_path)
+    return forecast_tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast daily volumes per state")
+    parser.add_argument('--horizon', type=int, default=HORIZON_DAYS, help="Days to forecast")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--refit', action='store_true', help="Ignore stored model state")
+    args = parser.parse_args()
+    main(horizon=args.horizon, max_workers=args.workers, refit=args.refit)
@@ -0,0 +1,279 @@
+"""
+Stage Instrumentation - Timing, Memory and Row Counts
+======================================================
+Records wall time, CPU time, peak RSS and rows in/out for pipeline stages
+and their sub-steps, and writes one JSON trace per run plus a short
+summary table.
+
+    from instrumentation import stage, traced
+
+    @traced()                       # rows counted from DataFrame args/results
+    def build_state_summary(...): ...
+
+    with stage('sync.filter', rows_in=len(df)) as s:
+        ...
+        s.rows_out = len(clean)
+
+Tracing is off unless ``enable()`` is called (``pipeline.py --trace``).
+While off, ``stage`` returns a shared no-op object and ``traced``
+functions call straight through after a single global check.
+
+Peak RSS is per stage on Linux (the kernel's high-water mark is reset at
+each stage start through /proc/self/clear_refs); elsewhere it falls back
+to the process-wide peak so far.
+"""
+
+import functools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PROC_STATUS = Path('/proc/self/status')
+_PROC_CLEAR_REFS = Path('/proc/self/clear_refs')
+
+_active = None
+
+
+def _read_status_kb(field):
+    for line in _PROC_STATUS.read_text().splitlines():
+        if line.startswith(field):
+            return int(line.split()[1])
+    return None
+
+
+def _can_reset_peak():
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return _read_status_kb('VmHWM:') is not None
+    except OSError:
+        return False
+
+
+class _RssProbe:
+    """Current and peak resident set size in MB, resettable where supported."""
+
+    def __init__(self):
+        self.resettable = _can_reset_peak()
+        if self.resettable:
+            self.method = 'per-stage (VmHWM)'
+        elif resource is not None:
+            self.method = 'process peak so far (ru_maxrss)'
+        else:
+            self.method = 'unavailable'
+
+    def current(self):
+        if self.resettable:
+            return _read_status_kb('VmRSS:') / 1024
+        return None
+
+    def peak(self):
+        if self.resettable:
+            return _read_status_kb('VmHWM:') / 1024
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        return None
+
+    def reset(self):
+        if self.resettable:
+            with open(_PROC_CLEAR_REFS, 'w') as f:
+                f.write('5')
+
+
+def count_rows(*values):
+    """Total rows across DataFrames in ``values`` (one level into tuples/lists/dicts)."""
+    total, found = 0, False
+    for value in values:
+        if isinstance(value, dict):
+            candidates = value.values()
+        elif isinstance(value, (tuple, list)):
+            candidates = value
+        else:
+            candidates = (value,)
+        for item in candidates:
+            shape = getattr(item, 'shape', None)
+            if isinstance(shape, tuple) and len(shape) == 2:
+                total += shape[0]
+                found = True
+    return total if found else None
+
+
+class _NullStage:
+    """Stand-in returned by ``stage`` while tracing is off."""
+
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, trace, name, rows_in=None):
+        self.trace = trace
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak = 0.0
+
+    def __enter__(self):
+        trace = self.trace
+        probe = trace.rss
+        self.parent = trace.stack[-1] if trace.stack else None
+        self.depth = len(trace.stack)
+        if self.parent is not None:
+            self.parent.peak = max(self.parent.peak, probe.peak() or 0.0)
+        probe.reset()
+        self.rss_start = probe.current()
+        trace.stack.append(self)
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        trace = self.trace
+        self.peak = max(self.peak, trace.rss.peak() or 0.0)
+        if self.parent is not None:
+            self.parent.peak = max(self.parent.peak, self.peak)
+        trace.stack.pop()
+        rss_end = trace.rss.current()
+
+        trace.records.append({
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'depth': self.depth,
+            'start_s': round(self.wall_start - trace.wall_start, 4),
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'peak_rss_mb': round(self.peak, 1) if self.peak else None,
+            'rss_delta_mb': (round(rss_end - self.rss_start, 1)
+                             if rss_end is not None and self.rss_start is not None else None),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'status': 'ok' if exc_type is None else f'error: {exc_type.__name__}',
+        })
+        return False
+
+
+class Trace:
+    """All stage records of one run."""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.wall_start = time.perf_counter()
+        self.rss = _RssProbe()
+        self.stack = []
+        self.records = []
+
+    def to_dict(self):
+        return {
+            'run': {
+                'label': self.label,
+                'started': self.started,
+                'pid': os.getpid(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'peak_rss_method': self.rss.method,
+            },
+            # Records are appended on exit; list them in start order
+            'stages': sorted(self.records, key=lambda r: r['start_s']),
+        }
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def summary(self) -> str:
+        """Plain-text table of every stage, indented by nesting depth."""
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else '-'
+
+        lines = [f"{'Stage':<40} {'Wall s':>8} {'CPU s':>8} {'Peak MB':>8} {'Rows in':>11} {'Rows out':>11}"]
+        lines.append('-' * len(lines[0]))
+        for r in self.to_dict()['stages']:
+            name = ('  ' * r['depth'] + r['name'])[:40]
+            if r['status'] != 'ok':
+                name = (name + ' !')[:40]
+            lines.append(f"{name:<40} {r['wall_s']:>8.2f} {r['cpu_s']:>8.2f} "
+                         f"{fmt(r['peak_rss_mb'], '>8.1f'):>8} {fmt(r['rows_in'], ',d'):>11} "
+                         f"{fmt(r['rows_out'], ',d'):>11}")
+        return '\n'.join(lines)
+
+
+def enable(label=None) -> Trace:
+    """Start recording stages into a new trace."""
+    global _active
+    _active = Trace(label)
+    return _active
+
+
+def disable():
+    """Stop recording; returns the finished trace (or None)."""
+    global _active
+    trace, _active = _active, None
+    return trace
+
+
+def enabled() -> bool:
+    return _active is not None
+
+
+def stage_peak():
+    """
+    Peak RSS in MB of the innermost open stage so far, including the
+    sub-stages that already reset the high-water mark (None when not tracing).
+    """
+    if _active is None or not _active.stack:
+        return None
+    return max(_active.stack[-1].peak, _active.rss.peak() or 0.0)
+
+
+def stage(name, rows_in=None):
+    """Context manager timing a block; set ``.rows_out`` on it before leaving."""
+    if _active is None:
+        return _NULL_STAGE
+    return _Stage(_active, name, rows_in)
+
+
+def traced(name=None):
+    """
+    Decorator timing every call of a function as a stage. Rows in/out are
+    counted from DataFrame arguments and return values.
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _Stage(_active, label, count_rows(args, kwargs)) as s:
+                result = func(*args, **kwargs)
+                s.rows_out = count_rows(result)
+            return result
+        return wrapper
+    return decorate
@@ -0,0 +1,229 @@
+"""
+Vectorized Lag Analysis for Delayed Biometric Completion
+=========================================================
+Finds, for every region, the lag at which biometric activity best follows
+enrolment activity, and writes the regions whose best lag is long.
+
+All region daily series are stacked into 2-D (region x date) arrays and the
+Pearson correlation between enrolment at ``t`` and biometrics at ``t + lag``
+is computed for every lag and every region at once:
+
+    * the lagged cross products come from one FFT cross-correlation,
+    * the per-lag window sums and sums of squares come from prefix sums,
+
+so the cost is O(R * n log n) instead of a Python loop over regions and
+lags. Works at district level (``STATE - DISTRICT``) and pincode level.
+
+Lags are counted in steps of the synchronized date axis, which are days
+wherever the common dates are consecutive. Regions with fewer than
+MIN_DATA_POINTS active days are not reported, as their best lag rests on a
+handful of overlapping points.
+
+Output columns: region, best_lag_days, correlation, data_points
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "cleaned_data"
+OUTPUT_DIR = BASE_DIR / "outputs"
+
+MAX_LAG_DAYS = 30
+MIN_REPORTED_LAG = 7
+MIN_DATA_POINTS = 10  # active days a region needs before its best lag is trusted
+CHUNK_REGIONS = 4096
+
+OUTPUT_FILES = {
+    'district': 'delayed_biometric_completion_regions.csv',
+    'pincode': 'delayed_biometric_completion_pincodes.csv',
+}
+
+
+def region_labels(df: pd.DataFrame, level: str) -> pd.Series:
+    """Region key for each row: ``STATE - DISTRICT`` or the pincode."""
+    if level == 'district':
+        return df['state'].str.strip().str.upper() + ' - ' + df['district'].str.strip().str.upper()
+    if level == 'pincode':
+        return df['pincode'].astype(str).str.replace(r'\.0$', '', regex=True).str.strip()
+    raise ValueError(f"Unknown level '{level}' (use 'district' or 'pincode')")
+
+
+def stack_region_series(frames, level='district'):
+    """
+    Build aligned (region x date) matrices of daily totals for several
+    datasets. ``frames`` is a list of (DataFrame, value columns) pairs; the
+    regions and dates are the union over all of them.
+
+    Returns (regions, dates, [matrix per frame]).
+    """
+    totals = [df[columns].sum(axis=1).to_numpy(dtype=float) for df, columns in frames]
+    frame_dates = [pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce') for df, _ in frames]
+
+    regions, region_codes = np.unique(
+        np.concatenate([region_labels(df, level).to_numpy(dtype=str) for df, _ in frames]),
+        return_inverse=True)
+    dates, date_codes = np.unique(
+        np.concatenate([d.to_numpy() for d in frame_dates]), return_inverse=True)
+
+    valid = ~pd.isna(dates[date_codes])
+    n_regions, n_dates = len(regions), len(dates)
+    keep_dates = ~pd.isna(dates)
+
+    matrices = []
+    bounds = np.cumsum([0] + [len(df) for df, _ in frames])
+    for total, lo, hi in zip(totals, bounds[:-1], bounds[1:]):
+        keep = valid[lo:hi]
+        flat = region_codes[lo:hi][keep] * n_dates + date_codes[lo:hi][keep]
+        matrix = np.bincount(flat, weights=total[keep],
+                             minlength=n_regions * n_dates).reshape(n_regions, n_dates)
+        matrices.append(matrix[:, keep_dates])
+    return regions, dates[keep_dates], matrices
+
+
+def stack_daily_series(enrol_df, bio_df, level='district'):
+    """
+    Build aligned (region x date) matrices of daily enrolment and biometric
+    totals. Returns (regions, dates, enrol_matrix, bio_matrix).
+    """
+    regions, dates, (enrol, bio) = stack_region_series(
+        [(enrol_df, ['age_0_5', 'age_5_17', 'age_18_greater']),
+         (bio_df, [c for c in bio_df.columns if c.startswith('bio_age')])], level)
+    return regions, dates, enrol, bio
+
+
+def lagged_correlations(x, y, max_lag=MAX_LAG_DAYS):
+    """
+    Pearson correlation of ``x[:, t]`` with ``y[:, t + lag]`` for every row
+    and every lag in 0..max_lag. Returns an (R, max_lag + 1) array with NaN
+    where either window has no variance.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_regions, n = x.shape
+    max_lag = min(max_lag, n - 2)
+    if max_lag < 0:
+        return np.full((n_regions, 0), np.nan)
+    lags = np.arange(max_lag + 1)
+    m = (n - lags).astype(float)  # overlapping points per lag
+
+    # Centre each series to keep the prefix-sum formulas well conditioned
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+
+    # sum_t x[t] * y[t + lag] for all lags via one linear cross-correlation
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    cross = np.fft.irfft(np.conj(np.fft.rfft(x, size, axis=1)) * np.fft.rfft(y, size, axis=1),
+                         size, axis=1)[:, :max_lag + 1]
+
+    zeros = np.zeros((n_regions, 1))
+    cx = np.hstack([zeros, np.cumsum(x, axis=1)])
+    cxx = np.hstack([zeros, np.cumsum(x * x, axis=1)])
+    cy = np.hstack([zeros, np.cumsum(y, axis=1)])
+    cyy = np.hstack([zeros, np.cumsum(y * y, axis=1)])
+
+    sx = cx[:, n - lags]                 # x[0 : n - lag]
+    sxx = cxx[:, n - lags]
+    sy = cy[:, [n]] - cy[:, lags]        # y[lag : n]
+    syy = cyy[:, [n]] - cyy[:, lags]
+
+    cov = cross - sx * sy / m
+    var_x = sxx - sx * sx / m
+    var_y = syy - sy * sy / m
+    denom = np.sqrt(np.clip(var_x, 0, None) * np.clip(var_y, 0, None))
+
+    tol = 1e-9 * np.maximum(cxx[:, [n]], 1) * np.maximum(cyy[:, [n]], 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = np.where(denom * denom > tol, cov / denom, np.nan)
+    return np.clip(corr, -1, 1)
+
+
+@traced()
+def find_best_lags(enrol_df, bio_df, level='district', max_lag=MAX_LAG_DAYS,
+                   chunk_size=CHUNK_REGIONS) -> pd.DataFrame:
+    """Best lag and its correlation for every region (all regions, unfiltered)."""
+    regions, dates, enrol, bio = stack_daily_series(enrol_df, bio_df, level)
+
+    best_lag = np.zeros(len(regions), dtype=int)
+    best_corr = np.full(len(regions), np.nan)
+    for start in range(0, len(regions), chunk_size):
+        stop = start + chunk_size
+        corr = lagged_correlations(enrol[start:stop], bio[start:stop], max_lag)
+        if corr.shape[1] == 0:
+            continue
+        has_value = ~np.all(np.isnan(corr), axis=1)
+        filled = np.where(np.isnan(corr), -np.inf, corr)
+        lag = np.argmax(filled, axis=1)
+        best_lag[start:stop] = np.where(has_value, lag, 0)
+        best_corr[start:stop] = np.where(has_value, filled[np.arange(len(lag)), lag], np.nan)
+
+    data_points = np.count_nonzero((enrol > 0) | (bio > 0), axis=1)
+    return pd.DataFrame({
+        'region': regions,
+        'best_lag_days': best_lag,
+        'correlation': best_corr,
+        'data_points': data_points,
+    })
+
+
+def delayed_regions(lags: pd.DataFrame, min_lag=MIN_REPORTED_LAG,
+                    min_data_points=MIN_DATA_POINTS) -> pd.DataFrame:
+    """
+    Regions with at least ``min_data_points`` active days whose best lag is
+    at least ``min_lag``, longest lag first.
+    """
+    delayed = lags[(lags['best_lag_days'] >= min_lag) & lags['correlation'].notna() &
+                   (lags['data_points'] >= min_data_points)]
+    return delayed.sort_values(['best_lag_days', 'region'], ascending=[False, True]).reset_index(drop=True)
+
+
+def main(enrol_df=None, bio_df=None, level='district', max_lag=MAX_LAG_DAYS,
+         min_lag=MIN_REPORTED_LAG, min_data_points=MIN_DATA_POINTS,
+         output_dir: Path = OUTPUT_DIR):
+    print("=" * 70)
+    print(f"LAG ANALYSIS - DELAYED BIOMETRIC COMPLETION ({level.upper()} LEVEL)")
+    print("=" * 70)
+
+    if enrol_df is None or bio_df is None:
+        import fact_table
+        facts = fact_table.load_current()
+        if facts is not None:
+            print("\nReading the activity fact table...")
+            enrol_df, _, bio_df = facts.frames()
+        else:
+            print("\nLoading cleaned datasets...")
+            enrol_df = pd.read_csv(DATA_DIR / "enrolment_cleaned.csv")
+            bio_df = pd.read_csv(DATA_DIR / "biometric_cleaned.csv")
+
+    lags = find_best_lags(enrol_df, bio_df, level, max_lag)
+    delayed = delayed_regions(lags, min_lag, min_data_points)
+
+    print(f"\n  Regions analysed:            {len(lags):,}")
+    print(f"  Regions with >= {min_data_points} points:   {(lags['data_points'] >= min_data_points).sum():,}")
+    print(f"  Regions with lag >= {min_lag} days: {len(delayed):,}")
+    if len(delayed) > 0:
+        print("\nTop 10 Delayed Regions:")
+        print(delayed.head(10).to_string(index=False))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    out_path = output_dir / OUTPUT_FILES[level]
+    delayed.to_csv(out_path, index=False)
+    print(f"\n✓ Saved: {out_path.name}")
+    return delayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrolment-to-biometric lag analysis")
+    parser.add_argument('--level', choices=list(OUTPUT_FILES), default='district')
+    parser.add_argument('--max-lag', type=int, default=MAX_LAG_DAYS)
+    parser.add_argument('--min-lag', type=int, default=MIN_REPORTED_LAG)
+    parser.add_argument('--min-data-points', type=int, default=MIN_DATA_POINTS)
+    args = parser.parse_args()
+    main(level=args.level, max_lag=args.max_lag, min_lag=args.min_lag,
+         min_data_points=args.min_data_points)
@@ -0,0 +1,328 @@
+"""
+Hash-Partitioned Map-Reduce Execution
+=====================================
+Runs the aggregation of the sync, anomaly and Power BI stages as
+map-reduce over pincode shards:
+
+    partition   rows are hash-partitioned by pincode into N shards and
+                written to disk as  <dir>/shard-NNN/<dataset>.pkl  with a
+                manifest.json describing the layout
+    map         a worker process loads one shard and returns partial
+                aggregates for it (key sets, per-pincode tables, sums)
+    reduce      the driver merges the partials and hands them to the
+                existing stage code, which writes the usual outputs
+
+Every pincode lives in exactly one shard, so per-pincode results are
+complete within their shard, and everything else is an integer sum or a
+set union, so the outputs are byte-identical to the single-process run.
+The shard directories only need a shared filesystem, so the map step can
+later be spread across machines by handing out shard paths.
+
+Usage:
+    python pipeline.py all --shards 8 --workers 4
+    python mapreduce.py verify --shards 8        # compare against the single-process run
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+BASE_DIR = Path(__file__).parent
+SHARD_DIR = BASE_DIR / "cleaned_data" / "shards"
+DEFAULT_SHARDS = 8
+
+HASH_MULTIPLIER = 2654435761  # Knuth's multiplicative hash, stable across processes
+
+POWERBI_COLUMNS = {
+    'biometric': ['bio_total'],
+    'demographic': ['demo_total'],
+    'enrolment': ['enrol_total', 'child_count', 'adult_count'],
+}
+POWERBI_KEYS = {
+    'state_date': ['state', 'date'],
+    'district': ['state', 'district', 'region'],
+    'pincode': ['pincode'],
+}
+
+
+# =============================================================================
+# PARTITIONING
+# =============================================================================
+
+def shard_of(pincodes, shards) -> np.ndarray:
+    """Shard number of every pincode (ints, floats or strings)."""
+    keys = pd.to_numeric(pd.Series(pincodes), errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    hashed = (np.abs(keys).astype(np.uint64) * np.uint64(HASH_MULTIPLIER)) % np.uint64(2 ** 32)
+    return (hashed % np.uint64(shards)).astype(np.int64)
+
+
+@traced()
+def write_partitions(frames: dict, shards=DEFAULT_SHARDS, directory: Path = SHARD_DIR) -> list:
+    """
+    Split each DataFrame in ``frames`` (dataset name -> rows) into pincode
+    shards under ``directory``. Shard rows are indexed by their position in
+    the input so reducers can restore the original order. Returns the shard
+    directories.
+    """
+    directory = Path(directory)
+    for old in directory.glob('shard-*'):
+        shutil.rmtree(old)
+    shard_dirs = [directory / f"shard-{i:03d}" for i in range(shards)]
+    for shard_dir in shard_dirs:
+        shard_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = {}
+    for name, df in frames.items():
+        ids = shard_of(df['pincode'], shards)
+        order = np.argsort(ids, kind='stable')
+        bounds = np.searchsorted(ids[order], np.arange(shards + 1))
+        for i, shard_dir in enumerate(shard_dirs):
+            positions = order[bounds[i]:bounds[i + 1]]
+            part = df.iloc[positions]
+            part.index = positions
+            part.to_pickle(shard_dir / f"{name}.pkl")
+        rows[name] = np.bincount(ids, minlength=shards).tolist()
+
+    manifest = {
+        'shards': shards,
+        'partition_key': 'pincode',
+        'hash': f"(pincode * {HASH_MULTIPLIER}) mod 2^32 mod shards",
+        'layout': 'shard-NNN/<dataset>.pkl',
+        'rows': rows,
+    }
+    (directory / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    return shard_dirs
+
+
+def load_shard(shard_dir: Path, *names):
+    return [pd.read_pickle(Path(shard_dir) / f"{name}.pkl") for name in names]
+
+
+def run_map(func, shard_dirs, workers=None, **kwargs) -> list:
+    """Apply ``func(shard_dir, **kwargs)`` to every shard over a process pool."""
+    workers = min(workers or os.cpu_count() or 1, len(shard_dirs))
+    task = partial(func, **kwargs)
+    if workers <= 1:
+        return [task(d) for d in shard_dirs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(task, shard_dirs))
+
+
+def _concat(parts):
+    """Concatenate partials, ignoring empty ones so they cannot change dtypes."""
+    non_empty = [p for p in parts if len(p)]
+    return pd.concat(non_empty) if non_empty else parts[0]
+
+
+def _restore_order(parts, original: pd.DataFrame) -> pd.DataFrame:
+    """Reassemble shard rows in input order with the input's index labels."""
+    combined = _concat(parts).sort_index()
+    combined.index = original.index[combined.index.to_numpy()]
+    return combined
+
+
+# =============================================================================
+# SYNC: common dates and pincodes
+# =============================================================================
+
+def _sync_keys(shard_dir):
+    """Map: standardize the shard and return its date and pincode sets per dataset."""
+    import data_cleaning_sync as sync
+    keys = {}
+    for name in ('enrolment', 'demographic', 'biometric'):
+        df, = load_shard(shard_dir, name)
+        df = sync.standardize_pincode(sync.standardize_date(df, sync.DATE_COL), sync.PINCODE_COL)
+        df.to_pickle(Path(shard_dir) / f"{name}_standardized.pkl")
+        keys[name] = (set(df[sync.DATE_COL].dropna().unique()),
+                      set(df[sync.PINCODE_COL].dropna().unique()))
+    return keys
+
+
+def _sync_filter(shard_dir, common_dates):
+    """Map: keep the rows on common dates whose pincode is in all three datasets."""
+    import data_cleaning_sync as sync
+    frames = load_shard(shard_dir, 'enrolment_standardized', 'demographic_standardized',
+                        'biometric_standardized')
+    pincodes = set.intersection(*(set(df[sync.PINCODE_COL].dropna().unique()) for df in frames))
+    return [df[df[sync.DATE_COL].isin(common_dates) & df[sync.PINCODE_COL].isin(pincodes)].copy()
+            for df in frames]
+
+
+@traced()
+def synchronize_sharded(enrolment_df, demographic_df, biometric_df,
+                        shards=DEFAULT_SHARDS, workers=None, directory: Path = SHARD_DIR):
+    """
+    Map-reduce version of ``data_cleaning_sync.synchronize_datasets`` with
+    the same return value: (enrolment, demographic, biometric, common
+    dates, common pincodes).
+    """
+    print(f"\n[Steps 2-5] Synchronizing over {shards} pincode shards...")
+    originals = {'enrolment': enrolment_df, 'demographic': demographic_df, 'biometric': biometric_df}
+    shard_dirs = write_partitions(originals, shards, Path(directory) / 'sync')
+
+    keys = run_map(_sync_keys, shard_dirs, workers)
+    dates = {name: set().union(*(k[name][0] for k in keys)) for name in originals}
+    common_dates = set.intersection(*dates.values())
+    common_pincodes = set().union(*(set.intersection(*(k[name][1] for name in originals))
+                                    for k in keys))
+    for name in originals:
+        pincodes = set().union(*(k[name][1] for k in keys))
+        print(f"  {name.title():<12} {len(dates[name]):>5,} dates, {len(pincodes):>7,} pincodes")
+    print(f"  Common dates across all:    {len(common_dates):,}")
+    print(f"  Common pincodes across all: {len(common_pincodes):,}")
+
+    parts = run_map(_sync_filter, shard_dirs, workers, common_dates=common_dates)
+    cleaned = [_restore_order([p[i] for p in parts], df) for i, df in enumerate(originals.values())]
+
+    print("\nCleaned Dataset Shapes:")
+    for (name, df), clean in zip(originals.items(), cleaned):
+        print(f"  {name.title() + ':':<13}{clean.shape[0]:>10,} rows "
+              f"(removed {df.shape[0] - clean.shape[0]:,} rows)")
+    return (*cleaned, common_dates, common_pincodes)
+
+
+# =============================================================================
+# ANOMALIES: per-pincode tables and daily totals
+# =============================================================================
+
+def _anomaly_map(shard_dir):
+    """Map: per-pincode misuse/imbalance tables and daily totals of one shard."""
+    import anomaly_detection
+    enrolment_df, demographic_df, biometric_df = load_shard(
+        shard_dir, 'enrolment', 'demographic', 'biometric')
+    return {
+        'misuse': anomaly_detection.misuse_table(enrolment_df, biometric_df),
+        'imbalance': anomaly_detection.imbalance_table(enrolment_df, demographic_df),
+        'daily': anomaly_detection.daily_activity(enrolment_df, demographic_df, biometric_df),
+    }
+
+
+@traced()
+def anomaly_tables(enrolment_df, demographic_df, biometric_df,
+                   shards=DEFAULT_SHARDS, workers=None, directory: Path = SHARD_DIR) -> dict:
+    """
+    The tables behind the three anomaly patterns, built shard by shard:
+    {'misuse': DataFrame, 'imbalance': DataFrame, 'daily': (enrol, demo, bio)}.
+    """
+    print(f"\nAggregating over {shards} pincode shards...")
+    shard_dirs = write_partitions({'enrolment': enrolment_df, 'demographic': demographic_df,
+                                   'biometric': biometric_df}, shards, Path(directory) / 'anomalies')
+    parts = run_map(_anomaly_map, shard_dirs, workers)
+
+    tables = {}
+    for key in ('misuse', 'imbalance'):
+        # Pincodes never span shards: concatenating and re-sorting gives the global table
+        table = _concat([p[key] for p in parts])
+        tables[key] = table.sort_values('pincode', kind='stable').reset_index(drop=True)
+    tables['daily'] = tuple(_concat([p['daily'][i] for p in parts]).groupby(level=0).sum()
+                            for i in range(3))
+    return tables
+
+
+# =============================================================================
+# POWER BI: partial sums by state/date, district and pincode
+# =============================================================================
+
+def _powerbi_map(shard_dir, names):
+    """Map: prepared rows of one shard summed at each summary's grain."""
+    import prepare_powerbi_data
+    frames = prepare_powerbi_data.prepare_frames(
+        *load_shard(shard_dir, 'biometric', 'demographic', 'enrolment'), names=names)
+    return {key: tuple(df.groupby(by)[columns].sum().reset_index()
+                       for df, columns in zip(frames, POWERBI_COLUMNS.values()))
+            for key, by in POWERBI_KEYS.items()}
+
+
+@traced()
+def powerbi_partials(bio_df, demo_df, enrol_df, shards=DEFAULT_SHARDS, workers=None,
+                     directory: Path = SHARD_DIR, names=None) -> dict:
+    """
+    Partial sums for the Power BI summaries, keyed by grain ('state_date',
+    'district', 'pincode') as (bio, demo, enrol) frames. Summing them again
+    in the summary builders gives the same tables as summing the rows.
+    ``names`` may supply district name groups resolved elsewhere (needed
+    when the frames are pre-aggregated, e.g. fact_table views).
+    """
+    import name_normalization
+
+    print(f"\nAggregating over {shards} pincode shards...")
+    shard_dirs = write_partitions({'biometric': bio_df, 'demographic': demo_df,
+                                   'enrolment': enrol_df}, shards, Path(directory) / 'powerbi')
+    # District spelling groups depend on counts over all rows, so resolve them once
+    if names is None:
+        names = name_normalization.resolve_names(name_normalization.name_counts(bio_df, demo_df, enrol_df))
+    parts = run_map(_powerbi_map, shard_dirs, workers, names=names)
+    return {key: tuple(_concat([p[key][i] for p in parts]).reset_index(drop=True) for i in range(3))
+            for key in POWERBI_KEYS}
+
+
+# =============================================================================
+# VERIFICATION
+# =============================================================================
+
+def verify(shards=DEFAULT_SHARDS, workers=None):
+    """Compare sharded and single-process anomaly and Power BI tables byte for byte."""
+    import anomaly_detection
+    import prepare_powerbi_data
+
+    enrolment_df, demographic_df, biometric_df = anomaly_detection.load_cleaned_data()
+    tables = anomaly_tables(enrolment_df, demographic_df, biometric_df, shards, workers)
+    expected = {
+        'misuse': anomaly_detection.misuse_table(enrolment_df.copy(), biometric_df.copy()),
+        'imbalance': anomaly_detection.imbalance_table(enrolment_df.copy(), demographic_df.copy()),
+    }
+    daily = anomaly_detection.daily_activity(enrolment_df.copy(), demographic_df.copy(),
+                                             biometric_df.copy())
+    for i, name in enumerate(('enrolment', 'demographic', 'biometric')):
+        expected[f'daily {name}'] = daily[i].reset_index()
+        tables[f'daily {name}'] = tables['daily'][i].reset_index()
+
+    single = prepare_powerbi_data.build_powerbi_tables(biometric_df, demographic_df, enrolment_df)
+    sharded = prepare_powerbi_data.build_powerbi_tables(biometric_df, demographic_df, enrolment_df,
+                                                        shards, workers)
+    expected.update(single)
+    tables.update(sharded)
+
+    print("\n" + "=" * 70)
+    print(f"MAP-REDUCE VERIFICATION ({shards} shards)")
+    print("=" * 70)
+    identical = True
+    for name, table in expected.items():
+        same = table.to_csv(index=False) == tables[name].to_csv(index=False)
+        identical &= same
+        print(f"  {name:<35} {'identical' if same else 'DIFFERENT'}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pincode-sharded map-reduce execution")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('partition', help="Write the cleaned datasets as pincode shards")
+    p.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+    p.add_argument('--dir', type=Path, default=SHARD_DIR / 'cleaned')
+    p = sub.add_parser('verify', help="Check sharded outputs match the single-process run")
+    p.add_argument('--shards', type=int, default=DEFAULT_SHARDS)
+    p.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'partition':
+        import anomaly_detection
+        enrolment_df, demographic_df, biometric_df = anomaly_detection.load_cleaned_data()
+        shard_dirs = write_partitions({'enrolment': enrolment_df, 'demographic': demographic_df,
+                                       'biometric': biometric_df}, args.shards, args.dir)
+        print(f"Wrote {len(shard_dirs)} shards to {args.dir}")
+    else:
+        raise SystemExit(0 if verify(args.shards, args.workers) else 1)
+
+
+if __name__ == "__main__":
+    main()
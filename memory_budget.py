@@ -0,0 +1,564 @@
+"""
+Memory-Budgeted Ingestion and Aggregation
+=========================================
+Runs the sync, anomaly and Power BI stages within a declared memory budget
+(``--memory-budget 512M``) instead of holding whole datasets in memory:
+
+    chunking    CSVs are read in row chunks sized from the budget and the
+                in-memory width of a sample row (CHUNK_SHARE of the budget,
+                allowing WORKING_COPIES copies while a chunk is transformed)
+    aggregates  group-by sums are folded in chunk by chunk by a
+                SpillingAggregator; when its partials outgrow their share
+                of the budget they are hash-partitioned into bucket files
+                under cleaned_data/spill/ and every bucket is finished on
+                its own, so no grouping is ever held whole
+    two passes  sync spills the standardized raw chunks to disk while it
+                collects the date and pincode sets, then filters them and
+                appends them to the cleaned CSVs in input order
+
+All sums are integer and 'first' values are taken in input order, so the
+outputs match the in-memory run. Tables built bucket by bucket (misuse
+scores, sustained runs) may list their rows in another order.
+
+The budget is for the whole process: pipeline.py measures the RSS in use
+(interpreter, pandas) once and hands the same MemoryBudget to every stage,
+which sizes its chunks and aggregates from the headroom left at that point.
+When little or none is left, chunks drop to MIN_CHUNK_ROWS and aggregates
+spill early instead of failing. Each budgeted stage reports its peak RSS
+against the budget; run equivalence.py with the
+'memory-budget' variant for the slowdown against the in-memory run. The
+report, lag, correlate and forecast stages still load the cleaned data
+whole.
+
+Usage:
+    python pipeline.py all --memory-budget 512M
+    python pipeline.py anomalies --memory-budget 1G
+"""
+
+import math
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import raw_chunks
+from data_validation import COUNT_COLUMNS
+from instrumentation import _RssProbe, traced
+
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "cleaned_data"
+SPILL_DIR = DATA_DIR / "spill"
+
+DATASETS = ('enrolment', 'demographic', 'biometric')
+
+CHUNK_SHARE = 0.1         # one chunk being read and transformed
+AGGREGATE_SHARE = 0.4     # partial aggregates held in memory, split across aggregators
+WORKING_SHARE = 0.4       # one bucket of every aggregator while it is finished
+WORKING_COPIES = 4        # copies a frame goes through while it is parsed and transformed
+COMPRESSION_RATIO = 8     # assumed size ratio of a .csv.gz/.csv.zst chunk when estimating rows
+SAMPLE_ROWS = 1_000
+MIN_CHUNK_ROWS = 1_000
+MIN_AVAILABLE = 16 * 2 ** 20
+
+UNITS = {'': 1, 'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30, 'T': 2 ** 40}
+
+
+def parse_size(size) -> int:
+    """Bytes in a size such as 512M, 2G, 1.5g, 800MB or a plain byte count."""
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d*)?)\s*([KMGT]?)(?:I?B)?\s*', str(size), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid memory size '{size}' (e.g. 512M or 2G)")
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def _mb(n_bytes) -> str:
+    return f"{n_bytes / 2 ** 20:,.0f} MB"
+
+
+class MemoryBudget:
+    """
+    A process-wide memory limit and the chunk, spill and bucket sizes
+    derived from it. Build one per run and hand it to every stage (see
+    ``as_budget``), so all of them count against the same baseline.
+    """
+
+    def __init__(self, limit):
+        self.limit = parse_size(limit)
+        self.probe = _RssProbe()
+        self.baseline = self._in_use()
+
+    def _in_use(self) -> int:
+        in_use = self.probe.current()
+        return int(in_use * 2 ** 20) if in_use else 0
+
+    @property
+    def headroom(self) -> int:
+        """Bytes between the limit and the RSS in use now (never below the baseline)."""
+        return self.limit - max(self.baseline, self._in_use())
+
+    @property
+    def available(self) -> int:
+        """
+        Bytes the next chunk or aggregate may take. Small or negative
+        headroom falls back to MIN_AVAILABLE, which means minimum-size
+        chunks and early spills rather than an error.
+        """
+        return max(self.headroom, MIN_AVAILABLE)
+
+    def chunk_rows(self, row_bytes) -> int:
+        """Rows per read chunk for rows of ``row_bytes`` in memory."""
+        rows = self.available * CHUNK_SHARE / (max(row_bytes, 1) * WORKING_COPIES)
+        return max(int(rows), MIN_CHUNK_ROWS)
+
+    def aggregate_bytes(self, aggregators=1) -> int:
+        """In-memory limit of each of ``aggregators`` aggregators filled side by side."""
+        return int(self.available * AGGREGATE_SHARE / aggregators)
+
+    def buckets(self, expected_bytes) -> int:
+        """Spill buckets for input of ``expected_bytes``, so one bucket fits the working share."""
+        return max(1, math.ceil(expected_bytes * WORKING_COPIES / (self.available * WORKING_SHARE)))
+
+    def describe(self) -> str:
+        headroom = self.headroom
+        if headroom < MIN_AVAILABLE:
+            return (f"{_mb(self.limit)} budget, {_mb(max(headroom, 0))} left above the "
+                    f"{_mb(self.limit - headroom)} in use: minimum chunks, spilling early")
+        return (f"{_mb(self.limit)} budget, {_mb(headroom)} above the "
+                f"{_mb(self.limit - headroom)} in use")
+
+    def start_stage(self):
+        """Restart the peak RSS that ``report`` prints (traced stages restart it already)."""
+        if not instrumentation.enabled():
+            self.probe.reset()
+
+    def report(self):
+        """Print the peak RSS against the budget."""
+        peak = instrumentation.stage_peak() if instrumentation.enabled() else self.probe.peak()
+        if peak is None:
+            return
+        within = peak * 2 ** 20 <= self.limit
+        print(f"\n  Peak RSS: {peak:,.0f} MB ({'within' if within else 'OVER'} the "
+              f"{_mb(self.limit)} memory budget)")
+
+
+def as_budget(memory_budget) -> MemoryBudget:
+    """
+    The MemoryBudget shared by the run, or a new one for a size such as
+    '512M', with its peak restarted so ``report`` covers the calling stage.
+    """
+    budget = memory_budget if isinstance(memory_budget, MemoryBudget) else MemoryBudget(memory_budget)
+    budget.start_stage()
+    return budget
+
+
+# =============================================================================
+# CHUNKED READING
+# =============================================================================
+
+def profile(paths) -> tuple:
+    """
+    (in-memory bytes per row, estimated rows) of CSV files, from a sample
+    of the first file.
+    """
+    chunks = raw_chunks.iter_chunk(paths[0], SAMPLE_ROWS)
+    sample = next(chunks, None)
+    chunks.close()
+    if sample is None or not len(sample):
+        return 1.0, 0
+    row_bytes = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    line_bytes = len(sample.to_csv(index=False).encode()) / len(sample)
+    size = sum(Path(p).stat().st_size * (1 if raw_chunks.compression_of(p) is None else COMPRESSION_RATIO)
+               for p in paths)
+    return row_bytes, int(size / line_bytes)
+
+
+def iter_rows(paths, chunk_rows):
+    """Chunks of the CSV files in order, indexed by row position across all of them."""
+    offset = 0
+    for path in paths:
+        for chunk in raw_chunks.iter_chunk(path, chunk_rows):
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+
+
+def _fresh(directory: Path) -> Path:
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+    return directory
+
+
+# =============================================================================
+# SPILLING AGGREGATION
+# =============================================================================
+
+def bucket_of(keys: pd.DataFrame, buckets) -> np.ndarray:
+    """Bucket number of every row of ``keys``, stable across runs."""
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy() % np.uint64(buckets)).astype(np.int64)
+
+
+class SpillingAggregator:
+    """
+    Group-by sums (and first values) over a stream of frames.
+
+    Partials stay in memory until they exceed ``limit`` bytes; they are then
+    combined, and if that is still over half the limit, hash-partitioned by
+    the ``bucket_by`` columns into ``buckets`` pickle files in ``directory``.
+    Each bucket holds every partial for its keys, so it can be finished
+    alone.
+    """
+
+    def __init__(self, keys, sums, firsts=(), limit=256 * 2 ** 20, buckets=1,
+                 directory: Path = SPILL_DIR, bucket_by=None):
+        self.keys = list(keys)
+        self.agg = {**{c: 'sum' for c in sums}, **{c: 'first' for c in firsts}}
+        self.limit = limit
+        self.buckets = buckets
+        self.bucket_by = list(bucket_by or keys)
+        self.directory = Path(directory)
+        self.parts = []
+        self.size = 0
+        self.spills = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self.spills > 0
+
+    def _combine(self, frames) -> pd.DataFrame:
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame(columns=self.keys + list(self.agg))
+        combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        return combined.groupby(self.keys, sort=False).agg(self.agg).reset_index()
+
+    def add(self, df: pd.DataFrame):
+        """Fold in a chunk of rows (or of partials with the same columns)."""
+        if not len(df):
+            return
+        part = self._combine([df[self.keys + list(self.agg)]])
+        self.parts.append(part)
+        self.size += part.memory_usage(deep=True).sum()
+        if self.size > self.limit:
+            combined = self._combine(self.parts)
+            self.parts, self.size = [combined], combined.memory_usage(deep=True).sum()
+            if self.size > self.limit / 2:
+                self._spill(combined)
+
+    def _spill(self, combined):
+        if not self.spilled:
+            _fresh(self.directory)
+        ids = bucket_of(combined[self.bucket_by], self.buckets)
+        for b, piece in combined.groupby(ids):
+            piece.to_pickle(self.directory / f"bucket-{b:04d}-{self.spills:05d}.pkl")
+        self.spills += 1
+        self.parts, self.size = [], 0
+
+    def bucket(self, b) -> pd.DataFrame:
+        """Finished aggregate of the keys in bucket ``b``."""
+        frames = [pd.read_pickle(p) for p in sorted(self.directory.glob(f"bucket-{b:04d}-*.pkl"))]
+        for part in self.parts:
+            frames.append(part[bucket_of(part[self.bucket_by], self.buckets) == b])
+        return self._combine(frames)
+
+    def result(self) -> pd.DataFrame:
+        """The whole finished aggregate (for groupings known to be small)."""
+        if not self.spilled:
+            return self._combine(self.parts)
+        return self._combine([self.bucket(b) for b in range(self.buckets)])
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.parts, self.size = [], 0
+
+
+def joint_buckets(*aggregators):
+    """
+    Yield one finished frame per aggregator, bucket by bucket, covering the
+    same keys (the aggregators must share ``buckets`` and ``bucket_by``).
+    """
+    if not any(a.spilled for a in aggregators):
+        yield tuple(a.result() for a in aggregators)
+        return
+    for b in range(aggregators[0].buckets):
+        yield tuple(a.bucket(b) for a in aggregators)
+
+
+# =============================================================================
+# SYNC: two streaming passes over the raw chunks
+# =============================================================================
+
+@traced()
+def synchronize_within_budget(budget: MemoryBudget, validate=True, variance=True,
+                              directory: Path = SPILL_DIR) -> dict:
+    """
+    Budgeted version of the sync stage's steps 1-7, which also folds in the
+    coverage sketches and (with ``variance``) the region variance chunk by
+    chunk. Returns the row counts, rule counts, common key sets and those
+    accumulators.
+    """
+    import data_cleaning_sync as sync
+    import data_validation
+    import hyperloglog
+    import region_variance
+
+    spill = _fresh(Path(directory) / 'sync')
+    raw_dirs = dict(zip(DATASETS, (sync.ENROLMENT_DIR, sync.DEMOGRAPHIC_DIR, sync.BIOMETRIC_DIR)))
+
+    print(f"\n[Step 1] Streaming raw chunks ({budget.describe()})...")
+    original_rows, rule_counts, dates, pincodes, pieces, quarantine_columns = {}, {}, {}, {}, {}, {}
+    expected = 0
+    for name, raw_dir in raw_dirs.items():
+        paths = raw_chunks.find_chunks(raw_dir)
+        if not paths:
+            raise FileNotFoundError(f"No CSV files found in {raw_dir}")
+        row_bytes, rows = profile(paths)
+        expected += row_bytes * rows
+        chunk_rows = budget.chunk_rows(row_bytes)
+        counts = dict.fromkeys(data_validation.RULES + ['Quarantined_Rows'], 0)
+        dates[name], pincodes[name], pieces[name] = set(), set(), []
+        total = 0
+        for i, chunk in enumerate(iter_rows(paths, chunk_rows)):
+            total += len(chunk)
+            if validate:
+                chunk, quarantined, chunk_counts = data_validation.validate_dataset(chunk, name)
+                for rule, n in chunk_counts.items():
+                    counts[rule] += n
+                quarantine_columns.setdefault(name, list(quarantined.columns))
+                if len(quarantined):
+                    quarantined.to_pickle(spill / f"quarantine-{name}-{i:05d}.pkl")
+            chunk = sync.standardize_pincode(sync.standardize_date(chunk, sync.DATE_COL), sync.PINCODE_COL)
+            dates[name].update(chunk[sync.DATE_COL].dropna().unique())
+            pincodes[name].update(chunk[sync.PINCODE_COL].dropna().unique())
+            pieces[name].append(spill / f"{name}-{i:05d}.pkl")
+            chunk.to_pickle(pieces[name][-1])
+        original_rows[name], rule_counts[name] = total, counts
+        print(f"  {name.title() + ':':<13}{total:>10,} rows in {len(pieces[name])} chunk(s) "
+              f"of up to {chunk_rows:,} rows ({len(paths)} file(s))")
+
+    sync.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if validate:
+        print("\n[Step 1b] Quarantined rows (pincode, date, counts, state):")
+        for name, counts in rule_counts.items():
+            detail = ", ".join(f"{rule}: {counts[rule]:,}" for rule in data_validation.RULES if counts[rule])
+            print(f"  {name.title() + ':':<13} {counts['Quarantined_Rows']:>8,} quarantined" +
+                  (f" ({detail})" if detail else ""))
+        columns = list(dict.fromkeys(c for name in DATASETS for c in quarantine_columns.get(name, [])))
+        target = sync.OUTPUT_DIR / "quarantine.csv"
+        pd.DataFrame(columns=columns).to_csv(target, index=False)
+        for name in DATASETS:
+            for path in sorted(spill.glob(f"quarantine-{name}-*.pkl")):
+                pd.read_pickle(path).reindex(columns=columns).to_csv(target, mode='a', header=False,
+                                                                     index=False)
+        print(f"  Saved: {target}")
+
+    common_dates = set.intersection(*dates.values())
+    common_pincodes = set.intersection(*pincodes.values())
+    print("\n[Steps 2-4] Common dates and pincodes across all datasets...")
+    for name in DATASETS:
+        print(f"  {name.title():<12} {len(dates[name]):>5,} dates, {len(pincodes[name]):>7,} pincodes")
+    print(f"  Common dates across all:    {len(common_dates):,}")
+    print(f"  Common pincodes across all: {len(common_pincodes):,}")
+
+    print("\n[Steps 5-7] Filtering and saving cleaned datasets chunk by chunk...")
+    limit, buckets = budget.aggregate_bytes(len(DATASETS)), budget.buckets(expected)
+    regional = {name: SpillingAggregator(['state', 'district', 'date'], COUNT_COLUMNS[name],
+                                         limit=limit, buckets=buckets, directory=spill / f"variance-{name}",
+                                         bucket_by=['state', 'district'])
+                for name in DATASETS}
+    sketches, cleaned_rows, cleaned_dates, cleaned_pincodes = None, {}, [], []
+    for name in DATASETS:
+        target = sync.OUTPUT_DIR / f"{name}_cleaned.csv"
+        kept, kept_dates, kept_pincodes = 0, set(), set()
+        for i, path in enumerate(pieces[name]):
+            chunk = pd.read_pickle(path)
+            path.unlink()
+            chunk = chunk[chunk[sync.DATE_COL].isin(common_dates) &
+                          chunk[sync.PINCODE_COL].isin(common_pincodes)]
+            chunk.to_csv(target, mode='a' if i else 'w', header=not i, index=False)
+            kept += len(chunk)
+            kept_dates.update(chunk[sync.DATE_COL].unique())
+            kept_pincodes.update(chunk[sync.PINCODE_COL].unique())
+            piece = hyperloglog.dataset_sketches(name, chunk)
+            sketches = piece if sketches is None else sketches.merge(piece)
+            if variance:
+                regional[name].add(chunk)
+        cleaned_rows[name] = kept
+        cleaned_dates.append(kept_dates)
+        cleaned_pincodes.append(kept_pincodes)
+        print(f"  {name.title() + ':':<13}{kept:>10,} rows (removed {original_rows[name] - kept:,} rows)"
+              f" -> {target}")
+
+    sync.report_consistency(cleaned_dates, cleaned_pincodes)
+
+    accumulated = None
+    if variance:
+        accumulated = region_variance.RegionVariance()
+        for frames in joint_buckets(*regional.values()):
+            if any(len(f) for f in frames):
+                accumulated = accumulated.merge(region_variance.RegionVariance().update(*frames))
+    shutil.rmtree(spill, ignore_errors=True)
+
+    return {
+        'original_rows': [original_rows[name] for name in DATASETS],
+        'cleaned_rows': [cleaned_rows[name] for name in DATASETS],
+        'rule_counts': [rule_counts[name] for name in DATASETS] if validate else None,
+        'common_dates': common_dates,
+        'common_pincodes': common_pincodes,
+        'sketches': sketches,
+        'variance': accumulated,
+    }
+
+
+# =============================================================================
+# ANOMALIES: per-pincode, per-date and per-(date, pincode) sums
+# =============================================================================
+
+def _cleaned_paths(data_dir: Path) -> dict:
+    return {name: Path(data_dir) / f"{name}_cleaned.csv" for name in DATASETS}
+
+
+@traced()
+def anomaly_tables(budget: MemoryBudget, data_dir: Path = DATA_DIR,
+                   directory: Path = SPILL_DIR) -> dict:
+    """
+    The tables behind the anomaly patterns, built from budget-sized chunks of
+    the cleaned CSVs: {'misuse', 'imbalance', 'daily', 'scores', 'runs'},
+    where 'scores' is (scores, top-k, window end date).
+    """
+    import activity_matrix
+    import anomaly_detection
+    import misuse_score
+
+    paths = _cleaned_paths(data_dir)
+    profiles = {name: profile([path]) for name, path in paths.items()}
+    limit = budget.aggregate_bytes(3 * len(DATASETS))
+    buckets = budget.buckets(sum(row_bytes * rows for row_bytes, rows in profiles.values()))
+    spill = _fresh(Path(directory) / 'anomalies')
+    print(f"\nAggregating budget-sized chunks ({budget.describe()})...")
+
+    def aggregators(keys, **options):
+        return {name: SpillingAggregator(keys, COUNT_COLUMNS[name], limit=limit, buckets=buckets,
+                                         directory=spill / f"{name}-{'-'.join(keys)}", **options)
+                for name in DATASETS}
+
+    by_pincode = aggregators(['pincode'])
+    by_pincode['enrolment'] = SpillingAggregator(['pincode'], COUNT_COLUMNS['enrolment'],
+                                                 firsts=['state', 'district'], limit=limit,
+                                                 buckets=buckets, directory=spill / 'enrolment-names')
+    by_date = aggregators(['date'])
+    by_day = aggregators(['date', 'pincode'], bucket_by=['pincode'])
+    for name, path in paths.items():
+        chunk_rows = budget.chunk_rows(profiles[name][0])
+        for chunk in iter_rows([path], chunk_rows):
+            for table in (by_pincode, by_date, by_day):
+                table[name].add(chunk)
+        print(f"  {name.title() + ':':<13}{profiles[name][1]:>10,} rows (est.), chunks of {chunk_rows:,}")
+
+    enrol, demo, bio = (by_pincode[name].result() for name in DATASETS)
+    tables = {
+        'misuse': anomaly_detection.misuse_table(enrol.copy(), bio),
+        'imbalance': anomaly_detection.imbalance_table(enrol.copy(), demo),
+        'daily': anomaly_detection.daily_activity(*(by_date[name].result() for name in DATASETS)),
+    }
+
+    # Scores and runs are per pincode: finish them one pincode bucket at a time
+    last_date = max(pd.to_datetime(daily.index.to_series(), format='%d-%m-%Y', errors='coerce').max()
+                    for daily in (tables['daily'][0], tables['daily'][2]))
+    scores, candidates, runs = [], [], []
+    for frames in joint_buckets(*by_day.values()):
+        if not any(len(f) for f in frames):
+            continue
+        day_enrol, day_demo, day_bio = frames
+        scorer = misuse_score.score_history(day_enrol, day_bio, until=last_date)
+        scores.append(scorer.score_table())
+        candidates.append(scorer.top_candidates())
+        runs.append(activity_matrix.detect_sustained_activity(day_enrol, day_demo, day_bio))
+    for table in (*by_pincode.values(), *by_date.values(), *by_day.values()):
+        table.close()
+    shutil.rmtree(spill, ignore_errors=True)
+
+    runs = pd.concat(runs, ignore_index=True)
+    order = runs['dataset'].map({name: i for i, name in enumerate(activity_matrix.DATASET_COLUMNS)})
+    tables['runs'] = (runs.assign(order=order)
+                      .sort_values(['order', 'days', 'activity'], ascending=[True, False, False],
+                                   kind='stable')
+                      .drop(columns='order').reset_index(drop=True))
+    names = enrol.set_index('pincode')[['state', 'district']]
+    tables['scores'] = (*anomaly_detection.misuse_score_tables(scores, candidates, names), last_date)
+    return tables
+
+
+# =============================================================================
+# POWER BI: partial sums by state/date, district and pincode
+# =============================================================================
+
+@traced()
+def powerbi_partials(budget: MemoryBudget, data_dir: Path = DATA_DIR,
+                     directory: Path = SPILL_DIR) -> dict:
+    """
+    Budgeted version of ``mapreduce.powerbi_partials``: the prepared rows
+    summed at each summary's grain, chunk by chunk, keyed by grain as
+    (bio, demo, enrol) frames. The pincode grain is never finished whole:
+    each spill bucket is reduced to pincode-prefix totals
+    (pincode_hierarchy.prefix_totals), returned summed as 'prefix_totals'.
+    """
+    import mapreduce
+    import name_normalization
+    import pincode_hierarchy
+    import prepare_powerbi_data
+
+    paths = {name: _cleaned_paths(data_dir)[name] for name in mapreduce.POWERBI_COLUMNS}
+    profiles = {name: profile([path]) for name, path in paths.items()}
+    chunk_rows = {name: budget.chunk_rows(row_bytes) for name, (row_bytes, _) in profiles.items()}
+
+    # District spelling groups depend on counts over all rows, so resolve them first
+    counts = {}
+    for name, path in paths.items():
+        for chunk in iter_rows([path], chunk_rows[name]):
+            for pair, n in name_normalization.name_counts(chunk).items():
+                counts[pair] = counts.get(pair, 0) + n
+    names = name_normalization.resolve_names(counts)
+
+    spill = _fresh(Path(directory) / 'powerbi')
+    limit = budget.aggregate_bytes(len(mapreduce.POWERBI_KEYS) * len(paths))
+    buckets = budget.buckets(sum(row_bytes * rows for row_bytes, rows in profiles.values()))
+    partials = {key: {name: SpillingAggregator(by, columns, limit=limit, buckets=buckets,
+                                               directory=spill / f"{key}-{name}")
+                      for name, columns in mapreduce.POWERBI_COLUMNS.items()}
+                for key, by in mapreduce.POWERBI_KEYS.items()}
+    empty = {name: pd.read_csv(path, nrows=0) for name, path in paths.items()}
+    for name, path in paths.items():
+        for chunk in iter_rows([path], chunk_rows[name]):
+            frames = {**empty, name: chunk}
+            prepared = dict(zip(paths, prepare_powerbi_data.prepare_frames(*frames.values(), names=names)))
+            for key in partials:
+                partials[key][name].add(prepared[name])
+
+    # The pincode grain is as large as the pincode list: reduce it to prefix totals bucket by bucket
+    by_pincode = partials.pop('pincode')
+    totals = [pincode_hierarchy.prefix_totals(*frames) for frames in joint_buckets(*by_pincode.values())
+              if any(len(f) for f in frames)]
+    result = {key: tuple(aggregator.result() for aggregator in by_name.values())
+              for key, by_name in partials.items()}
+    result['prefix_totals'] = pincode_hierarchy.merge_prefix_totals(totals)
+    shutil.rmtree(spill, ignore_errors=True)
+    return result
+
+
+@traced()
+def coverage_sketches(budget: MemoryBudget, data_dir: Path = DATA_DIR):
+    """Coverage sketches (see hyperloglog.py) folded in from budget-sized chunks."""
+    import hyperloglog
+
+    sketches = None
+    for name, path in _cleaned_paths(data_dir).items():
+        row_bytes, _ = profile([path])
+        for chunk in iter_rows([path], budget.chunk_rows(row_bytes)):
+            piece = hyperloglog.dataset_sketches(name, chunk)
+            sketches = piece if sketches is None else sketches.merge(piece)
+    return sketches
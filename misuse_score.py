@@ -0,0 +1,226 @@
+"""
+Continuous Multi-Window Misuse Score
+====================================
+A graded alternative to the yes/no Pattern 1 flag. For every pincode and
+trailing window of 7, 30 and 90 calendar days:
+
+    score = enrol / (enrol + bio + PRIOR) * log(1 + enrol)
+
+where enrol and bio are the window's enrolment and biometric update
+totals. The first factor is the enrolment share of the pincode's activity
+(near 1 when biometric updates are missing), shrunk toward 0 for small
+volumes by PRIOR; the second weights by volume. No cut-off is involved,
+so a small change in the data only moves the scores a little.
+
+The window sums are rolling: as each day is appended its totals are
+added and the day leaving each window is subtracted, so only the pincodes
+active on those two days are re-scored. A bounded min-heap per window
+keeps the top-k pincodes. Changed pincodes outside the heap are pushed
+through it; only when a heap member's score falls is the top-k reselected
+from the score vector (one sort of the pincode scores).
+
+Outputs (cleaned_data/):
+    misuse_scores.csv    scores and window totals per pincode
+    misuse_top_k.csv     top-k pincodes per window, ranked
+"""
+
+import heapq
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+WINDOWS = (7, 30, 90)   # trailing calendar days
+TOP_K = 50
+PRIOR = 10.0            # pseudo-count of activity that damps tiny pincodes
+
+
+def misuse_score(enrol, bio, prior=PRIOR):
+    """Score for window totals of enrolments and biometric updates."""
+    enrol = np.asarray(enrol, dtype=float)
+    return enrol / (enrol + np.asarray(bio, dtype=float) + prior) * np.log1p(enrol)
+
+
+class TopK:
+    """
+    The k highest-scoring pincode positions, kept in a bounded min-heap.
+    Ties go to the lower position, so the result matches a full sort.
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.heap = []          # (score, -position); heap[0] is the k-th best
+        self.members = {}       # position -> score
+
+    def reselect(self, scores):
+        """Rebuild from the full score vector."""
+        candidates = np.arange(len(scores))
+        if len(scores) > self.k:
+            kth = np.partition(scores, len(scores) - self.k)[len(scores) - self.k]
+            candidates = np.flatnonzero(scores >= kth)
+        best = candidates[np.lexsort((candidates, -scores[candidates]))][:self.k]
+        self.members = {int(i): float(scores[i]) for i in best}
+        self._heapify()
+
+    def _heapify(self):
+        self.heap = [(s, -i) for i, s in self.members.items()]
+        heapq.heapify(self.heap)
+
+    def update(self, scores, changed):
+        """Bring the heap up to date after the scores at ``changed`` moved."""
+        changed = np.asarray(changed, dtype=np.int64)
+        members = np.fromiter(self.members, dtype=np.int64, count=len(self.members))
+        moved = members[np.isin(members, changed)]
+        if (len(self.members) < min(self.k, len(scores)) or
+                any(scores[i] < self.members[i] for i in moved)):
+            self.reselect(scores)
+            return
+        for i in moved:
+            self.members[int(i)] = float(scores[i])
+        self._heapify()
+
+        outside = changed[~np.isin(changed, members)]
+        outside = outside[scores[outside] >= self.heap[0][0]]
+        for i in outside[np.lexsort((outside, -scores[outside]))][:self.k]:
+            entry = (float(scores[i]), -int(i))
+            if entry <= self.heap[0]:
+                break
+            _, out = heapq.heapreplace(self.heap, entry)
+            del self.members[-out]
+            self.members[int(i)] = entry[0]
+
+    def ranked(self):
+        """(position, score) pairs, best first."""
+        return sorted(self.members.items(), key=lambda item: (-item[1], item[0]))
+
+
+class MisuseScorer:
+    """Rolling window totals, scores and top-k pincodes, one day at a time."""
+
+    def __init__(self, windows=WINDOWS, k=TOP_K, prior=PRIOR):
+        self.windows = tuple(windows)
+        self.prior = prior
+        self.pincodes = pd.Index([])
+        self.enrol = {w: np.zeros(0) for w in self.windows}
+        self.bio = {w: np.zeros(0) for w in self.windows}
+        self.scores = {w: np.zeros(0) for w in self.windows}
+        self.top = {w: TopK(k) for w in self.windows}
+        self.days = {w: deque() for w in self.windows}
+        self.last_date = None
+        # When each pincode was first seen (day, 0 = enrolment / 1 = biometric):
+        # positions follow this order, which lets top-k tables be merged
+        self.first_seen = np.zeros(0, dtype=np.int64)
+        self.source = np.zeros(0, dtype=np.int64)
+
+    def _positions(self, pincodes, date, source):
+        positions = self.pincodes.get_indexer(pincodes)
+        if (positions < 0).any():
+            self.pincodes = self.pincodes.append(pd.Index(pincodes[positions < 0]).unique())
+            positions = self.pincodes.get_indexer(pincodes)
+            grow = len(self.pincodes) - len(self.enrol[self.windows[0]])
+            for arrays in (self.enrol, self.bio, self.scores):
+                for w in self.windows:
+                    arrays[w] = np.concatenate([arrays[w], np.zeros(grow)])
+            self.first_seen = np.concatenate([self.first_seen, np.full(grow, date.value)])
+            self.source = np.concatenate([self.source, np.full(grow, source)])
+        return positions
+
+    def append_day(self, date, enrol: pd.Series, bio: pd.Series):
+        """
+        Add one day's per-pincode totals (Series indexed by pincode). Days
+        must be appended in date order.
+        """
+        date = pd.Timestamp(date)
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Days must be appended in order: {date.date()} after "
+                             f"{self.last_date.date()}")
+        self.last_date = date
+        day = (date, self._positions(enrol.index, date, 0), enrol.to_numpy(float),
+               self._positions(bio.index, date, 1), bio.to_numpy(float))
+
+        for w in self.windows:
+            window = self.days[w]
+            window.append(day)
+            np.add.at(self.enrol[w], day[1], day[2])
+            np.add.at(self.bio[w], day[3], day[4])
+            touched = np.zeros(len(self.pincodes), dtype=bool)
+            touched[day[1]] = touched[day[3]] = True
+            while window[0][0] <= date - pd.Timedelta(days=w):
+                _, e_pos, e_val, b_pos, b_val = window.popleft()
+                np.subtract.at(self.enrol[w], e_pos, e_val)
+                np.subtract.at(self.bio[w], b_pos, b_val)
+                touched[e_pos] = touched[b_pos] = True
+
+            changed = np.flatnonzero(touched)
+            self.scores[w][changed] = misuse_score(self.enrol[w][changed], self.bio[w][changed],
+                                                   self.prior)
+            self.top[w].update(self.scores[w], changed)
+
+    def score_table(self) -> pd.DataFrame:
+        table = pd.DataFrame({'pincode': self.pincodes})
+        for w in self.windows:
+            table[f'enrolment_{w}d'] = self.enrol[w].round().astype(np.int64)
+            table[f'biometric_{w}d'] = self.bio[w].round().astype(np.int64)
+            table[f'score_{w}d'] = self.scores[w].round(3)
+        return table
+
+    def top_candidates(self) -> pd.DataFrame:
+        """Top-k pincodes per window with exact scores and first-seen order."""
+        rows = []
+        for w in self.windows:
+            for i, score in self.top[w].ranked():
+                rows.append({'window_days': w, 'pincode': self.pincodes[i], 'score': score,
+                             'enrolment': int(round(self.enrol[w][i])),
+                             'biometric': int(round(self.bio[w][i])),
+                             'first_seen': self.first_seen[i], 'source': self.source[i]})
+        return pd.DataFrame(rows, columns=['window_days', 'pincode', 'score', 'enrolment',
+                                           'biometric', 'first_seen', 'source'])
+
+    def top_table(self) -> pd.DataFrame:
+        return merge_top_tables([self.top_candidates()], self.top[self.windows[0]].k)
+
+
+def merge_top_tables(candidates, k=TOP_K) -> pd.DataFrame:
+    """
+    Ranked top-k table from the ``top_candidates`` of scorers over disjoint
+    pincodes, ordered exactly as one scorer over all of them would rank it.
+    """
+    top = pd.concat(candidates, ignore_index=True).sort_values(
+        ['window_days', 'score', 'first_seen', 'source', 'pincode'],
+        ascending=[True, False, True, True, True], kind='stable')
+    top = top.groupby('window_days').head(k).reset_index(drop=True)
+    top['rank'] = top.groupby('window_days').cumcount() + 1
+    top['score'] = top['score'].round(3)
+    return top[['window_days', 'rank', 'pincode', 'score', 'enrolment', 'biometric']]
+
+
+def daily_totals(df: pd.DataFrame, columns) -> pd.Series:
+    """Per-(date, pincode) activity totals, indexed by datetime date and pincode."""
+    dates = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
+    totals = pd.Series(df[columns].to_numpy().sum(axis=1), index=df.index)
+    return totals.groupby([dates, df['pincode']]).sum()
+
+
+@traced()
+def score_history(enrolment_df, biometric_df, windows=WINDOWS, k=TOP_K, until=None) -> MisuseScorer:
+    """
+    Replay the cleaned data day by day through a ``MisuseScorer``. With
+    ``until`` the windows end on that date even if the data stops earlier.
+    """
+    enrol = daily_totals(enrolment_df, ['age_0_5', 'age_5_17', 'age_18_greater'])
+    bio = daily_totals(biometric_df, ['bio_age_5_17', 'bio_age_17_'])
+    empty = pd.Series(dtype=float)
+
+    scorer = MisuseScorer(windows, k)
+    enrol_days = dict(list(enrol.groupby(level=0)))
+    bio_days = dict(list(bio.groupby(level=0)))
+    for date in sorted(set(enrol_days) | set(bio_days)):
+        scorer.append_day(date,
+                          enrol_days[date].droplevel(0) if date in enrol_days else empty,
+                          bio_days[date].droplevel(0) if date in bio_days else empty)
+    if until is not None and (scorer.last_date is None or pd.Timestamp(until) > scorer.last_date):
+        scorer.append_day(until, empty, empty)
+    return scorer
+
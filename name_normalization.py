@@ -0,0 +1,250 @@
+"""
+State and District Name Normalization
+=====================================
+Maps the many raw spellings of state and district names onto one canonical
+name each. All matching runs over the distinct raw names only; rows are
+then mapped through integer codes (``pd.factorize``), so the cost grows
+with the number of distinct names, not with the number of rows.
+
+States:    canonical list + maintained alias table (former names, merged
+           UTs, misspellings), with a cached fuzzy fallback.
+Districts: within each canonical state, spellings are grouped by a
+           space-insensitive key, the alias table, and cached fuzzy matching
+           (similarity >= DISTRICT_SIMILARITY with the same first letter,
+           digits and direction words). Each group is displayed with its most
+           common spelling.
+"""
+
+import difflib
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+CANONICAL_STATES = [
+    'Andaman and Nicobar Islands', 'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar',
+    'Chandigarh', 'Chhattisgarh', 'Dadra and Nagar Haveli and Daman and Diu', 'Delhi', 'Goa',
+    'Gujarat', 'Haryana', 'Himachal Pradesh', 'Jammu and Kashmir', 'Jharkhand', 'Karnataka',
+    'Kerala', 'Ladakh', 'Lakshadweep', 'Madhya Pradesh', 'Maharashtra', 'Manipur', 'Meghalaya',
+    'Mizoram', 'Nagaland', 'Odisha', 'Puducherry', 'Punjab', 'Rajasthan', 'Sikkim', 'Tamil Nadu',
+    'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 'West Bengal',
+]
+
+# Raw spelling -> canonical state (former names, merged UTs, misspellings)
+STATE_ALIASES = {
+    'Orissa': 'Odisha',
+    'Pondicherry': 'Puducherry',
+    'Uttaranchal': 'Uttarakhand',
+    'Dadra and Nagar Haveli': 'Dadra and Nagar Haveli and Daman and Diu',
+    'Daman and Diu': 'Dadra and Nagar Haveli and Daman and Diu',
+    'The Dadra and Nagar Haveli and Daman and Diu': 'Dadra and Nagar Haveli and Daman and Diu',
+    'West Bangal': 'West Bengal',
+    'West Bengli': 'West Bengal',
+    'Chhatisgarh': 'Chhattisgarh',
+    'NCT of Delhi': 'Delhi',
+}
+
+# District spelling -> preferred spelling, for variants too far apart for fuzzy matching
+DISTRICT_ALIASES = {
+    'Ahmadabad': 'Ahmedabad',
+    'Bangalore Rural': 'Bengaluru Rural',
+    'Chittaurgarh': 'Chittorgarh',
+    'Darjiling': 'Darjeeling',
+    'Dhaulpur': 'Dholpur',
+    'Hawrah': 'Howrah',
+    'Hooghiy': 'Hooghly',
+    'Jangoan': 'Jangaon',
+    'Kanchipuram': 'Kancheepuram',
+    'Kodarma': 'Koderma',
+    'K.V. Rangareddy': 'Rangareddy',
+    'North Twenty Four Parganas': 'North 24 Parganas',
+    'South Twenty Four Parganas': 'South 24 Parganas',
+    'Purnea': 'Purnia',
+    'Shrawasti': 'Shravasti',
+    'Badgam': 'Budgam',
+    'Baudh': 'Boudh',
+}
+
+STATE_SIMILARITY = 0.85
+DISTRICT_SIMILARITY = 0.9
+QUALIFIERS = frozenset(['NORTH', 'SOUTH', 'EAST', 'WEST', 'CENTRAL', 'EASTERN', 'WESTERN',
+                        'UPPER', 'LOWER', 'RURAL', 'URBAN', 'NEW', 'OLD'])
+
+
+def state_key(name) -> str:
+    """Lower case, '&' as 'and', letters only: 'West  bengal' -> 'westbengal'."""
+    return re.sub(r'[^a-z]', '', str(name).lower().replace('&', 'and'))
+
+
+def district_words(name) -> tuple:
+    """Upper-case words: 'Sabar-Kantha ' -> ('SABAR', 'KANTHA')."""
+    return tuple(re.sub(r'[^A-Z0-9]+', ' ', str(name).upper().replace('&', ' AND ')).split())
+
+
+def clean_display(name) -> str:
+    """Raw name with surrounding and repeated whitespace removed."""
+    return ' '.join(str(name).split())
+
+
+_CANONICAL_BY_KEY = {state_key(s): s for s in CANONICAL_STATES}
+_CANONICAL_BY_KEY.update({state_key(alias): s for alias, s in STATE_ALIASES.items()})
+_DISTRICT_ALIAS_KEYS = {''.join(district_words(a)): ''.join(district_words(t))
+                        for a, t in DISTRICT_ALIASES.items()}
+
+
+@lru_cache(maxsize=None)
+def canonical_state(name):
+    """Canonical state for a raw name, or None when it names no known state."""
+    if name is None or (isinstance(name, float) and np.isnan(name)):
+        return None
+    key = state_key(name)
+    if key in _CANONICAL_BY_KEY:
+        return _CANONICAL_BY_KEY[key]
+    if len(key) < 4:
+        return None
+    match = difflib.get_close_matches(key, list(_CANONICAL_BY_KEY), n=1, cutoff=STATE_SIMILARITY)
+    return _CANONICAL_BY_KEY[match[0]] if match else None
+
+
+@lru_cache(maxsize=None)
+def _same_district(a: tuple, b: tuple) -> bool:
+    """Fuzzy match of two district word tuples, guarded against E/W/N/S twins."""
+    compact_a, compact_b = ''.join(a), ''.join(b)
+    if not compact_a or not compact_b or compact_a[0] != compact_b[0]:
+        return False
+    if set(a) & QUALIFIERS != set(b) & QUALIFIERS:
+        return False
+    if re.sub(r'\D', '', compact_a) != re.sub(r'\D', '', compact_b):
+        return False
+    return difflib.SequenceMatcher(None, compact_a, compact_b).ratio() >= DISTRICT_SIMILARITY
+
+
+def _display_preference(item):
+    """Most rows first; on ties prefer title-cased spellings without stray punctuation."""
+    name, rows = item
+    return (rows, name == name.title(), not re.search(r'[^A-Za-z0-9 &.-]', name), name)
+
+
+def group_districts(names_with_counts) -> dict:
+    """
+    Group the district spellings of one state. Takes (raw name, rows)
+    pairs and returns raw name -> display name of its group.
+    """
+    groups = {}  # compact key -> {'words', 'spellings': {display: rows}}
+    # Most common spellings first, so they become the group representatives
+    for raw, rows in sorted(names_with_counts, key=lambda x: (-x[1], str(x[0]))):
+        words = district_words(raw)
+        compact = ''.join(words)
+        compact = _DISTRICT_ALIAS_KEYS.get(compact, compact)
+        if compact not in groups:
+            target = next((k for k, g in groups.items() if _same_district(g['words'], words)), None)
+            if target is None:
+                groups[compact] = {'words': words, 'spellings': {}, 'members': []}
+            else:
+                compact = target
+        group = groups[compact]
+        display = clean_display(raw)
+        group['spellings'][display] = group['spellings'].get(display, 0) + rows
+        group['members'].append(raw)
+
+    mapping = {}
+    for group in groups.values():
+        display = max(group['spellings'].items(), key=_display_preference)[0]
+        for raw in group['members']:
+            mapping[raw] = display
+    return mapping
+
+
+def normalize_states(states: pd.Series) -> pd.Series:
+    """Canonical state per row; unrecognised names are kept, whitespace-cleaned."""
+    codes, uniques = pd.factorize(states)
+    canonical = np.array([canonical_state(u) or clean_display(u) for u in uniques] + [None],
+                         dtype=object)
+    return pd.Series(canonical[codes], index=states.index, name=states.name)
+
+
+def _distinct_pairs(df, state_col, district_col):
+    """(row -> pair code, [(raw state, raw district)], rows per pair) for one frame."""
+    state_codes, state_values = pd.factorize(df[state_col])
+    district_codes, district_values = pd.factorize(df[district_col])
+    # factorize codes missing values -1; shift by one so they get slot 0 of their own
+    width = len(district_values) + 1
+    pairs, inverse, counts = np.unique((state_codes.astype(np.int64) + 1) * width + district_codes + 1,
+                                       return_inverse=True, return_counts=True)
+    raw_pairs = [(state_values[p // width - 1] if p // width else None,
+                  district_values[p % width - 1] if p % width else None)
+                 for p in pairs]
+    return inverse, raw_pairs, counts
+
+
+def name_counts(*frames, state_col='state', district_col='district') -> dict:
+    """Rows per distinct raw (state, district) pair across ``frames``."""
+    totals = {}
+    for df in frames:
+        _, raw_pairs, counts = _distinct_pairs(df, state_col, district_col)
+        for raw_pair, n in zip(raw_pairs, counts):
+            totals[raw_pair] = totals.get(raw_pair, 0) + int(n)
+    return totals
+
+
+def _resolve_state(raw_state):
+    """Canonical or whitespace-cleaned state; a missing state stays None."""
+    if raw_state is None:
+        return None
+    return canonical_state(raw_state) or clean_display(raw_state)
+
+
+def resolve_names(pair_counts: dict) -> dict:
+    """
+    Canonical (state, district) for every raw pair in ``pair_counts``
+    (as returned by ``name_counts``, possibly merged across partitions).
+    """
+    by_state = {}
+    for (raw_state, raw_district), n in pair_counts.items():
+        state = _resolve_state(raw_state)
+        by_state.setdefault(state, {}).setdefault(raw_district, 0)
+        by_state[state][raw_district] += n
+    district_names = {state: group_districts([(d, n) for d, n in districts.items() if d is not None])
+                      for state, districts in by_state.items()}
+
+    resolved = {}
+    for raw_state, raw_district in pair_counts:
+        state = _resolve_state(raw_state)
+        district = district_names[state].get(raw_district) if raw_district is not None else None
+        resolved[(raw_state, raw_district)] = (state, district)
+    return resolved
+
+
+def normalize_frames(*frames, state_col='state', district_col='district', region_col=None,
+                     names=None):
+    """
+    Return copies of ``frames`` with canonical state and district names
+    (and a ``STATE - DISTRICT`` region column when ``region_col`` is given).
+    District groups are formed over all frames together, so a district gets
+    the same name in every frame; pass ``names`` (from ``resolve_names``) to
+    apply groups formed over a larger set of frames instead.
+    """
+    distinct = [_distinct_pairs(df, state_col, district_col) for df in frames]
+    if names is None:
+        totals = {}
+        for _, raw_pairs, counts in distinct:
+            for raw_pair, n in zip(raw_pairs, counts):
+                totals[raw_pair] = totals.get(raw_pair, 0) + int(n)
+        names = resolve_names(totals)
+
+    results = []
+    for df, (inverse, raw_pairs, _) in zip(frames, distinct):
+        resolved = [names[raw_pair] for raw_pair in raw_pairs]
+        states = np.array([s for s, _ in resolved], dtype=object)
+        districts = np.array([d for _, d in resolved], dtype=object)
+
+        out = df.copy()
+        out[state_col] = states[inverse]
+        out[district_col] = districts[inverse]
+        if region_col:
+            regions = np.array([f"{s} - {d}".upper() if s is not None and d is not None else None
+                                for s, d in resolved], dtype=object)
+            out[region_col] = regions[inverse]
+        results.append(out)
+    return tuple(results)
@@ -0,0 +1,152 @@
+"""
+Pincode-Prefix Hierarchy Index
+==============================
+Indian pincodes are hierarchical: the first digit is the postal zone, the
+first two the sub-zone/circle and the first three the sorting district.
+This module derives those levels from integer pincodes by integer division
+(no string handling), so the cleaned data can be rolled up and
+anomaly-scored along the postal hierarchy instead of the free-text
+``state`` / ``district`` columns.
+
+    level 1  pincode // 100000    zone
+    level 2  pincode // 10000     sub-zone / circle
+    level 3  pincode // 1000      sorting district
+
+Each prefix is scored against its siblings (prefixes sharing the parent
+prefix; all zones for level 1) with a robust z-score (median / MAD) of
+activity per pincode and biometric coverage.
+"""
+
+import numpy as np
+import pandas as pd
+
+LEVELS = {1: 100000, 2: 10000, 3: 1000}
+ANOMALY_Z = 3.5
+
+ZONE_NAMES = {
+    1: 'Northern (Delhi, Haryana, Punjab, Himachal Pradesh, Jammu & Kashmir)',
+    2: 'Northern (Uttar Pradesh, Uttarakhand)',
+    3: 'Western (Rajasthan, Gujarat)',
+    4: 'Western (Maharashtra, Goa, Madhya Pradesh, Chhattisgarh)',
+    5: 'Southern (Andhra Pradesh, Telangana, Karnataka)',
+    6: 'Southern (Kerala, Tamil Nadu)',
+    7: 'Eastern (West Bengal, Odisha, North East)',
+    8: 'Eastern (Bihar, Jharkhand)',
+    9: 'Army Postal Service',
+}
+
+
+def to_pincode_array(pincodes) -> np.ndarray:
+    """Pincodes as int64, whether they arrive as ints, floats or strings."""
+    return pd.to_numeric(pd.Series(pincodes), errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+
+
+def prefix(pincodes, level) -> np.ndarray:
+    """The ``level``-digit prefix of every pincode."""
+    return to_pincode_array(pincodes) // LEVELS[level]
+
+
+class PincodeHierarchy:
+    """
+    Sorted unique pincodes with their prefixes at every level. Because the
+    pincodes are sorted, every prefix covers one contiguous slice, so the
+    pincodes under a prefix are found with two binary searches.
+    """
+
+    def __init__(self, pincodes):
+        self.pincodes = np.unique(to_pincode_array(pincodes))
+        self.prefixes = {level: self.pincodes // divisor for level, divisor in LEVELS.items()}
+
+    def pincodes_under(self, prefix_value, level) -> np.ndarray:
+        keys = self.prefixes[level]
+        start, stop = np.searchsorted(keys, [prefix_value, prefix_value + 1])
+        return self.pincodes[start:stop]
+
+    def children(self, prefix_value, level) -> np.ndarray:
+        """Distinct prefixes one level down under ``prefix_value``."""
+        below = self.pincodes_under(prefix_value, level)
+        return np.unique(below // LEVELS[level + 1])
+
+    def counts(self, level) -> pd.Series:
+        """Number of pincodes per prefix."""
+        values, counts = np.unique(self.prefixes[level], return_counts=True)
+        return pd.Series(counts, index=values, name='pincodes')
+
+
+def _sum_by_prefix(df, level, column) -> pd.Series:
+    keys = prefix(df['pincode'], level)
+    values, inverse = np.unique(keys, return_inverse=True)
+    return pd.Series(np.bincount(inverse, weights=df[column].to_numpy(dtype=float)), index=values)
+
+
+def robust_z(values: pd.Series, groups: pd.Series) -> pd.Series:
+    """(x - median) / (1.4826 * MAD) within each group; 0 where MAD is 0."""
+    grouped = values.groupby(groups)
+    median = grouped.transform('median')
+    mad = (values - median).abs().groupby(groups).transform('median') * 1.4826
+    return ((values - median) / mad.where(mad > 0)).fillna(0.0)
+
+
+def prefix_totals(bio_df, demo_df, enrol_df) -> pd.DataFrame:
+    """
+    Pincode counts and activity totals per prefix at levels 1-3. Totals of
+    disjoint sets of pincodes add up (see ``merge_prefix_totals``), so the
+    pincodes can be processed in parts. Expects the per-row totals added by
+    ``prepare_powerbi_data.prepare_frames``.
+    """
+    hierarchy = PincodeHierarchy(np.concatenate([
+        to_pincode_array(bio_df['pincode']), to_pincode_array(demo_df['pincode']),
+        to_pincode_array(enrol_df['pincode'])]))
+
+    tables = []
+    for level in LEVELS:
+        table = pd.DataFrame({
+            'pincodes': hierarchy.counts(level),
+            'biometric_total': _sum_by_prefix(bio_df, level, 'bio_total'),
+            'demographic_total': _sum_by_prefix(demo_df, level, 'demo_total'),
+            'enrolment_total': _sum_by_prefix(enrol_df, level, 'enrol_total'),
+            'child_enrolment': _sum_by_prefix(enrol_df, level, 'child_count'),
+        }).fillna(0)
+        table.index.name = 'prefix'
+        table = table.reset_index()
+        table.insert(0, 'level', level)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def merge_prefix_totals(tables) -> pd.DataFrame:
+    """Sum ``prefix_totals`` tables built over disjoint sets of pincodes."""
+    return pd.concat(tables, ignore_index=True).groupby(['level', 'prefix'], as_index=False).sum()
+
+
+def build_prefix_rollups(bio_df, demo_df, enrol_df, totals=None) -> pd.DataFrame:
+    """
+    Totals, coverage metrics and anomaly scores per pincode prefix at
+    levels 1-3, from the frames or from prebuilt ``totals`` (see
+    ``prefix_totals``). Expects the per-row totals added by
+    ``prepare_powerbi_data.prepare_frames``.
+    """
+    rollups = prefix_totals(bio_df, demo_df, enrol_df) if totals is None else totals.copy()
+    rollups['parent_prefix'] = np.where(rollups['level'] > 1, rollups['prefix'] // 10, 0)
+
+    rollups['zone'] = (rollups['prefix'] // 10 ** (rollups['level'] - 1)).map(ZONE_NAMES)
+    rollups['total_activity'] = rollups['biometric_total'] + rollups['demographic_total'] + rollups['enrolment_total']
+    enrol = rollups['enrolment_total'].replace(0, np.nan)
+    rollups['bio_coverage_pct'] = (rollups['biometric_total'] / enrol * 100).round(2)
+    rollups['child_share_pct'] = (rollups['child_enrolment'] / enrol * 100).round(2)
+    rollups['activity_per_pincode'] = (rollups['total_activity'] / rollups['pincodes']).round(1)
+
+    # Score each prefix against its siblings under the same parent
+    siblings = rollups['level'].astype(str) + '|' + rollups['parent_prefix'].astype(str)
+    z_activity = robust_z(np.log1p(rollups['activity_per_pincode']), siblings)
+    z_coverage = robust_z(np.log1p(rollups['bio_coverage_pct']), siblings)  # NaN coverage scores 0
+    rollups['activity_z'] = z_activity.round(2)
+    rollups['coverage_z'] = z_coverage.round(2)
+    rollups['anomaly_score'] = np.maximum(z_activity.abs(), z_coverage.abs()).round(2)
+    rollups['is_anomaly'] = rollups['anomaly_score'] > ANOMALY_Z
+
+    columns = ['level', 'prefix', 'parent_prefix', 'zone', 'pincodes', 'enrolment_total',
+               'demographic_total', 'biometric_total', 'child_enrolment', 'total_activity',
+               'activity_per_pincode', 'bio_coverage_pct', 'child_share_pct',
+               'activity_z', 'coverage_z', 'anomaly_score', 'is_anomaly']
+    return rollups[columns].sort_values(['level', 'prefix']).reset_index(drop=True)
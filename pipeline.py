@@ -0,0 +1,280 @@
+"""
+Unified Command-Line Entry Point for the UIDAI Pipeline
+========================================================
+Runs each stage of the pipeline as a subcommand:
+
+    python pipeline.py sync        # data_cleaning_sync.py
+    python pipeline.py facts       # fact_table.py
+    python pipeline.py anomalies   # anomaly_detection.py
+    python pipeline.py powerbi     # prepare_powerbi_data.py
+    python pipeline.py report      # notebooks/uidai_analysis.py
+    python pipeline.py lag         # lag_analysis.py
+    python pipeline.py correlate   # region_correlation.py
+    python pipeline.py forecast    # forecast_volumes.py
+    python pipeline.py watch       # watcher.py (incremental ingest + alerts)
+    python pipeline.py all         # every stage, sharing data in memory
+
+``sync --store`` also builds the indexed SQLite store (analytics_store.py);
+``anomalies`` and ``report`` accept --pincode/--state/--district/--start/
+--end to analyse just that slice through the store; its outputs go to a
+slices/ subfolder so the full-dataset files are left alone.
+
+``--shards N --workers W`` (sync, anomalies, powerbi, all) runs the
+aggregation as map-reduce over N pincode shards on W processes
+(mapreduce.py); the outputs are identical to the single-process run.
+
+``facts`` merges the three cleaned datasets into one (pincode, date) fact
+table (fact_table.py); ``all`` builds it after ``sync`` and hands it to the
+anomaly, Power BI, lag and correlation stages, which otherwise read the
+saved table when it is newer than the cleaned CSVs.
+
+``--memory-budget 512M`` (sync, anomalies, powerbi, all) streams those
+stages' ingestion and aggregation in budget-sized chunks, spilling partial
+aggregates to disk (memory_budget.py). The budget is measured once, before
+the first stage, and shared by all of them; under ``all`` the fact table is
+not built and the later stages still load the cleaned data whole.
+
+``--trace run.json`` records wall time, CPU time, peak RSS and rows in/out
+for every stage and sub-step (instrumentation.py), writes them as JSON and
+prints a summary table.
+
+Stage modules (and pandas) are imported only when their subcommand runs,
+and matplotlib/seaborn/scipy only when a chart is drawn, so
+``--no-plots`` runs start without paying for the plotting stack.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from instrumentation import stage
+
+BASE_DIR = Path(__file__).parent
+NOTEBOOKS_DIR = BASE_DIR / "notebooks"
+
+
+def _import_report_module():
+    """Import notebooks/uidai_analysis.py, which lives outside the root."""
+    if str(NOTEBOOKS_DIR) not in sys.path:
+        sys.path.insert(0, str(NOTEBOOKS_DIR))
+    import uidai_analysis
+    return uidai_analysis
+
+
+def _store_filters(args):
+    """Slice filters given on the command line, routed through the store."""
+    names = ('pincode', 'state', 'district', 'start', 'end')
+    return {n: getattr(args, n) for n in names if getattr(args, n, None) is not None}
+
+
+def _shard_options(args):
+    """Map-reduce options (mapreduce.py); no shards means a single process."""
+    return {'shards': getattr(args, 'shards', None), 'workers': getattr(args, 'workers', None)}
+
+
+def _budget_options(args):
+    """Memory budget for chunked ingestion and aggregation (memory_budget.py)."""
+    return {'memory_budget': getattr(args, 'memory_budget', None)}
+
+
+def _sample_options(args):
+    """Stratified sampling options for exploratory runs (sampling.py)."""
+    return {'sample': getattr(args, 'sample', None), 'seed': getattr(args, 'seed', None)}
+
+
+def run_sync(args):
+    import data_cleaning_sync
+    result = data_cleaning_sync.main(validate=not getattr(args, 'no_validate', False),
+                                     **_shard_options(args), **_budget_options(args))
+    if getattr(args, 'store', False):
+        import analytics_store
+        print("\nBuilding analytics store...")
+        if result[0] is None:
+            analytics_store.build_store_from_csv()
+        else:
+            analytics_store.build_store(*result[:3])
+    return result
+
+
+def run_facts(args, enrolment_df=None, demographic_df=None, biometric_df=None):
+    import fact_table
+    return fact_table.main(enrolment_df, demographic_df, biometric_df)
+
+
+def run_anomalies(args, enrolment_df=None, demographic_df=None, biometric_df=None, facts=None):
+    import anomaly_detection
+    return anomaly_detection.main(enrolment_df, demographic_df, biometric_df, facts=facts,
+                                  plot=not args.no_plots, **_sample_options(args),
+                                  **_shard_options(args), **_budget_options(args),
+                                  **_store_filters(args))
+
+
+def run_powerbi(args, enrolment_df=None, demographic_df=None, biometric_df=None, facts=None):
+    import prepare_powerbi_data
+    return prepare_powerbi_data.main(biometric_df, demographic_df, enrolment_df, facts=facts,
+                                     plot=not args.no_plots, **_shard_options(args),
+                                     **_budget_options(args))
+
+
+def run_report(args, enrolment_df=None, demographic_df=None, biometric_df=None):
+    uidai_analysis = _import_report_module()
+    return uidai_analysis.main(biometric_df, demographic_df, enrolment_df,
+                               plots=not args.no_plots, dedup=getattr(args, 'dedup', 'hash'),
+                               **_sample_options(args), **_store_filters(args))
+
+
+def run_lag(args, enrolment_df=None, demographic_df=None, biometric_df=None):
+    import lag_analysis
+    return lag_analysis.main(enrolment_df, biometric_df, level=getattr(args, 'level', 'district'),
+                             max_lag=getattr(args, 'max_lag', lag_analysis.MAX_LAG_DAYS),
+                             min_data_points=getattr(args, 'min_data_points',
+                                                     lag_analysis.MIN_DATA_POINTS))
+
+
+def run_correlate(args, enrolment_df=None, demographic_df=None, biometric_df=None):
+    import region_correlation
+    return region_correlation.main(enrolment_df, demographic_df, biometric_df,
+                                   level=getattr(args, 'level', 'district'))
+
+
+def run_forecast(args, tables=None):
+    import forecast_volumes
+    return forecast_volumes.main(tables, max_workers=getattr(args, 'workers', None),
+                                 refit=getattr(args, 'refit', False))
+
+
+def run_watch(args):
+    import watcher
+    return watcher.main(interval=args.interval, once=args.once)
+
+
+def run_all(args):
+    """
+    Run every stage in order, passing the cleaned data along in memory; the
+    aggregating stages share the fact table built once after sync.
+    """
+    with stage('sync'):
+        enrolment_df, demographic_df, biometric_df, _ = run_sync(args)
+    facts, views = None, (enrolment_df, demographic_df, biometric_df)
+    if enrolment_df is not None:
+        with stage('facts'):
+            facts = run_facts(args, enrolment_df, demographic_df, biometric_df)
+        views = facts.frames()
+    with stage('anomalies'):
+        run_anomalies(args, facts=facts)
+    # lag and correlate write outputs that powerbi copies and ranks, so they run first
+    with stage('lag'):
+        run_lag(args, *views)
+    with stage('correlate'):
+        run_correlate(args, *views)
+    with stage('powerbi'):
+        tables = run_powerbi(args, facts=facts)
+    with stage('forecast'):
+        run_forecast(args, tables)
+    with stage('report'):
+        run_report(args, enrolment_df, demographic_df, biometric_df)
+
+
+COMMANDS = {
+    'sync': (run_sync, "Synchronize raw datasets on common dates and pincodes"),
+    'facts': (run_facts, "Merge the cleaned datasets into one (pincode, date) fact table"),
+    'anomalies': (run_anomalies, "Detect misuse, imbalance and mass-registration patterns"),
+    'powerbi': (run_powerbi, "Build the aggregated Power BI tables"),
+    'report': (run_report, "Run the full analysis report and charts"),
+    'lag': (run_lag, "Find regions where biometric updates lag enrolment"),
+    'correlate': (run_correlate, "Rank regions whose updates have decoupled from enrolment"),
+    'forecast': (run_forecast, "Forecast daily volumes per state from the Power BI tables"),
+    'watch': (run_watch, "Ingest new raw chunks as they land and write alert deltas"),
+    'all': (run_all, "Run every stage in order without re-reading data"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="UIDAI Aadhaar analytics pipeline",
+    )
+    parser.add_argument('--no-plots', action='store_true',
+                        help="Skip chart generation (plotting libraries are never imported)")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="Write a JSON trace of per-stage timing, memory and row counts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (func, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.set_defaults(func=func)
+        if name in ('sync', 'all'):
+            sub.add_argument('--store', action='store_true',
+                             help="Also build the indexed SQLite store from the cleaned data")
+            sub.add_argument('--no-validate', action='store_true',
+                             help="Skip row validation and the quarantine file")
+        if name in ('sync', 'anomalies', 'powerbi', 'all'):
+            sub.add_argument('--shards', type=int, default=None, metavar='N',
+                             help="Aggregate as map-reduce over N pincode shards")
+            sub.add_argument('--workers', type=int, default=None,
+                             help="Worker processes for --shards (and forecast fitting "
+                                  "under 'all'; default: all cores)")
+            sub.add_argument('--memory-budget', metavar='SIZE',
+                             help="Ingest and aggregate in chunks sized to stay within SIZE "
+                                  "(e.g. 512M, 2G), spilling partial aggregates to disk")
+        if name in ('report', 'all'):
+            sub.add_argument('--dedup', choices=['hash', 'full'], default='hash',
+                             help="Deduplicate raw columns by row hash before enrichment "
+                                  "(default), or all columns afterwards")
+        if name == 'lag':
+            sub.add_argument('--level', choices=['district', 'pincode'], default='district',
+                             help="Region granularity for the lag search")
+            sub.add_argument('--max-lag', type=int, default=30,
+                             help="Longest lag to test, in days (default 30)")
+            sub.add_argument('--min-data-points', type=int, default=10,
+                             help="Active days a region needs to be reported (default 10)")
+        if name == 'correlate':
+            sub.add_argument('--level', choices=['district', 'pincode'], default='district',
+                             help="Region granularity for the correlations")
+        if name == 'forecast':
+            sub.add_argument('--workers', type=int, default=None,
+                             help="Processes used to fit the models (default: all cores)")
+            sub.add_argument('--refit', action='store_true',
+                             help="Re-estimate every model instead of reusing stored parameters")
+        if name == 'watch':
+            sub.add_argument('--interval', type=float, default=2.0,
+                             help="Seconds between polls of the raw folders (default 2)")
+            sub.add_argument('--once', action='store_true',
+                             help="Ingest chunks that arrived since the last run, then exit")
+        if name in ('anomalies', 'report'):
+            group = sub.add_argument_group('slice filters (read through the analytics store)')
+            group.add_argument('--pincode', type=int)
+            group.add_argument('--state')
+            group.add_argument('--district')
+            group.add_argument('--start', help="Inclusive start date, e.g. 2025-10-01")
+            group.add_argument('--end', help="Inclusive end date, e.g. 2025-10-31")
+            group = sub.add_argument_group('exploratory sampling')
+            group.add_argument('--sample', type=float, metavar='FRACTION',
+                               help="Run on a stratified sample of pincodes (e.g. 0.1); "
+                                    "outputs go to a sample/ subfolder")
+            group.add_argument('--seed', type=int, help="Sample seed (default 42)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'memory_budget', None):
+        # One baseline for the whole run, so later stages don't each get the full budget again
+        import memory_budget
+        args.memory_budget = memory_budget.MemoryBudget(args.memory_budget)
+    if not args.trace:
+        args.func(args)
+        return
+
+    import instrumentation
+    instrumentation.enable(label=' '.join(argv if argv is not None else sys.argv[1:]))
+    try:
+        with stage(args.command):
+            args.func(args)
+    finally:
+        trace = instrumentation.disable()
+        path = trace.save(args.trace)
+        print("\n" + trace.summary())
+        print(f"\nTrace written to: {path}")
+
+
+if __name__ == "__main__":
+    main()
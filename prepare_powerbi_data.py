@@ -3,196 +3,414 @@ Create aggregated datasets optimized for Power BI visualization.
 Generates smaller, pre-aggregated CSV files for efficient dashboard loading.
 """
 
+import shutil
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from datetime import datetime
+
+from instrumentation import traced
+from name_normalization import normalize_frames
 
 # Setup paths
-PROJECT_ROOT = Path('.')
+PROJECT_ROOT = Path(__file__).parent
 DATA_DIR = PROJECT_ROOT / 'cleaned_data'
 POWERBI_DIR = PROJECT_ROOT / 'powerbi_data'
-POWERBI_DIR.mkdir(exist_ok=True)
 
-print("=" * 60)
-print("CREATING POWER BI OPTIMIZED DATASETS")
-print("=" * 60)
+# Key insight CSVs copied alongside the aggregates
+INSIGHT_FILES = [
+    'outputs/top_1_percent_enrolment_regions.csv',
+    'outputs/lowest_biometric_coverage_regions.csv',
+    'outputs/low_child_penetration_regions.csv',
+    'outputs/high_adult_only_demographic_regions.csv',
+    'outputs/delayed_biometric_completion_regions.csv',
+    'outputs/high_variance_regions.csv',
+    'cleaned_data/suspicious_pincodes_misuse.csv',
+    'cleaned_data/imbalanced_pincodes.csv',
+]
+
+
+@traced()
+def load_cleaned_data(data_dir: Path = DATA_DIR):
+    """Load the three cleaned datasets (biometric, demographic, enrolment)."""
+    bio_df = pd.read_csv(data_dir / 'biometric_cleaned.csv')
+    demo_df = pd.read_csv(data_dir / 'demographic_cleaned.csv')
+    enrol_df = pd.read_csv(data_dir / 'enrolment_cleaned.csv')
+    return bio_df, demo_df, enrol_df
+
+
+@traced()
+def prepare_frames(bio_df, demo_df, enrol_df, names=None):
+    """
+    Parse dates, normalize state/district names and add the per-row totals
+    used by every summary. ``names`` optionally supplies name groups
+    resolved over more data (see name_normalization.resolve_names).
 
-# Load cleaned data
-print("\n[1/5] Loading cleaned datasets...")
-bio_df = pd.read_csv(DATA_DIR / 'biometric_cleaned.csv')
-demo_df = pd.read_csv(DATA_DIR / 'demographic_cleaned.csv')
-enrol_df = pd.read_csv(DATA_DIR / 'enrolment_cleaned.csv')
+    Works on copies so that frames shared with other stages are left intact.
+    """
+    bio_df = bio_df.copy()
+    demo_df = demo_df.copy()
+    enrol_df = enrol_df.copy()
 
-# Convert dates
-bio_df['date'] = pd.to_datetime(bio_df['date'], format='%d-%m-%Y', errors='coerce')
-demo_df['date'] = pd.to_datetime(demo_df['date'], format='%d-%m-%Y', errors='coerce')
-enrol_df['date'] = pd.to_datetime(enrol_df['date'], format='%d-%m-%Y', errors='coerce')
+    # Convert dates
+    bio_df['date'] = pd.to_datetime(bio_df['date'], format='%d-%m-%Y', errors='coerce')
+    demo_df['date'] = pd.to_datetime(demo_df['date'], format='%d-%m-%Y', errors='coerce')
+    enrol_df['date'] = pd.to_datetime(enrol_df['date'], format='%d-%m-%Y', errors='coerce')
+
+    # Calculate totals per row
+    bio_df['bio_total'] = bio_df[[c for c in bio_df.columns if 'age' in c.lower()]].sum(axis=1)
+    demo_df['demo_total'] = demo_df[[c for c in demo_df.columns if 'age' in c.lower()]].sum(axis=1)
+    enrol_df['enrol_total'] = enrol_df[['age_0_5', 'age_5_17', 'age_18_greater']].sum(axis=1)
+    enrol_df['child_count'] = enrol_df['age_0_5'] + enrol_df['age_5_17']
+    enrol_df['adult_count'] = enrol_df['age_18_greater']
+
+    # Canonical state/district names and region identifier, resolved once per
+    # distinct spelling so one district is not split across its variants
+    bio_df, demo_df, enrol_df = normalize_frames(bio_df, demo_df, enrol_df, region_col='region',
+                                                 names=names)
+
+    return bio_df, demo_df, enrol_df
 
-print(f"  Biometric: {len(bio_df):,} rows")
-print(f"  Demographic: {len(demo_df):,} rows")
-print(f"  Enrolment: {len(enrol_df):,} rows")
 
 # ============================================================================
 # 1. DAILY NATIONAL SUMMARY
 # ============================================================================
-print("\n[2/5] Creating daily national summary...")
-
-# Calculate totals per row
-bio_df['bio_total'] = bio_df[[c for c in bio_df.columns if 'age' in c.lower()]].sum(axis=1)
-demo_df['demo_total'] = demo_df[[c for c in demo_df.columns if 'age' in c.lower()]].sum(axis=1)
-enrol_df['enrol_total'] = enrol_df[['age_0_5', 'age_5_17', 'age_18_greater']].sum(axis=1)
-enrol_df['child_count'] = enrol_df['age_0_5'] + enrol_df['age_5_17']
-enrol_df['adult_count'] = enrol_df['age_18_greater']
-
-daily_bio = bio_df.groupby('date').agg({'bio_total': 'sum'}).reset_index()
-daily_demo = demo_df.groupby('date').agg({'demo_total': 'sum'}).reset_index()
-daily_enrol = enrol_df.groupby('date').agg({
-    'enrol_total': 'sum',
-    'child_count': 'sum',
-    'adult_count': 'sum'
-}).reset_index()
-
-daily_summary = daily_bio.merge(daily_demo, on='date', how='outer')
-daily_summary = daily_summary.merge(daily_enrol, on='date', how='outer')
-daily_summary = daily_summary.fillna(0).sort_values('date')
-
-# Add time dimensions
-daily_summary['year'] = daily_summary['date'].dt.year
-daily_summary['month'] = daily_summary['date'].dt.month
-daily_summary['month_name'] = daily_summary['date'].dt.month_name()
-daily_summary['day'] = daily_summary['date'].dt.day
-daily_summary['weekday'] = daily_summary['date'].dt.dayofweek
-daily_summary['day_name'] = daily_summary['date'].dt.day_name()
-daily_summary['is_weekend'] = daily_summary['weekday'].isin([5, 6]).astype(int)
-daily_summary['week_num'] = daily_summary['date'].dt.isocalendar().week
-
-daily_summary.to_csv(POWERBI_DIR / 'daily_national_summary.csv', index=False)
-print(f"  Saved: daily_national_summary.csv ({len(daily_summary)} rows)")
+
+@traced()
+def build_daily_national_summary(bio_df, demo_df, enrol_df) -> pd.DataFrame:
+    """National totals per day with calendar dimensions."""
+    daily_bio = bio_df.groupby('date').agg({'bio_total': 'sum'}).reset_index()
+    daily_demo = demo_df.groupby('date').agg({'demo_total': 'sum'}).reset_index()
+    daily_enrol = enrol_df.groupby('date').agg({
+        'enrol_total': 'sum',
+        'child_count': 'sum',
+        'adult_count': 'sum'
+    }).reset_index()
+
+    daily_summary = daily_bio.merge(daily_demo, on='date', how='outer')
+    daily_summary = daily_summary.merge(daily_enrol, on='date', how='outer')
+    daily_summary = daily_summary.fillna(0).sort_values('date')
+
+    # Add time dimensions
+    daily_summary['year'] = daily_summary['date'].dt.year
+    daily_summary['month'] = daily_summary['date'].dt.month
+    daily_summary['month_name'] = daily_summary['date'].dt.month_name()
+    daily_summary['day'] = daily_summary['date'].dt.day
+    daily_summary['weekday'] = daily_summary['date'].dt.dayofweek
+    daily_summary['day_name'] = daily_summary['date'].dt.day_name()
+    daily_summary['is_weekend'] = daily_summary['weekday'].isin([5, 6]).astype(int)
+    daily_summary['week_num'] = daily_summary['date'].dt.isocalendar().week
+
+    return daily_summary
+
 
 # ============================================================================
 # 2. STATE-WISE SUMMARY
 # ============================================================================
-print("\n[3/5] Creating state-wise summary...")
 
-state_bio = bio_df.groupby('state').agg({'bio_total': 'sum'}).reset_index()
-state_bio.columns = ['state', 'biometric_total']
+@traced()
+def build_state_summary(bio_df, demo_df, enrol_df) -> pd.DataFrame:
+    """Per-state totals with coverage and child-share metrics."""
+    state_bio = bio_df.groupby('state').agg({'bio_total': 'sum'}).reset_index()
+    state_bio.columns = ['state', 'biometric_total']
+
+    state_demo = demo_df.groupby('state').agg({'demo_total': 'sum'}).reset_index()
+    state_demo.columns = ['state', 'demographic_total']
 
-state_demo = demo_df.groupby('state').agg({'demo_total': 'sum'}).reset_index()
-state_demo.columns = ['state', 'demographic_total']
+    state_enrol = enrol_df.groupby('state').agg({
+        'enrol_total': 'sum',
+        'child_count': 'sum',
+        'adult_count': 'sum'
+    }).reset_index()
+    state_enrol.columns = ['state', 'enrolment_total', 'child_enrolment', 'adult_enrolment']
 
-state_enrol = enrol_df.groupby('state').agg({
-    'enrol_total': 'sum',
-    'child_count': 'sum',
-    'adult_count': 'sum'
-}).reset_index()
-state_enrol.columns = ['state', 'enrolment_total', 'child_enrolment', 'adult_enrolment']
+    state_summary = state_bio.merge(state_demo, on='state', how='outer')
+    state_summary = state_summary.merge(state_enrol, on='state', how='outer')
+    state_summary = state_summary.fillna(0)
 
-state_summary = state_bio.merge(state_demo, on='state', how='outer')
-state_summary = state_summary.merge(state_enrol, on='state', how='outer')
-state_summary = state_summary.fillna(0)
+    # Calculate metrics
+    state_summary['total_activity'] = state_summary['biometric_total'] + state_summary['demographic_total'] + state_summary['enrolment_total']
+    state_summary['bio_coverage_pct'] = (state_summary['biometric_total'] / state_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
+    state_summary['child_share_pct'] = (state_summary['child_enrolment'] / state_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
 
-# Calculate metrics
-state_summary['total_activity'] = state_summary['biometric_total'] + state_summary['demographic_total'] + state_summary['enrolment_total']
-state_summary['bio_coverage_pct'] = (state_summary['biometric_total'] / state_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
-state_summary['child_share_pct'] = (state_summary['child_enrolment'] / state_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
+    return state_summary.sort_values('total_activity', ascending=False)
 
-state_summary = state_summary.sort_values('total_activity', ascending=False)
-state_summary.to_csv(POWERBI_DIR / 'state_summary.csv', index=False)
-print(f"  Saved: state_summary.csv ({len(state_summary)} rows)")
 
 # ============================================================================
 # 3. DISTRICT-WISE SUMMARY
 # ============================================================================
-print("\n[4/5] Creating district-wise summary...")
 
-# Create region identifier
-bio_df['region'] = bio_df['state'].str.strip().str.upper() + ' - ' + bio_df['district'].str.strip().str.upper()
-demo_df['region'] = demo_df['state'].str.strip().str.upper() + ' - ' + demo_df['district'].str.strip().str.upper()
-enrol_df['region'] = enrol_df['state'].str.strip().str.upper() + ' - ' + enrol_df['district'].str.strip().str.upper()
+@traced()
+def build_district_summary(bio_df, demo_df, enrol_df) -> pd.DataFrame:
+    """Per-district totals with coverage and child-share metrics."""
+    region_bio = bio_df.groupby(['state', 'district', 'region']).agg({'bio_total': 'sum'}).reset_index()
+    region_bio.columns = ['state', 'district', 'region', 'biometric_total']
 
-region_bio = bio_df.groupby(['state', 'district', 'region']).agg({'bio_total': 'sum'}).reset_index()
-region_bio.columns = ['state', 'district', 'region', 'biometric_total']
+    region_demo = demo_df.groupby(['state', 'district', 'region']).agg({'demo_total': 'sum'}).reset_index()
+    region_demo.columns = ['state', 'district', 'region', 'demographic_total']
 
-region_demo = demo_df.groupby(['state', 'district', 'region']).agg({'demo_total': 'sum'}).reset_index()
-region_demo.columns = ['state', 'district', 'region', 'demographic_total']
+    region_enrol = enrol_df.groupby(['state', 'district', 'region']).agg({
+        'enrol_total': 'sum',
+        'child_count': 'sum',
+        'adult_count': 'sum'
+    }).reset_index()
+    region_enrol.columns = ['state', 'district', 'region', 'enrolment_total', 'child_enrolment', 'adult_enrolment']
 
-region_enrol = enrol_df.groupby(['state', 'district', 'region']).agg({
-    'enrol_total': 'sum',
-    'child_count': 'sum',
-    'adult_count': 'sum'
-}).reset_index()
-region_enrol.columns = ['state', 'district', 'region', 'enrolment_total', 'child_enrolment', 'adult_enrolment']
+    district_summary = region_bio.merge(region_demo, on=['state', 'district', 'region'], how='outer')
+    district_summary = district_summary.merge(region_enrol, on=['state', 'district', 'region'], how='outer')
+    district_summary = district_summary.fillna(0)
 
-district_summary = region_bio.merge(region_demo, on=['state', 'district', 'region'], how='outer')
-district_summary = district_summary.merge(region_enrol, on=['state', 'district', 'region'], how='outer')
-district_summary = district_summary.fillna(0)
+    # Calculate metrics
+    district_summary['total_activity'] = district_summary['biometric_total'] + district_summary['demographic_total'] + district_summary['enrolment_total']
+    district_summary['bio_coverage_pct'] = (district_summary['biometric_total'] / district_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
+    district_summary['child_share_pct'] = (district_summary['child_enrolment'] / district_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
 
-# Calculate metrics
-district_summary['total_activity'] = district_summary['biometric_total'] + district_summary['demographic_total'] + district_summary['enrolment_total']
-district_summary['bio_coverage_pct'] = (district_summary['biometric_total'] / district_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
-district_summary['child_share_pct'] = (district_summary['child_enrolment'] / district_summary['enrolment_total'].replace(0, np.nan) * 100).round(2)
+    return district_summary.sort_values('total_activity', ascending=False)
 
-district_summary = district_summary.sort_values('total_activity', ascending=False)
-district_summary.to_csv(POWERBI_DIR / 'district_summary.csv', index=False)
-print(f"  Saved: district_summary.csv ({len(district_summary)} rows)")
 
 # ============================================================================
 # 4. STATE-DATE COMBINATION (for trends by state)
 # ============================================================================
-print("\n[5/5] Creating state-date trends...")
-
-state_date_bio = bio_df.groupby(['state', 'date']).agg({'bio_total': 'sum'}).reset_index()
-state_date_demo = demo_df.groupby(['state', 'date']).agg({'demo_total': 'sum'}).reset_index()
-state_date_enrol = enrol_df.groupby(['state', 'date']).agg({'enrol_total': 'sum'}).reset_index()
 
-state_date = state_date_bio.merge(state_date_demo, on=['state', 'date'], how='outer')
-state_date = state_date.merge(state_date_enrol, on=['state', 'date'], how='outer')
-state_date = state_date.fillna(0)
+@traced()
+def build_state_date_trends(bio_df, demo_df, enrol_df) -> pd.DataFrame:
+    """Per-state daily totals for trend visuals."""
+    state_date_bio = bio_df.groupby(['state', 'date']).agg({'bio_total': 'sum'}).reset_index()
+    state_date_demo = demo_df.groupby(['state', 'date']).agg({'demo_total': 'sum'}).reset_index()
+    state_date_enrol = enrol_df.groupby(['state', 'date']).agg({'enrol_total': 'sum'}).reset_index()
+
+    state_date = state_date_bio.merge(state_date_demo, on=['state', 'date'], how='outer')
+    state_date = state_date.merge(state_date_enrol, on=['state', 'date'], how='outer')
+    state_date = state_date.fillna(0)
+
+    state_date.columns = ['state', 'date', 'biometric', 'demographic', 'enrolment']
+    state_date['total'] = state_date['biometric'] + state_date['demographic'] + state_date['enrolment']
+    return state_date.sort_values(['state', 'date'])
+
+
+@traced()
+def build_pincode_prefix_summary(bio_df=None, demo_df=None, enrol_df=None, totals=None) -> pd.DataFrame:
+    """
+    Roll-ups and anomaly scores per 1-, 2- and 3-digit pincode prefix, from
+    the pincode-grain frames or from prefix ``totals`` summed beforehand
+    (see pincode_hierarchy.prefix_totals).
+    """
+    import pincode_hierarchy
+    return pincode_hierarchy.build_prefix_rollups(bio_df, demo_df, enrol_df, totals=totals)
+
+
+@traced()
+def build_state_date_coverage(bio_df, demo_df, enrol_df, budget=None) -> pd.DataFrame:
+    """
+    Approximate active pincodes per state per day and dataset, from the
+    HyperLogLog sketches saved by the sync stage (built from the cleaned
+    frames, or chunk by chunk within ``budget``, if none were saved or the
+    cleaned CSVs have changed since). See hyperloglog.py for the error
+    bounds.
+    """
+    import hyperloglog
+
+    sketches = hyperloglog.load_or_build(enrol_df, demo_df, bio_df)
+    if budget is None:
+        return hyperloglog.coverage_table(sketches)
+    import memory_budget
+    if sketches is None:
+        sketches = memory_budget.coverage_sketches(budget)
+    # 8 bytes of float terms per register while a block of sketches is estimated
+    return hyperloglog.coverage_table(sketches, budget.chunk_rows(8 * sketches.registers.shape[1]))
+
+
+def build_powerbi_tables(bio_df, demo_df, enrol_df, shards=None, workers=None,
+                         budget=None, facts=None) -> dict:
+    """
+    Build every Power BI summary table from the cleaned datasets.
+
+    With ``shards`` the rows are hash-partitioned by pincode and reduced to
+    partial sums by ``workers`` processes (see mapreduce.py); the summaries
+    are then built from those partials and come out identical. With a
+    ``budget`` (memory_budget.MemoryBudget) the partial sums are folded in
+    from chunks of the cleaned CSVs instead, and the frames may be None;
+    the pincode grain then arrives as prefix totals, summed one spill
+    bucket at a time.
+    With ``facts`` (fact_table.FactTable) each grain's partial sums come from
+    one group-by of the wide table.
+
+    Returns a dict mapping output file name to DataFrame.
+    """
+    if budget is not None:
+        import memory_budget
+        partials = memory_budget.powerbi_partials(budget)
+    elif shards:
+        import mapreduce
+        names = None
+        if facts is not None:
+            import name_normalization
+            names = name_normalization.resolve_names(facts.name_counts())
+        partials = mapreduce.powerbi_partials(bio_df, demo_df, enrol_df, shards, workers, names=names)
+    elif facts is not None:
+        import fact_table
+        partials = fact_table.powerbi_partials(facts)
+    else:
+        frames = prepare_frames(bio_df, demo_df, enrol_df)
+        partials = dict.fromkeys(['state_date', 'district', 'pincode'], frames)
+
+    print("\n[2/5] Creating daily national summary...")
+    daily_summary = build_daily_national_summary(*partials['state_date'])
+
+    print("\n[3/5] Creating state-wise summary...")
+    state_summary = build_state_summary(*partials['state_date'])
+
+    print("\n[4/5] Creating district-wise summary...")
+    district_summary = build_district_summary(*partials['district'])
+
+    print("\n[5/5] Creating state-date trends...")
+    state_date = build_state_date_trends(*partials['state_date'])
+
+    print("  Adding pincode-prefix roll-ups (zone, sub-zone, sorting district)...")
+    if 'prefix_totals' in partials:
+        prefix_summary = build_pincode_prefix_summary(totals=partials['prefix_totals'])
+    else:
+        prefix_summary = build_pincode_prefix_summary(*partials['pincode'])
+
+    print("  Estimating active pincodes per state per day from coverage sketches...")
+    coverage = build_state_date_coverage(bio_df, demo_df, enrol_df, budget)
+
+    return {
+        'daily_national_summary.csv': daily_summary,
+        'state_summary.csv': state_summary,
+        'district_summary.csv': district_summary,
+        'state_date_trends.csv': state_date,
+        'pincode_prefix_summary.csv': prefix_summary,
+        'state_date_coverage.csv': coverage,
+    }
+
+
+@traced()
+def save_powerbi_tables(tables: dict, powerbi_dir: Path = POWERBI_DIR):
+    """Write the summary tables to the Power BI folder."""
+    powerbi_dir.mkdir(exist_ok=True)
+    for name, df in tables.items():
+        df.to_csv(powerbi_dir / name, index=False)
+        print(f"  Saved: {name} ({len(df)} rows)")
 
-state_date.columns = ['state', 'date', 'biometric', 'demographic', 'enrolment']
-state_date['total'] = state_date['biometric'] + state_date['demographic'] + state_date['enrolment']
-state_date = state_date.sort_values(['state', 'date'])
-
-state_date.to_csv(POWERBI_DIR / 'state_date_trends.csv', index=False)
-print(f"  Saved: state_date_trends.csv ({len(state_date)} rows)")
 
 # ============================================================================
 # 5. COPY INSIGHT FILES
 # ============================================================================
-print("\n[6/6] Copying insight files...")
-
-import shutil
 
-# Copy key insight CSVs
-insight_files = [
-    'outputs/top_1_percent_enrolment_regions.csv',
-    'outputs/lowest_biometric_coverage_regions.csv',
-    'outputs/low_child_penetration_regions.csv',
-    'outputs/high_adult_only_demographic_regions.csv',
-    'outputs/delayed_biometric_completion_regions.csv',
-    'outputs/high_variance_regions.csv',
-    'cleaned_data/suspicious_pincodes_misuse.csv',
-    'cleaned_data/imbalanced_pincodes.csv',
-]
-
-for f in insight_files:
-    src = PROJECT_ROOT / f
-    if src.exists():
-        dst = POWERBI_DIR / src.name
-        shutil.copy(src, dst)
-        print(f"  Copied: {src.name}")
-
-# ============================================================================
-# SUMMARY
-# ============================================================================
-print("\n" + "=" * 60)
-print("POWER BI DATA PREPARATION COMPLETE")
-print("=" * 60)
-print(f"\nOutput Directory: {POWERBI_DIR.absolute()}")
-print("\nFiles created for Power BI:")
-for f in sorted(POWERBI_DIR.glob('*.csv')):
-    size = f.stat().st_size / 1024
-    print(f"  {f.name:45} {size:>8.1f} KB")
-
-print("\n✓ Data ready for Power BI import!")
+@traced()
+def copy_insight_files(powerbi_dir: Path = POWERBI_DIR):
+    """Copy the key insight and anomaly CSVs into the Power BI folder."""
+    for f in INSIGHT_FILES:
+        src = PROJECT_ROOT / f
+        if src.exists():
+            dst = powerbi_dir / src.name
+            shutil.copy(src, dst)
+            print(f"  Copied: {src.name}")
+
+
+@traced()
+def update_ranking_index(tables: dict, powerbi_dir: Path = POWERBI_DIR):
+    """
+    Rebuild the ranking index over the summaries and copied insight tables
+    so top/bottom-k queries downstream never need to re-sort them.
+    """
+    import ranking_index
+
+    ranked = dict(tables)
+    for name in ranking_index.RANKED_METRICS:
+        if name not in ranked and (powerbi_dir / name).exists():
+            ranked[name] = pd.read_csv(powerbi_dir / name)
+    indexes = ranking_index.build_indexes(ranked)
+    ranking_index.save_indexes(indexes, powerbi_dir / ranking_index.INDEX_PATH.name)
+    print(f"  Indexed {sum(len(i.metrics) for i in indexes.values())} metrics "
+          f"across {len(indexes)} tables")
+    return indexes
+
+
+@traced()
+def refresh_dashboards(tables=None):
+    """Re-render the dashboard pages whose source tables changed."""
+    if str(POWERBI_DIR) not in sys.path:
+        sys.path.insert(0, str(POWERBI_DIR))
+    import graphs
+    return graphs.render_dashboards(tables=tables)
+
+
+def main(bio_df=None, demo_df=None, enrol_df=None, plot=True, shards=None, workers=None,
+         memory_budget=None, facts=None):
+    """
+    Build, save and report the Power BI datasets, then refresh the
+    dashboard pages (unless ``plot`` is False). ``shards``/``workers`` run
+    the aggregation as map-reduce (see build_powerbi_tables);
+    ``memory_budget`` (e.g. '512M', or the MemoryBudget shared by a
+    pipeline run) aggregates budget-sized chunks of the cleaned CSVs
+    instead of loading them (see memory_budget.py).
+
+    Cleaned DataFrames, or a fact_table.FactTable as ``facts``, may be
+    passed in to reuse data already held in memory; otherwise the saved
+    fact table is read when it is newer than the cleaned CSVs, and the CSVs
+    from ``DATA_DIR`` when it is not.
+    """
+    print("=" * 60)
+    print("CREATING POWER BI OPTIMIZED DATASETS")
+    print("=" * 60)
+
+    # Load cleaned data
+    print("\n[1/5] Loading cleaned datasets...")
+    budget = None
+    if memory_budget:
+        import memory_budget as budgeting
+        budget = budgeting.as_budget(memory_budget)
+        print(f"  Streaming chunks within the memory budget ({budget.describe()})")
+    else:
+        if bio_df is None or demo_df is None or enrol_df is None:
+            if facts is None:
+                import fact_table
+                facts = fact_table.load_current()
+            if facts is not None:
+                print(f"  Reading the activity fact table ({len(facts):,} facts)")
+                enrol_df, demo_df, bio_df = facts.frames()
+            else:
+                bio_df, demo_df, enrol_df = load_cleaned_data()
+
+        print(f"  Biometric: {len(bio_df):,} rows")
+        print(f"  Demographic: {len(demo_df):,} rows")
+        print(f"  Enrolment: {len(enrol_df):,} rows")
+
+    tables = build_powerbi_tables(bio_df, demo_df, enrol_df, shards, workers, budget, facts)
+
+    print("\nSaving summary tables...")
+    save_powerbi_tables(tables)
+
+    print("\n[6/6] Copying insight files...")
+    copy_insight_files()
+
+    print("\nUpdating ranking index...")
+    update_ranking_index(tables)
+
+    if plot:
+        print("\nRefreshing dashboard pages...")
+        refresh_dashboards(tables)
+
+    # ============================================================================
+    # SUMMARY
+    # ============================================================================
+    print("\n" + "=" * 60)
+    print("POWER BI DATA PREPARATION COMPLETE")
+    print("=" * 60)
+    print(f"\nOutput Directory: {POWERBI_DIR.absolute()}")
+    print("\nFiles created for Power BI:")
+    for f in sorted(POWERBI_DIR.glob('*.csv')):
+        size = f.stat().st_size / 1024
+        print(f"  {f.name:45} {size:>8.1f} KB")
+
+    if budget is not None:
+        budget.report()
+    print("\n✓ Data ready for Power BI import!")
+
+    return tables
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Local HTTP Query Service over In-Memory Aggregates
+===================================================
+Loads the Power BI summary tables (or rebuilds them from the cleaned data)
+once, keeps them in memory and answers filtered queries over a small
+asyncio HTTP/1.1 server with an LRU response cache.
+
+Endpoints (all GET, JSON responses):
+    /daily                 daily national summary
+    /states                state summary
+    /districts             district summary
+    /state-date            state-date trends
+    /suspicious-pincodes   pattern 1 misuse results
+    /misuse-top            top-k continuous misuse scores per window
+    /mass-registration     pattern 3 mass registration events
+    /sustained-activity    pattern 4 consecutive elevated-day runs
+    /health                view sizes and cache statistics
+
+Filters are passed as query parameters:
+    <column>=<value>   equality (case-insensitive for text columns)
+    start=, end=       inclusive date range (views with a date column)
+    sort=<column>      sort ascending, or sort=-<column> for descending
+    limit=, offset=    paging
+
+Unfiltered ``sort`` + ``limit`` queries on ranked metrics are answered
+from the precomputed ranking index (ranking_index.py) without sorting.
+
+Usage:
+    python query_service.py serve --port 8050
+    python query_service.py serve --from-cleaned
+    python query_service.py bench --requests 5000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+import pandas as pd
+
+import ranking_index
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+POWERBI_DIR = BASE_DIR / "powerbi_data"
+CLEANED_DIR = BASE_DIR / "cleaned_data"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+CACHE_SIZE = 1024
+
+# endpoint -> (source directory, file name, date column)
+VIEWS = {
+    'daily': (POWERBI_DIR, 'daily_national_summary.csv', 'date'),
+    'states': (POWERBI_DIR, 'state_summary.csv', None),
+    'districts': (POWERBI_DIR, 'district_summary.csv', None),
+    'state-date': (POWERBI_DIR, 'state_date_trends.csv', 'date'),
+    'suspicious-pincodes': (POWERBI_DIR, 'suspicious_pincodes_misuse.csv', None),
+    'misuse-top': (CLEANED_DIR, 'misuse_top_k.csv', None),
+    'mass-registration': (CLEANED_DIR, 'mass_registration_events.csv', 'date'),
+    'sustained-activity': (CLEANED_DIR, 'sustained_activity_runs.csv', 'start_date'),
+}
+
+# Summary tables that can be rebuilt from the cleaned data
+CUBE_VIEWS = {
+    'daily': 'daily_national_summary.csv',
+    'states': 'state_summary.csv',
+    'districts': 'district_summary.csv',
+    'state-date': 'state_date_trends.csv',
+}
+
+RESERVED_PARAMS = {'start', 'end', 'sort', 'limit', 'offset'}
+
+
+class QueryError(ValueError):
+    """Raised for a request the service cannot answer (bad view or filter)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def load_views(from_cleaned=False):
+    """
+    Load every view into memory.
+
+    With ``from_cleaned`` the summary tables are rebuilt from the cleaned
+    datasets instead of read from the Power BI folder.
+    """
+    views = {}
+    if from_cleaned:
+        import prepare_powerbi_data
+        tables = prepare_powerbi_data.build_powerbi_tables(*prepare_powerbi_data.load_cleaned_data())
+        for name, file_name in CUBE_VIEWS.items():
+            views[name] = tables[file_name]
+
+    for name, (directory, file_name, _) in VIEWS.items():
+        if name in views:
+            continue
+        path = directory / file_name
+        if path.exists():
+            views[name] = pd.read_csv(path)
+        else:
+            print(f"  Missing view source, skipping: {path}")
+
+    for name, df in views.items():
+        date_col = VIEWS[name][2]
+        if date_col and date_col in df.columns:
+            df = df.copy()
+            df[date_col] = pd.to_datetime(df[date_col])
+            views[name] = df
+    return views
+
+
+class QueryService:
+    """Filter in-memory views and memoize rendered responses."""
+
+    def __init__(self, views, cache_size=CACHE_SIZE):
+        self.views = views
+        self.rankings = {
+            name: ranking_index.get_index(VIEWS[name][1], df)
+            for name, df in views.items() if VIEWS[name][1] in ranking_index.RANKED_METRICS
+        }
+        self._cached_query = lru_cache(maxsize=cache_size)(self._query)
+
+    def handle(self, target):
+        """Answer a request target such as ``/districts?state=Bihar``."""
+        parts = urlsplit(target)
+        view = parts.path.strip('/')
+        if view == 'health':
+            return self.health()
+        params = tuple(sorted(parse_qsl(parts.query)))
+        return self._cached_query(view, params)
+
+    def cache_info(self):
+        return self._cached_query.cache_info()
+
+    def health(self):
+        info = self.cache_info()
+        body = {
+            'views': {name: len(df) for name, df in self.views.items()},
+            'cache': {'hits': info.hits, 'misses': info.misses,
+                      'size': info.currsize, 'maxsize': info.maxsize},
+        }
+        return json.dumps(body).encode()
+
+    def _query(self, view, params):
+        if view not in self.views:
+            raise QueryError(f"unknown view '{view}'", status=404)
+        df = self.views[view]
+        date_col = VIEWS[view][2]
+        params = dict(params)
+
+        mask = np.ones(len(df), dtype=bool)
+        for key, value in params.items():
+            if key in RESERVED_PARAMS:
+                continue
+            if key not in df.columns:
+                raise QueryError(f"unknown filter '{key}' for view '{view}'")
+            col = df[key]
+            if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+                try:
+                    mask &= (col == float(value)).to_numpy()
+                except ValueError:
+                    raise QueryError(f"filter '{key}' expects a number")
+            elif pd.api.types.is_datetime64_any_dtype(col):
+                try:
+                    mask &= (col == pd.Timestamp(value)).to_numpy()
+                except ValueError:
+                    raise QueryError(f"filter '{key}' expects a date")
+            else:
+                mask &= (col.astype(str).str.casefold() == value.casefold()).to_numpy()
+
+        for key, op in (('start', '__ge__'), ('end', '__le__')):
+            if key in params:
+                if not date_col:
+                    raise QueryError(f"view '{view}' has no date column")
+                try:
+                    bound = pd.Timestamp(params[key])
+                except ValueError:
+                    raise QueryError(f"invalid date for '{key}'")
+                mask &= getattr(df[date_col], op)(bound).to_numpy()
+
+        try:
+            offset = int(params.get('offset', 0))
+            limit = int(params['limit']) if 'limit' in params else None
+        except ValueError:
+            raise QueryError("limit and offset must be integers")
+
+        sort = params.get('sort')
+        col = sort.lstrip('-') if sort else None
+        if col is not None and col not in df.columns:
+            raise QueryError(f"cannot sort by unknown column '{col}'")
+
+        index = self.rankings.get(view)
+        if (index is not None and col in index.metrics and limit is not None
+                and mask.all() and offset + limit <= index.valid_counts[col]):
+            # Top/bottom-k straight from the ranking index
+            if sort.startswith('-'):
+                result = index.top_k(col, offset + limit)
+            else:
+                result = index.bottom_k(col, offset + limit)
+            result = result.iloc[offset:]
+        else:
+            result = df[mask]
+            if sort:
+                result = result.sort_values(col, ascending=not sort.startswith('-'), kind='stable')
+            result = result.iloc[offset:offset + limit if limit is not None else None]
+
+        if date_col and date_col in result.columns:
+            result = result.assign(**{date_col: result[date_col].dt.strftime('%Y-%m-%d')})
+        return result.to_json(orient='records').encode()
+
+
+# =============================================================================
+# HTTP SERVER
+# =============================================================================
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _response(status, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+async def _handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                writer.write(_response(400, b'{"error": "malformed request"}', False))
+                break
+            keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+            if method != 'GET':
+                status, body = 405, b'{"error": "only GET is supported"}'
+            else:
+                try:
+                    status, body = 200, service.handle(target)
+                except QueryError as e:
+                    status, body = e.status, json.dumps({'error': str(e)}).encode()
+                except Exception as e:
+                    status, body = 500, json.dumps({'error': repr(e)}).encode()
+
+            writer.write(_response(status, body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Start serving ``service``; returns the asyncio server object."""
+    return await asyncio.start_server(
+        lambda r, w: _handle_connection(service, r, w), host, port)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, from_cleaned=False, cache_size=CACHE_SIZE):
+    print("Loading views into memory...")
+    views = load_views(from_cleaned)
+    for name, df in views.items():
+        print(f"  {name:22} {len(df):>8,} rows")
+    service = QueryService(views, cache_size)
+
+    async def run():
+        server = await start_server(service, host, port)
+        print(f"\n✓ Serving on http://{host}:{port}/ (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def default_bench_paths(views):
+    """A representative mix of filtered requests for the benchmark."""
+    paths = ['/daily', '/daily?weekday=5', '/states?sort=-total_activity&limit=10',
+             '/districts?sort=bio_coverage_pct&limit=30', '/mass-registration',
+             '/suspicious-pincodes?limit=50']
+    if 'states' in views:
+        for state in views['states']['state'].astype(str).head(20):
+            paths.append(f"/districts?state={state.replace(' ', '%20')}")
+            paths.append(f"/state-date?state={state.replace(' ', '%20')}")
+    return [p for p in paths if p.split('?')[0].strip('/') in views]
+
+
+async def _bench_client(host, port, paths, n_requests, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(n_requests):
+            path = paths[i % len(paths)]
+            t0 = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+
+async def run_benchmark(service, n_requests=2000, concurrency=8, paths=None,
+                        host=DEFAULT_HOST, port=0):
+    """
+    Start a server on a free local port and drive it with keep-alive
+    clients. Returns latency percentiles (ms) and throughput (req/s).
+    """
+    paths = paths or default_bench_paths(service.views)
+    server = await start_server(service, host, port)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+    per_client = max(1, n_requests // concurrency)
+    async with server:
+        t0 = time.perf_counter()
+        await asyncio.gather(*[
+            _bench_client(host, port, paths[i:] + paths[:i], per_client, latencies)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - t0
+
+    lat_ms = np.array(latencies) * 1000
+    info = service.cache_info()
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(lat_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(lat_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(lat_ms, 99)), 3),
+        'cache_hits': info.hits,
+        'cache_misses': info.misses,
+    }
+
+
+def bench(n_requests=2000, concurrency=8, from_cleaned=False, cache_size=CACHE_SIZE):
+    print("Loading views into memory...")
+    views = load_views(from_cleaned)
+    for label, size in (('No cache', 0), ('LRU cache', cache_size)):
+        service = QueryService(views, size)
+        result = asyncio.run(run_benchmark(service, n_requests, concurrency))
+        print(f"\n{label}:")
+        for key, value in result.items():
+            print(f"  {key:15} {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local query service over UIDAI aggregates")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help="Run the HTTP service")
+    p_serve.add_argument('--host', default=DEFAULT_HOST)
+    p_serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+
+    p_bench = sub.add_parser('bench', help="Latency/throughput benchmark with a local client")
+    p_bench.add_argument('--requests', type=int, default=2000)
+    p_bench.add_argument('--concurrency', type=int, default=8)
+
+    for p in (p_serve, p_bench):
+        p.add_argument('--from-cleaned', action='store_true',
+                       help="Rebuild summary tables from cleaned_data/ instead of powerbi_data/")
+        p.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args.host, args.port, args.from_cleaned, args.cache_size)
+    else:
+        bench(args.requests, args.concurrency, args.from_cleaned, args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
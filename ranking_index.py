@@ -0,0 +1,149 @@
+"""
+Precomputed Ranking Index for Top/Bottom Region Reports
+=======================================================
+Stores, per table and metric, the ascending and descending sort orders of
+the rows and the metric's percentile cut points. The index is rebuilt
+whenever ``prepare_powerbi_data.py`` writes the summaries, so reports and the
+dashboard can answer top-k, bottom-k and percentile-band questions by
+slicing the stored order in O(k) instead of re-sorting the table.
+
+Rows are referenced by position, so an index is only valid for the exact
+table it was built from; a fingerprint check falls back to rebuilding when
+the table has changed.
+"""
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+INDEX_PATH = BASE_DIR / "powerbi_data" / "ranking_index.npz"
+
+# Percentile cut points stored per metric (0, 1, ..., 100)
+PERCENTILES = np.arange(0, 101)
+
+# table file -> metrics to rank
+RANKED_METRICS = {
+    'state_summary.csv': ['total_activity', 'bio_coverage_pct', 'child_share_pct'],
+    'district_summary.csv': ['total_activity', 'enrolment_total', 'bio_coverage_pct', 'child_share_pct'],
+    'pincode_prefix_summary.csv': ['total_activity', 'anomaly_score'],
+    'top_1_percent_enrolment_regions.csv': ['enrol_total'],
+    'lowest_biometric_coverage_regions.csv': ['bio_coverage_pct'],
+    'low_child_penetration_regions.csv': ['child_share'],
+    'high_variance_regions.csv': ['enrol_cv', 'bio_cv', 'demo_cv'],
+    'delayed_biometric_completion_regions.csv': ['best_lag_days'],
+}
+
+
+def table_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of a table's values and columns; row order matters."""
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    h.update('|'.join(map(str, df.columns)).encode())
+    return h.hexdigest()
+
+
+class RankingIndex:
+    """Sorted order and percentile cut points for the metrics of one table."""
+
+    def __init__(self, df, orders, valid_counts, cuts, fingerprint=None, desc_orders=None):
+        self.df = df
+        self.orders = orders              # metric -> ascending row positions, NaN last
+        self.desc_orders = desc_orders    # metric -> descending row positions, NaN last
+        self.valid_counts = valid_counts  # metric -> number of non-NaN values
+        self.cuts = cuts                  # metric -> values at PERCENTILES
+        self.fingerprint = fingerprint or table_fingerprint(df)
+
+    @classmethod
+    def build(cls, df, metrics):
+        orders, desc_orders, valid_counts, cuts = {}, {}, {}, {}
+        for metric in metrics:
+            if metric not in df.columns:
+                continue
+            values = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=float)
+            order = np.argsort(values, kind='stable')  # NaN sorts last
+            n_valid = int(np.count_nonzero(~np.isnan(values)))
+            orders[metric] = order
+            # Its own stable sort, so ties keep row order as in sort_values(ascending=False)
+            desc_orders[metric] = np.argsort(-values, kind='stable')
+            valid_counts[metric] = n_valid
+            if n_valid:
+                cuts[metric] = np.percentile(values[order[:n_valid]], PERCENTILES)
+            else:
+                cuts[metric] = np.full(len(PERCENTILES), np.nan)
+        return cls(df, orders, valid_counts, cuts, desc_orders=desc_orders)
+
+    @property
+    def metrics(self):
+        return list(self.orders)
+
+    def _positions(self, metric):
+        if metric not in self.orders:
+            raise KeyError(f"Metric '{metric}' is not indexed (have {self.metrics})")
+        return self.orders[metric], self.valid_counts[metric]
+
+    def top_k(self, metric, k) -> pd.DataFrame:
+        """Rows with the ``k`` largest values, largest first (ties in row order)."""
+        _, n_valid = self._positions(metric)
+        return self.df.iloc[self.desc_orders[metric][:min(k, n_valid)]]
+
+    def bottom_k(self, metric, k) -> pd.DataFrame:
+        """Rows with the ``k`` smallest values, smallest first."""
+        order, n_valid = self._positions(metric)
+        return self.df.iloc[order[:min(k, n_valid)]]
+
+    def percentile_band(self, metric, lower, upper) -> pd.DataFrame:
+        """Rows whose rank falls in the [lower, upper] percentile band, ascending."""
+        order, n_valid = self._positions(metric)
+        start = int(np.floor(n_valid * lower / 100))
+        stop = int(np.ceil(n_valid * upper / 100))
+        return self.df.iloc[order[start:stop]]
+
+    def cut(self, metric, percentile) -> float:
+        """Metric value at an integer percentile (linear interpolation)."""
+        self._positions(metric)
+        return float(self.cuts[metric][int(percentile)])
+
+
+def build_indexes(tables: dict) -> dict:
+    """Build a RankingIndex for every known table present in ``tables``."""
+    return {name: RankingIndex.build(df, RANKED_METRICS[name])
+            for name, df in tables.items() if name in RANKED_METRICS}
+
+
+def save_indexes(indexes: dict, path: Path = INDEX_PATH):
+    arrays = {}
+    for name, index in indexes.items():
+        arrays[f'{name}|fingerprint'] = np.array(index.fingerprint)
+        for metric in index.metrics:
+            arrays[f'{name}|{metric}|order'] = index.orders[metric]
+            arrays[f'{name}|{metric}|desc'] = index.desc_orders[metric]
+            arrays[f'{name}|{metric}|valid'] = np.array(index.valid_counts[metric])
+            arrays[f'{name}|{metric}|cuts'] = index.cuts[metric]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def get_index(name, df, path: Path = INDEX_PATH) -> RankingIndex:
+    """
+    Return the stored index for ``df`` when it still matches the table,
+    otherwise build one in memory. Indexes saved without descending orders
+    are rebuilt too.
+    """
+    fingerprint = table_fingerprint(df)
+    if path.exists():
+        with np.load(path) as stored:
+            metrics = [m for m in RANKED_METRICS.get(name, []) if f'{name}|{m}|order' in stored]
+            if (f'{name}|fingerprint' in stored and str(stored[f'{name}|fingerprint']) == fingerprint
+                    and all(f'{name}|{m}|desc' in stored for m in metrics)):
+                orders, desc_orders, valid_counts, cuts = {}, {}, {}, {}
+                for metric in metrics:
+                    orders[metric] = stored[f'{name}|{metric}|order']
+                    desc_orders[metric] = stored[f'{name}|{metric}|desc']
+                    valid_counts[metric] = int(stored[f'{name}|{metric}|valid'])
+                    cuts[metric] = stored[f'{name}|{metric}|cuts']
+                return RankingIndex(df, orders, valid_counts, cuts, fingerprint, desc_orders)
+    return RankingIndex.build(df, RANKED_METRICS.get(name, []))
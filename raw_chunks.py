@@ -0,0 +1,186 @@
+"""
+Compressed Raw Chunk Reader
+===========================
+Reads the raw ``api_data_aadhar_*`` chunks whether they are stored as plain
+CSV, gzip (``.csv.gz``) or zstd (``.csv.zst``). Compressed chunks are
+decompressed as a stream on a background thread and handed over in blocks
+through a bounded queue, while pandas parses them in row chunks on the main
+thread; zlib/zstd and the pandas C parser release the GIL, so the two
+overlap and a chunk is never held fully decompressed in memory.
+
+zstd support needs the optional ``zstandard`` package.
+
+Usage:
+    python raw_chunks.py compress api_data_aadhar_enrolment/api_data_aadhar_enrolment --format gz
+    python raw_chunks.py compress <dir> --format zst --remove
+"""
+
+import argparse
+import gzip
+import io
+import queue
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+SUFFIXES = {'.csv': None, '.csv.gz': 'gz', '.csv.zst': 'zst'}
+BLOCK_SIZE = 1 << 20        # decompressed bytes per hand-over
+QUEUE_BLOCKS = 8            # blocks buffered ahead of the parser
+CHUNK_ROWS = 500_000        # rows per pandas parse chunk
+
+
+def compression_of(path: Path):
+    """'gz', 'zst' or None for a raw chunk path (None for anything else)."""
+    name = Path(path).name.lower()
+    for suffix in ('.csv.gz', '.csv.zst'):
+        if name.endswith(suffix):
+            return SUFFIXES[suffix]
+    return None
+
+
+def _stem(path: Path) -> str:
+    name = Path(path).name
+    for suffix in ('.csv.gz', '.csv.zst', '.csv'):
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def find_chunks(directory: Path) -> list:
+    """
+    Raw chunk files in ``directory``, sorted by name. When a chunk exists
+    both plain and compressed, the plain file is used.
+    """
+    directory = Path(directory)
+    chosen = {}
+    for suffix in SUFFIXES:
+        for path in directory.glob('*' + suffix):
+            chosen.setdefault(_stem(path), path)
+    return [chosen[stem] for stem in sorted(chosen)]
+
+
+def open_compressed(path: Path):
+    """Binary stream of the decompressed contents of a .csv.gz / .csv.zst file."""
+    kind = compression_of(path)
+    if kind == 'gz':
+        return gzip.open(path, 'rb')
+    if kind == 'zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Reading {Path(path).name} needs the 'zstandard' package "
+                              f"(pip install zstandard)") from None
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    raise ValueError(f"Not a compressed chunk: {path}")
+
+
+class _BackgroundDecompressor(io.RawIOBase):
+    """Readable stream fed by a thread that decompresses ``path`` block by block."""
+
+    def __init__(self, path: Path, block_size=BLOCK_SIZE, queue_blocks=QUEUE_BLOCKS):
+        self._blocks = queue.Queue(maxsize=queue_blocks)
+        self._pending = memoryview(b'')
+        self._done = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(path, block_size), daemon=True)
+        self._thread.start()
+
+    def _produce(self, path, block_size):
+        try:
+            with open_compressed(path) as source:
+                while not self._stop.is_set():
+                    block = source.read(block_size)
+                    if not block:
+                        break
+                    self._put(block)
+        except BaseException as exc:  # re-raised in the reading thread
+            self._put(exc)
+        finally:
+            self._put(None)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._done:
+            item = self._blocks.get()
+            if item is None:
+                self._done = True
+            elif isinstance(item, BaseException):
+                self._done = True
+                raise item
+            else:
+                self._pending = memoryview(item)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        super().close()
+
+
+def iter_chunk(path: Path, chunk_rows=CHUNK_ROWS, **read_csv_kwargs):
+    """Yield one raw chunk as DataFrames of at most ``chunk_rows`` rows."""
+    if compression_of(path) is None:
+        with pd.read_csv(path, chunksize=chunk_rows, **read_csv_kwargs) as reader:
+            yield from reader
+        return
+    with io.BufferedReader(_BackgroundDecompressor(path), buffer_size=BLOCK_SIZE) as stream:
+        yield from pd.read_csv(stream, chunksize=chunk_rows, **read_csv_kwargs)
+
+
+def read_chunk(path: Path, chunk_rows=CHUNK_ROWS, **read_csv_kwargs) -> pd.DataFrame:
+    """Read one raw chunk, decompressing in the background when needed."""
+    if compression_of(path) is None:
+        return pd.read_csv(path, **read_csv_kwargs)
+    parts = list(iter_chunk(path, chunk_rows, **read_csv_kwargs))
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+
+def compress_directory(directory: Path, fmt='gz', remove=False, level=None):
+    """Write a compressed copy of every plain CSV chunk in ``directory``."""
+    if fmt == 'zst':
+        import zstandard
+    for path in sorted(Path(directory).glob('*.csv')):
+        target = path.with_name(path.name + ('.gz' if fmt == 'gz' else '.zst'))
+        with open(path, 'rb') as source:
+            if fmt == 'gz':
+                with gzip.open(target, 'wb', compresslevel=level or 6) as sink:
+                    while block := source.read(BLOCK_SIZE):
+                        sink.write(block)
+            else:
+                with open(target, 'wb') as raw:
+                    zstandard.ZstdCompressor(level=level or 10).copy_stream(source, raw)
+        before, after = path.stat().st_size, target.stat().st_size
+        print(f"  {path.name}: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB "
+              f"({before / max(after, 1):.1f}x)")
+        if remove:
+            path.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress raw API data chunks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('compress', help="Compress every *.csv chunk in a directory")
+    p.add_argument('directory', type=Path)
+    p.add_argument('--format', choices=['gz', 'zst'], default='gz')
+    p.add_argument('--level', type=int, default=None, help="Compression level")
+    p.add_argument('--remove', action='store_true', help="Delete the plain CSVs afterwards")
+    args = parser.parse_args()
+    compress_directory(args.directory, args.format, args.remove, args.level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Vectorized Cross-Dataset Correlation per Region
+===============================================
+Correlates the daily enrolment, demographic and biometric series of every
+region (district ``STATE - DISTRICT`` or pincode) at once, to find regions
+whose update activity has decoupled from enrolment.
+
+The three daily series of all regions are stacked into one
+(region x date x 3) array and centred on each series' mean. One batched
+matrix product, (R x 3 x T) @ (R x T x 3), then gives every region's 3 x 3
+covariance matrix, which is normalised to correlations. There is no loop
+over regions; regions are processed in chunks only to bound memory.
+
+Decoupling score:
+    decoupling = 1 - mean(corr(enrol, demo), corr(enrol, bio))
+It ranges from 0 (updates move exactly with enrolment) to 2 (they move
+opposite to it). Regions with fewer than MIN_ACTIVE_DAYS active days, or
+with a flat series, are left unranked.
+
+Output columns: rank, region, decoupling, corr_enrol_demo, corr_enrol_bio,
+corr_demo_bio, active_days, enrolment, demographic, biometric
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+from lag_analysis import stack_region_series
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "cleaned_data"
+OUTPUT_DIR = BASE_DIR / "outputs"
+
+MIN_ACTIVE_DAYS = 10
+CHUNK_REGIONS = 8192
+
+SERIES_COLUMNS = {
+    'enrol': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demo': ['demo_age_5_17', 'demo_age_17_'],
+    'bio': ['bio_age_5_17', 'bio_age_17_'],
+}
+PAIRS = [('enrol', 'demo'), ('enrol', 'bio'), ('demo', 'bio')]
+
+OUTPUT_FILES = {
+    'district': 'decoupled_regions.csv',
+    'pincode': 'decoupled_pincodes.csv',
+}
+
+
+def correlation_matrices(series: np.ndarray) -> np.ndarray:
+    """
+    Pearson correlation matrices for a (region x date x k) array; returns
+    (region x k x k) with NaN wherever a series has no variance.
+    """
+    centred = series - series.mean(axis=1, keepdims=True)
+    cov = np.matmul(centred.transpose(0, 2, 1), centred)
+    scale = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    tol = 1e-12 * np.maximum(np.abs(series).max(axis=1), 1)
+    scale = np.where(scale > tol * np.sqrt(series.shape[1]), scale, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / scale[:, :, None] / scale[:, None, :]
+    return np.clip(corr, -1, 1)
+
+
+@traced()
+def region_correlations(enrol_df, demo_df, bio_df, level='district',
+                        chunk_size=CHUNK_REGIONS) -> pd.DataFrame:
+    """Pairwise daily-series correlations for every region (unfiltered)."""
+    regions, dates, matrices = stack_region_series(
+        [(df, SERIES_COLUMNS[name]) for name, df in zip(SERIES_COLUMNS, (enrol_df, demo_df, bio_df))],
+        level)
+    stacked = np.stack(matrices, axis=2)            # region x date x 3
+
+    corr = np.full((len(regions), 3, 3), np.nan)
+    for start in range(0, len(regions), chunk_size):
+        corr[start:start + chunk_size] = correlation_matrices(stacked[start:start + chunk_size])
+
+    names = list(SERIES_COLUMNS)
+    table = pd.DataFrame({'region': regions})
+    for a, b in PAIRS:
+        table[f'corr_{a}_{b}'] = corr[:, names.index(a), names.index(b)]
+    table['active_days'] = np.count_nonzero(stacked.sum(axis=2) > 0, axis=1)
+    for name, full in zip(names, ('enrolment', 'demographic', 'biometric')):
+        table[full] = stacked[:, :, names.index(name)].sum(axis=1).astype(np.int64)
+    return table
+
+
+def decoupling_table(correlations: pd.DataFrame, min_active_days=MIN_ACTIVE_DAYS) -> pd.DataFrame:
+    """Rank regions by how far demo/bio updates have decoupled from enrolment."""
+    table = correlations.copy()
+    table['decoupling'] = 1 - table[['corr_enrol_demo', 'corr_enrol_bio']].mean(axis=1, skipna=False)
+    ranked = table[(table['active_days'] >= min_active_days) & table['decoupling'].notna()]
+    ranked = ranked.sort_values(['decoupling', 'region'], ascending=[False, True]).reset_index(drop=True)
+    ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+    columns = ['rank', 'region', 'decoupling'] + [f'corr_{a}_{b}' for a, b in PAIRS] + \
+              ['active_days', 'enrolment', 'demographic', 'biometric']
+    return ranked[columns].round({c: 4 for c in columns if c.startswith(('corr', 'decoupling'))})
+
+
+def main(enrol_df=None, demo_df=None, bio_df=None, level='district',
+         min_active_days=MIN_ACTIVE_DAYS, output_dir: Path = OUTPUT_DIR):
+    print("=" * 70)
+    print(f"CROSS-DATASET CORRELATION - DECOUPLED REGIONS ({level.upper()} LEVEL)")
+    print("=" * 70)
+
+    if enrol_df is None or demo_df is None or bio_df is None:
+        import fact_table
+        facts = fact_table.load_current()
+        if facts is not None:
+            print("\nReading the activity fact table...")
+            enrol_df, demo_df, bio_df = facts.frames()
+        else:
+            print("\nLoading cleaned datasets...")
+            enrol_df = pd.read_csv(DATA_DIR / "enrolment_cleaned.csv")
+            demo_df = pd.read_csv(DATA_DIR / "demographic_cleaned.csv")
+            bio_df = pd.read_csv(DATA_DIR / "biometric_cleaned.csv")
+
+    correlations = region_correlations(enrol_df, demo_df, bio_df, level)
+    ranked = decoupling_table(correlations, min_active_days)
+
+    print(f"\n  Regions analysed:                  {len(correlations):,}")
+    print(f"  Ranked (>= {min_active_days} active days, varying): {len(ranked):,}")
+    if len(ranked) > 0:
+        print(f"  Median corr(enrol, demo): {ranked['corr_enrol_demo'].median():.3f}")
+        print(f"  Median corr(enrol, bio):  {ranked['corr_enrol_bio'].median():.3f}")
+        print("\nMost Decoupled Regions (Top 10):")
+        print(ranked.head(10).to_string(index=False))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    out_path = output_dir / OUTPUT_FILES[level]
+    ranked.to_csv(out_path, index=False)
+    print(f"\n✓ Saved: {out_path.name}")
+    return ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-region enrolment/update correlations")
+    parser.add_argument('--level', choices=list(OUTPUT_FILES), default='district')
+    parser.add_argument('--min-active-days', type=int, default=MIN_ACTIVE_DAYS)
+    args = parser.parse_args()
+    main(level=args.level, min_active_days=args.min_active_days)
@@ -0,0 +1,246 @@
+"""
+Streaming Region Variance (High-Variance Region Analysis)
+=========================================================
+Accumulates, per region and dataset, the count, mean and sum of squared
+deviations (M2) of daily activity, one batch of days at a time. Batches are
+folded in with Chan's parallel update, so accumulators built over different
+date ranges (or different regions) can be merged, and the region x day
+table never has to be materialized.
+
+A region's active days are the days it shows up in any of the three
+datasets; a dataset with no rows on an active day counts as zero that day.
+
+Each update must carry every row of the days it covers - a day split
+across two updates would be counted twice, which ``update`` rejects.
+
+The sync stage does not re-read the cleaned data for this: as it writes
+each chunk of cleaned rows it adds the chunk to a DailyTotals, which keeps
+only the per-(region, date) totals and folds them in by batches of days
+at the end.
+
+Output columns (outputs/high_variance_regions.csv):
+    region, enrol_mean, enrol_std, active_days, bio_mean, bio_std,
+    demo_mean, demo_std, enrol_cv, bio_cv, demo_cv, high_variance
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+from lag_analysis import region_labels
+
+# Configuration
+BASE_DIR = Path(__file__).parent
+DATA_DIR = BASE_DIR / "cleaned_data"
+OUTPUT_DIR = BASE_DIR / "outputs"
+
+DAYS_PER_BATCH = 7
+CV_PERCENTILE = 75
+
+DATASETS = ('enrol', 'bio', 'demo')
+TOTAL_PREFIXES = {
+    'enrol': ('age_',),
+    'bio': ('bio_age',),
+    'demo': ('demo_age',),
+}
+
+
+class Moments:
+    """Count, mean and M2 per key, mergeable across disjoint observations."""
+
+    def __init__(self, stats: pd.DataFrame = None):
+        if stats is None:
+            stats = pd.DataFrame({'count': pd.Series(dtype=float),
+                                  'mean': pd.Series(dtype=float),
+                                  'm2': pd.Series(dtype=float)})
+        self.stats = stats
+
+    @classmethod
+    def from_values(cls, keys, values):
+        """Moments of ``values`` grouped by ``keys`` (one batch)."""
+        values = pd.Series(np.asarray(values, dtype=float))
+        keys = np.asarray(keys)
+        grouped = values.groupby(keys)
+        count = grouped.count()
+        mean = grouped.mean()
+        m2 = ((values - mean.reindex(keys).to_numpy()) ** 2).groupby(keys).sum()
+        return cls(pd.DataFrame({'count': count.astype(float), 'mean': mean, 'm2': m2}))
+
+    def merge(self, other: 'Moments') -> 'Moments':
+        """Combine with moments over a disjoint set of observations."""
+        index = self.stats.index.union(other.stats.index)
+        a = self.stats.reindex(index, fill_value=0.0)
+        b = other.stats.reindex(index, fill_value=0.0)
+        n = a['count'] + b['count']
+        delta = b['mean'] - a['mean']
+        safe_n = n.where(n > 0, 1.0)
+        mean = a['mean'] + delta * b['count'] / safe_n
+        m2 = a['m2'] + b['m2'] + delta ** 2 * a['count'] * b['count'] / safe_n
+        return Moments(pd.DataFrame({'count': n, 'mean': mean, 'm2': m2}))
+
+    def std(self, ddof=1) -> pd.Series:
+        n = self.stats['count']
+        return np.sqrt(self.stats['m2'] / (n - ddof)).where(n > ddof)
+
+
+def daily_totals(df: pd.DataFrame, dataset: str) -> pd.Series:
+    """Total activity per (region, date) for one dataset."""
+    cols = [c for c in df.columns if c.startswith(TOTAL_PREFIXES[dataset])]
+    total = df[cols].sum(axis=1)
+    return total.groupby([region_labels(df, 'district'), df['date']]).sum()
+
+
+class RegionVariance:
+    """Streaming accumulator behind the high-variance region table."""
+
+    def __init__(self):
+        self.moments = {name: Moments() for name in DATASETS}
+        self.seen_dates = set()
+
+    def update(self, enrolment_df, demographic_df, biometric_df):
+        """Fold in a batch of complete days from the three datasets."""
+        frames = {'enrol': enrolment_df, 'bio': biometric_df, 'demo': demographic_df}
+        return self.update_daily(pd.concat({name: daily_totals(df, name) for name, df in frames.items()},
+                                           axis=1).fillna(0.0))
+
+    def update_daily(self, daily: pd.DataFrame):
+        """Fold in complete days given as (region, date) rows of per-dataset totals."""
+        if daily.empty:
+            return self
+
+        dates = set(daily.index.get_level_values(1))
+        repeated = dates & self.seen_dates
+        if repeated:
+            raise ValueError(f"Days already accumulated: {sorted(repeated)[:5]}")
+        self.seen_dates |= dates
+
+        regions = daily.index.get_level_values(0)
+        for name in DATASETS:
+            self.moments[name] = self.moments[name].merge(Moments.from_values(regions, daily[name]))
+        return self
+
+    def merge(self, other: 'RegionVariance') -> 'RegionVariance':
+        """Combine with an accumulator built over other days or other regions."""
+        merged = RegionVariance()
+        merged.moments = {name: self.moments[name].merge(other.moments[name]) for name in DATASETS}
+        merged.seen_dates = self.seen_dates | other.seen_dates
+        return merged
+
+    def to_frame(self) -> pd.DataFrame:
+        """Per-region mean, std and CV of daily activity for each dataset."""
+        table = pd.DataFrame(index=self.moments['enrol'].stats.index.rename('region'))
+        for name in DATASETS:
+            stats = self.moments[name].stats.reindex(table.index)
+            table[f'{name}_mean'] = stats['mean']
+            table[f'{name}_std'] = self.moments[name].std().reindex(table.index)
+            if name == 'enrol':
+                table['active_days'] = stats['count'].astype(int)
+        for name in DATASETS:
+            mean = table[f'{name}_mean']
+            table[f'{name}_cv'] = (table[f'{name}_std'] / mean.where(mean > 0)).round(4)
+        return table.reset_index()
+
+
+class DailyTotals:
+    """
+    Per-(region, date) totals of each dataset, summed from row chunks as
+    they are written, so a day may span several chunks. Only these totals
+    are kept, never the rows.
+    """
+
+    COMPACT_EVERY = 32  # partial tables held before they are summed into one
+
+    def __init__(self):
+        self.parts = {name: [] for name in DATASETS}
+
+    def add(self, dataset, chunk: pd.DataFrame):
+        parts = self.parts[dataset]
+        parts.append(daily_totals(chunk, dataset))
+        if len(parts) >= self.COMPACT_EVERY:
+            self.parts[dataset] = [self._combined(dataset)]
+
+    def _combined(self, dataset) -> pd.Series:
+        parts = self.parts[dataset]
+        if not parts:
+            return pd.Series(dtype=float)
+        return pd.concat(parts).groupby(level=[0, 1]).sum()
+
+    @traced()
+    def variance(self, days_per_batch=DAYS_PER_BATCH) -> RegionVariance:
+        """Fold the totals into a RegionVariance, batch by batch of days as ``accumulate`` does."""
+        daily = pd.concat({name: self._combined(name) for name in ('enrol', 'bio', 'demo')},
+                          axis=1).fillna(0.0)
+        variance = RegionVariance()
+        if daily.empty:
+            return variance
+        dates = pd.to_datetime(daily.index.get_level_values(1), format='%d-%m-%Y')
+        batch = ((dates - dates.min()).days // days_per_batch).to_numpy()
+        for b in np.unique(batch):
+            variance.update_daily(daily[batch == b])
+        return variance
+
+
+@traced()
+def accumulate(enrolment_df, demographic_df, biometric_df,
+               days_per_batch=DAYS_PER_BATCH) -> RegionVariance:
+    """Stream the three datasets through a RegionVariance in batches of days."""
+    first = min(pd.to_datetime(df['date'], format='%d-%m-%Y').min()
+                for df in (enrolment_df, demographic_df, biometric_df))
+    groups = []
+    for df in (enrolment_df, demographic_df, biometric_df):
+        offset = (pd.to_datetime(df['date'], format='%d-%m-%Y') - first).dt.days
+        groups.append(df.groupby((offset // days_per_batch).to_numpy()))
+    batches = sorted(set().union(*(g.groups for g in groups)))
+
+    variance = RegionVariance()
+    for batch in batches:
+        parts = [g.get_group(batch) if batch in g.groups else df.iloc[:0]
+                 for g, df in zip(groups, (enrolment_df, demographic_df, biometric_df))]
+        variance.update(*parts)
+    return variance
+
+
+def high_variance_regions(table: pd.DataFrame, percentile=CV_PERCENTILE):
+    """
+    Flag regions whose CV in any dataset exceeds the given percentile of
+    all CVs. Returns (flagged regions sorted by enrol_cv, threshold).
+    """
+    cvs = table[[f'{name}_cv' for name in DATASETS]]
+    threshold = float(np.nanpercentile(cvs.to_numpy(dtype=float), percentile))
+    table = table.copy()
+    table['high_variance'] = (cvs > threshold).any(axis=1)
+    flagged = table[table['high_variance']].sort_values('enrol_cv', ascending=False, na_position='last')
+    columns = ['region', 'enrol_mean', 'enrol_std', 'active_days', 'bio_mean', 'bio_std',
+               'demo_mean', 'demo_std', 'enrol_cv', 'bio_cv', 'demo_cv', 'high_variance']
+    return flagged[columns].reset_index(drop=True), threshold
+
+
+def save_high_variance_regions(variance: RegionVariance, output_dir: Path = OUTPUT_DIR):
+    table = variance.to_frame()
+    flagged, threshold = high_variance_regions(table)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    flagged.to_csv(output_dir / "high_variance_regions.csv", index=False)
+    print(f"  Regions: {len(table):,} | CV threshold (p{CV_PERCENTILE}): {threshold:.3f} "
+          f"| High variance: {len(flagged):,}")
+    print(f"  Saved: {output_dir / 'high_variance_regions.csv'}")
+    return flagged
+
+
+def main(enrolment_df=None, demographic_df=None, biometric_df=None):
+    print("=" * 70)
+    print("HIGH VARIANCE REGIONS - STREAMING MOMENTS")
+    print("=" * 70)
+
+    if enrolment_df is None or demographic_df is None or biometric_df is None:
+        print("\nLoading cleaned datasets...")
+        enrolment_df = pd.read_csv(DATA_DIR / "enrolment_cleaned.csv")
+        demographic_df = pd.read_csv(DATA_DIR / "demographic_cleaned.csv")
+        biometric_df = pd.read_csv(DATA_DIR / "biometric_cleaned.csv")
+
+    return save_high_variance_regions(accumulate(enrolment_df, demographic_df, biometric_df))
+
+
+if __name__ == "__main__":
+    main()
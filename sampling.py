@@ -0,0 +1,144 @@
+"""
+Stratified Pincode Sampling for Fast Exploratory Runs
+======================================================
+Draws a reproducible sample of pincodes stratified by state and activity
+decile (within the state), and keeps every row of the sampled pincodes so
+their daily series stay intact.
+
+Selection is deterministic: within each stratum pincodes are ordered by a
+hash of (seed, pincode) and the first n_h are taken, so the same seed and
+fraction always give the same sample and a larger fraction extends a
+smaller one.
+
+Totals are scaled back up with the stratified expansion estimator
+
+    total = sum_h N_h * mean_h
+    var   = sum_h N_h^2 * (1 - n_h / N_h) * s_h^2 / n_h
+
+over per-pincode totals, and reported with 95% confidence intervals.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FRACTION = 0.1
+DEFAULT_SEED = 42
+MIN_PER_STRATUM = 2
+Z_95 = 1.96
+
+DATASET_COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+
+
+def pincode_strata(enrolment_df, demographic_df, biometric_df) -> pd.DataFrame:
+    """One row per pincode: state, total activity, decile within state, stratum."""
+    parts = []
+    for name, df in (('enrolment', enrolment_df), ('demographic', demographic_df),
+                     ('biometric', biometric_df)):
+        parts.append(pd.DataFrame({
+            'pincode': df['pincode'].to_numpy(),
+            'state': df['state'].to_numpy(),
+            'activity': df[DATASET_COLUMNS[name]].sum(axis=1).to_numpy(),
+        }))
+    rows = pd.concat(parts, ignore_index=True)
+    pins = rows.groupby('pincode').agg(state=('state', 'first'), activity=('activity', 'sum'))
+
+    pct = pins.groupby('state')['activity'].rank(method='first', pct=True)
+    pins['decile'] = np.clip(np.ceil(pct * 10).astype(int) - 1, 0, 9)
+    pins['stratum'] = pins['state'].astype(str) + '|' + pins['decile'].astype(str)
+    return pins.reset_index()
+
+
+def draw_sample(strata: pd.DataFrame, fraction=DEFAULT_FRACTION, seed=DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Pick pincodes per stratum. Returns the sampling design: one row per
+    sampled pincode with its stratum, stratum size N_h, sample size n_h and
+    expansion weight N_h / n_h.
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError("fraction must be in (0, 1]")
+    keys = strata['pincode'].astype(str) + f'|{seed}'
+    ordered = strata.assign(_order=pd.util.hash_pandas_object(keys, index=False).to_numpy())
+    ordered = ordered.sort_values(['stratum', '_order'])
+
+    sizes = ordered.groupby('stratum')['pincode'].transform('size')
+    take = np.minimum(sizes, np.maximum(MIN_PER_STRATUM, np.ceil(sizes * fraction))).astype(int)
+    position = ordered.groupby('stratum').cumcount()
+
+    design = ordered[position < take].drop(columns='_order').copy()
+    design['stratum_size'] = sizes[position < take]
+    design['sample_size'] = take[position < take]
+    design['weight'] = design['stratum_size'] / design['sample_size']
+    return design.reset_index(drop=True)
+
+
+def sample_frames(enrolment_df, demographic_df, biometric_df,
+                  fraction=DEFAULT_FRACTION, seed=DEFAULT_SEED):
+    """
+    Restrict the three datasets to a stratified pincode sample.
+    Returns (enrolment, demographic, biometric, design).
+    """
+    strata = pincode_strata(enrolment_df, demographic_df, biometric_df)
+    design = draw_sample(strata, fraction, seed)
+    keep = design['pincode'].to_numpy()
+    frames = [df[df['pincode'].isin(keep)].reset_index(drop=True)
+              for df in (enrolment_df, demographic_df, biometric_df)]
+    print(f"  Sample: {len(design):,} of {len(strata):,} pincodes "
+          f"({strata['stratum'].nunique():,} strata, fraction {fraction:g}, seed {seed}) - "
+          f"{sum(len(f) for f in frames):,} of "
+          f"{len(enrolment_df) + len(demographic_df) + len(biometric_df):,} rows")
+    return (*frames, design)
+
+
+def estimate_totals(enrolment_df, demographic_df, biometric_df, design) -> pd.DataFrame:
+    """Scaled-up totals of every count column, with standard errors and 95% CIs."""
+    rows = []
+    strata = design.set_index('pincode')[['stratum', 'stratum_size', 'sample_size']]
+    for name, df in (('enrolment', enrolment_df), ('demographic', demographic_df),
+                     ('biometric', biometric_df)):
+        columns = DATASET_COLUMNS[name]
+        per_pin = df.groupby('pincode')[columns].sum()
+        per_pin['total'] = per_pin[columns].sum(axis=1)
+        # Sampled pincodes with no rows in this dataset contribute zero
+        per_pin = per_pin.reindex(strata.index, fill_value=0).join(strata)
+
+        grouped = per_pin.groupby('stratum')
+        size = grouped['stratum_size'].first()
+        n = grouped['sample_size'].first()
+        for measure in columns + ['total']:
+            mean = grouped[measure].mean()
+            var = grouped[measure].var(ddof=1).fillna(0.0)
+            estimate = float((size * mean).sum())
+            se = float(np.sqrt((size ** 2 * (1 - n / size) * var / n).sum()))
+            rows.append({
+                'dataset': name,
+                'measure': measure,
+                'sample_total': float(per_pin[measure].sum()),
+                'estimated_total': round(estimate, 1),
+                'std_error': round(se, 1),
+                'lower_95': round(estimate - Z_95 * se, 1),
+                'upper_95': round(estimate + Z_95 * se, 1),
+            })
+    return pd.DataFrame(rows)
+
+
+def sample_for_exploration(enrolment_df, demographic_df, biometric_df,
+                           fraction=DEFAULT_FRACTION, seed=DEFAULT_SEED):
+    """
+    Sample the datasets and print the scaled-up totals.
+    Returns (enrolment, demographic, biometric, estimates).
+    """
+    print("\n[SAMPLE MODE] Drawing stratified pincode sample...")
+    enrolment_df, demographic_df, biometric_df, design = sample_frames(
+        enrolment_df, demographic_df, biometric_df, fraction, seed)
+    estimates = estimate_totals(enrolment_df, demographic_df, biometric_df, design)
+    totals = estimates[estimates['measure'] == 'total']
+    print("\n  Estimated full-data totals (95% CI):")
+    for _, r in totals.iterrows():
+        print(f"    {r['dataset']:<12} {r['estimated_total']:>15,.0f}  "
+              f"[{r['lower_95']:,.0f} - {r['upper_95']:,.0f}]")
+    print("  Note: counts and charts below describe the sample only")
+    return enrolment_df, demographic_df, biometric_df, estimates
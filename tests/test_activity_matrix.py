@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import activity_matrix
+
+COLUMNS = activity_matrix.DATASET_COLUMNS['biometric']
+
+
+def bursty_activity(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-09-01', periods=40)
+    rows = []
+    for pincode in range(400001, 400041):
+        active = np.sort(rng.choice(len(dates), rng.integers(5, 40), replace=False))
+        for day in active:
+            scale = 40 if rng.random() < 0.25 else 4
+            rows.append([dates[day].strftime('%d-%m-%Y'), pincode, *rng.poisson(scale, 2)])
+    df = pd.DataFrame(rows, columns=['date', 'pincode'] + COLUMNS)
+    return pd.concat([df, df.sample(frac=0.1, random_state=seed)], ignore_index=True)  # repeated days
+
+
+def brute_force_runs(df, factor, min_count, min_days):
+    daily = (df[COLUMNS].sum(axis=1)
+             .groupby([df['pincode'], pd.to_datetime(df['date'], format='%d-%m-%Y')]).sum())
+    runs = set()
+    for pincode, series in daily.groupby(level=0):
+        series = series.droplevel(0)
+        series = series[series > 0]
+        baseline = np.median(series.to_numpy())
+        elevated = [d for d, v in series.items() if v >= factor * baseline and v >= min_count]
+        run = []
+        for day in elevated + [None]:
+            if run and (day is None or day != run[-1] + pd.Timedelta(days=1)):
+                if len(run) >= min_days:
+                    runs.add((pincode, run[0].strftime('%Y-%m-%d'), len(run),
+                              int(series[run].sum())))
+                run = []
+            if day is not None:
+                run.append(day)
+    return runs
+
+
+def test_sustained_runs_match_brute_force():
+    df = bursty_activity()
+    for factor, min_count, min_days in [(3.0, 10, 3), (2.0, 5, 2), (1.5, 1, 4)]:
+        found = activity_matrix.find_sustained_runs(
+            activity_matrix.ActivityMatrix.from_frame(df, COLUMNS), factor, min_count, min_days)
+        assert {(p, s, d, a) for p, s, d, a in
+                found[['pincode', 'start_date', 'days', 'activity']].itertuples(index=False)} \
+            == brute_force_runs(df, factor, min_count, min_days)
+
+
+def test_baselines_are_medians_of_active_days():
+    df = bursty_activity(seed=1)
+    activity = activity_matrix.ActivityMatrix.from_frame(df, COLUMNS)
+    daily = (df[COLUMNS].sum(axis=1).groupby([df['pincode'], df['date']]).sum())
+    expected = daily[daily > 0].groupby(level=0).median()
+    assert np.allclose(activity.baselines(), expected.reindex(activity.pincodes).to_numpy())
@@ -0,0 +1,13 @@
+from pathlib import Path
+
+import analytics_store
+
+
+def test_slice_dir_keeps_slices_apart_from_full_outputs():
+    base = Path('cleaned_data')
+    assert analytics_store.slice_dir(base) == base
+    assert analytics_store.slice_dir(base, state=None) == base
+    assert (analytics_store.slice_dir(base, state='Bihar', start='2025-10-01')
+            == base / 'slices' / 'state-bihar_start-2025-10-01')
+    assert (analytics_store.slice_dir(base, state='Jammu & Kashmir', district='Leh (Ladakh)')
+            == base / 'slices' / 'state-jammu-kashmir_district-leh-ladakh')
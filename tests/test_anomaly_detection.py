@@ -0,0 +1,26 @@
+import pandas as pd
+
+import anomaly_detection
+
+ENROLMENT_COLUMNS = ['date', 'state', 'district', 'pincode', 'age_0_5', 'age_5_17', 'age_18_greater']
+DEMOGRAPHIC_COLUMNS = ['date', 'state', 'district', 'pincode', 'demo_age_5_17', 'demo_age_17_']
+BIOMETRIC_COLUMNS = ['date', 'state', 'district', 'pincode', 'bio_age_5_17', 'bio_age_17_']
+
+
+def empty_slice():
+    # What the analytics store returns for a --start/--end range with no rows
+    return tuple(pd.DataFrame(columns=columns, dtype=object)
+                 for columns in (ENROLMENT_COLUMNS, DEMOGRAPHIC_COLUMNS, BIOMETRIC_COLUMNS))
+
+
+def test_misuse_scores_of_an_empty_slice(tmp_path):
+    enrolment, _, biometric = empty_slice()
+    scores, top = anomaly_detection.analyze_misuse_scores(enrolment, biometric, output_dir=tmp_path)
+    assert len(scores) == 0 and len(top) == 0
+    assert (tmp_path / 'misuse_scores.csv').exists()
+
+
+def test_spike_and_sustained_patterns_of_an_empty_slice(tmp_path):
+    mass_reg, *_ = anomaly_detection.analyze_spike_pattern(*empty_slice(), plot=False, output_dir=tmp_path)
+    runs = anomaly_detection.analyze_sustained_pattern(*empty_slice(), output_dir=tmp_path)
+    assert len(mass_reg) == 0 and len(runs) == 0
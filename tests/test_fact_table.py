@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import anomaly_detection
+import fact_table
+import prepare_powerbi_data
+
+COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+
+
+def cleaned_frames(rows=1_500, seed=2):
+    # Many rows per (pincode, date), and pincodes seen under several spellings
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-10-01', periods=15).strftime('%d-%m-%Y')
+    pincodes = rng.choice(np.arange(110000, 860000), 80, replace=False)
+    frames = []
+    for columns in COLUMNS.values():
+        df = pd.DataFrame({'date': rng.choice(dates, rows),
+                           'state': rng.choice(['Bihar', 'BIHAR', 'Kerala', 'Orissa'], rows),
+                           'district': rng.choice(['Purnea', 'Purnia', 'Howrah'], rows),
+                           'pincode': rng.choice(pincodes, rows)})
+        for column in columns:
+            df[column] = rng.integers(0, 30, rows)
+        frames.append(df)
+    return tuple(frames)
+
+
+def same_csv(a: pd.DataFrame, b: pd.DataFrame):
+    assert a.to_csv(index=False) == b.to_csv(index=False)
+
+
+def test_merge_sorted_matches_unique():
+    rng = np.random.default_rng(4)
+    runs = [np.sort(rng.integers(0, 500, n)) for n in (300, 0, 120, 40)]
+    assert (fact_table.merge_sorted(*runs) == np.unique(np.concatenate(runs))).all()
+
+
+def test_views_keep_sums_and_first_occurrence_order():
+    frames = cleaned_frames()
+    facts = fact_table.build_fact_table(*frames)
+    for df, view, columns in zip(frames, facts.frames(), COLUMNS.values()):
+        keys = ['pincode', 'date', 'state', 'district']
+        same_csv(df.groupby(keys)[columns].sum().reset_index(),
+                 view.groupby(keys)[columns].sum().reset_index())
+        assert list(view['pincode'].unique()) == list(df['pincode'].unique())
+        assert list(view.columns) == list(df.columns)
+
+
+def test_anomaly_tables_match_the_cleaned_rows():
+    enrol, demo, bio = cleaned_frames()
+    bio = bio[bio['pincode'] % 5 != 0]          # pincodes with no biometric rows
+    tables = fact_table.anomaly_tables(fact_table.build_fact_table(enrol, demo, bio))
+    same_csv(tables['misuse'], anomaly_detection.misuse_table(enrol.copy(), bio.copy()))
+    same_csv(tables['imbalance'], anomaly_detection.imbalance_table(enrol.copy(), demo.copy()))
+    daily = anomaly_detection.daily_activity(enrol.copy(), demo.copy(), bio.copy())
+    for expected, actual in zip(daily, tables['daily']):
+        same_csv(expected.reset_index(), actual.reset_index())
+
+
+def test_powerbi_partials_match_the_cleaned_rows():
+    enrol, demo, bio = cleaned_frames()
+    partials = fact_table.powerbi_partials(fact_table.build_fact_table(enrol, demo, bio))
+    frames = prepare_powerbi_data.prepare_frames(bio, demo, enrol)
+    same_csv(prepare_powerbi_data.build_state_summary(*partials['state_date']),
+             prepare_powerbi_data.build_state_summary(*frames))
+    same_csv(prepare_powerbi_data.build_district_summary(*partials['district']),
+             prepare_powerbi_data.build_district_summary(*frames))
+    same_csv(prepare_powerbi_data.build_pincode_prefix_summary(*partials['pincode']),
+             prepare_powerbi_data.build_pincode_prefix_summary(*frames))
+
+
+def test_load_current_ignores_a_stale_table(tmp_path):
+    path = fact_table.build_fact_table(*cleaned_frames(rows=50)).save(tmp_path / 'facts.pkl')
+    assert fact_table.load_current(path, tmp_path) is not None
+
+    source = tmp_path / 'biometric_cleaned.csv'
+    source.write_text('date\n')
+    built = path.stat().st_mtime
+    os.utime(source, (built + 10, built + 10))
+    assert fact_table.load_current(path, tmp_path) is None
+    assert fact_table.load_current(tmp_path / 'missing.pkl', tmp_path) is None
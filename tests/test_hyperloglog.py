@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import hyperloglog
+
+
+def pincode_frame(n, start=0):
+    return pd.DataFrame({'state': 'Bihar', 'date': '01-10-2025', 'pincode': np.arange(start, start + n)})
+
+
+def test_estimates_within_error_bound():
+    bound = 4 * hyperloglog.relative_error()
+    for n in (50, 2_000, 50_000):
+        sketches = hyperloglog.SketchTable.from_frame(pincode_frame(n), ['state', 'date'])
+        (estimate,) = hyperloglog.estimate(sketches.registers)
+        assert abs(estimate - n) <= bound * n
+
+
+def test_merge_matches_sketch_of_union():
+    left = hyperloglog.SketchTable.from_frame(pincode_frame(3_000), ['state', 'date'])
+    right = hyperloglog.SketchTable.from_frame(pincode_frame(3_000, start=1_500), ['state', 'date'])
+    whole = hyperloglog.SketchTable.from_frame(pincode_frame(4_500), ['state', 'date'])
+    assert np.array_equal(left.merge(right).registers, whole.registers)
+
+
+def test_blocked_estimate_matches_single_block():
+    registers = np.random.default_rng(0).integers(0, 12, (300, 1024)).astype(np.uint8)
+    registers[:50] = 0
+    assert np.array_equal(hyperloglog.estimate(registers, block_rows=7),
+                          hyperloglog.estimate(registers, block_rows=len(registers)))
+
+
+def test_stale_sketches_are_rebuilt_from_frames(tmp_path):
+    path = tmp_path / 'coverage_sketches.npz'
+    old = pincode_frame(10)
+    hyperloglog.build_coverage_sketches(old, old, old).save(path)
+    csv = tmp_path / 'enrolment_cleaned.csv'
+    csv.write_text('appended by the watcher\n')
+    os.utime(csv, (path.stat().st_mtime + 10,) * 2)
+
+    assert hyperloglog.load_current(path, tmp_path) is None
+    new = pincode_frame(200)
+    sketches = hyperloglog.load_or_build(new, new, new, path=path, data_dir=tmp_path)
+    counts = sketches.estimates('pincodes')['pincodes']
+    assert (counts > 150).all()
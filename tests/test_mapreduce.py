@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+import anomaly_detection
+import data_cleaning_sync
+import mapreduce
+import prepare_powerbi_data
+
+COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+
+
+def cleaned_frames(rows=2_000, seed=1):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-09-01', periods=20).strftime('%d-%m-%Y')
+    pincodes = rng.choice(np.arange(110000, 860000), 150, replace=False)
+    frames = {}
+    for name, columns in COLUMNS.items():
+        df = pd.DataFrame({'date': rng.choice(dates, rows),
+                           'state': rng.choice(['Bihar', 'Kerala', 'West  Bengal', 'Orissa'], rows),
+                           'district': rng.choice(['Purnea', 'Purnia', 'North', 'Howrah'], rows),
+                           'pincode': rng.choice(pincodes, rows)})
+        for column in columns:
+            df[column] = rng.integers(0, 30, rows)
+        frames[name] = df
+    return frames['enrolment'], frames['demographic'], frames['biometric']
+
+
+def same_csv(a: pd.DataFrame, b: pd.DataFrame):
+    assert a.to_csv(index=False) == b.to_csv(index=False)
+
+
+def test_shard_of_is_stable_across_key_types():
+    ints = mapreduce.shard_of([110001, 560034, 400001], 8)
+    assert (mapreduce.shard_of(['110001', '560034', '400001'], 8) == ints).all()
+    assert (mapreduce.shard_of([110001.0, 560034.0, 400001.0], 8) == ints).all()
+
+
+def test_sharded_sync_matches_single_process(tmp_path):
+    enrol, demo, bio = cleaned_frames()
+    # Drop some pincodes and a date from one dataset so the filter has work to do
+    demo = demo[(demo['pincode'] % 7 != 0) & (demo['date'] != '05-09-2025')]
+    single = data_cleaning_sync.synchronize_datasets(enrol.copy(), demo.copy(), bio.copy())
+    sharded = mapreduce.synchronize_sharded(enrol, demo, bio, shards=4, workers=1, directory=tmp_path)
+    for expected, actual in zip(single[:3], sharded[:3]):
+        pd.testing.assert_frame_equal(expected, actual)
+    assert single[3:] == sharded[3:]
+
+
+def test_sharded_anomaly_tables_match_single_process(tmp_path):
+    enrol, demo, bio = cleaned_frames()
+    tables = mapreduce.anomaly_tables(enrol, demo, bio, shards=4, workers=1, directory=tmp_path)
+    same_csv(tables['misuse'], anomaly_detection.misuse_table(enrol.copy(), bio.copy()))
+    same_csv(tables['imbalance'], anomaly_detection.imbalance_table(enrol.copy(), demo.copy()))
+    daily = anomaly_detection.daily_activity(enrol.copy(), demo.copy(), bio.copy())
+    for expected, actual in zip(daily, tables['daily']):
+        same_csv(expected.reset_index(), actual.reset_index())
+
+
+def test_sharded_powerbi_partials_give_the_same_summaries(tmp_path):
+    enrol, demo, bio = cleaned_frames()
+    partials = mapreduce.powerbi_partials(bio, demo, enrol, shards=4, workers=1, directory=tmp_path)
+    frames = prepare_powerbi_data.prepare_frames(bio, demo, enrol)
+    builders = {'state_date': [prepare_powerbi_data.build_daily_national_summary,
+                               prepare_powerbi_data.build_state_summary,
+                               prepare_powerbi_data.build_state_date_trends],
+                'district': [prepare_powerbi_data.build_district_summary],
+                'pincode': [prepare_powerbi_data.build_pincode_prefix_summary]}
+    for key, functions in builders.items():
+        for build in functions:
+            same_csv(build(*partials[key]), build(*frames))
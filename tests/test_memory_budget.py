@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import memory_budget
+import pincode_hierarchy
+import prepare_powerbi_data
+from instrumentation import _RssProbe
+
+COLUMNS = {
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+}
+
+
+def write_cleaned(data_dir, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-09-01', periods=60).strftime('%d-%m-%Y')
+    pincodes = rng.choice(np.arange(110000, 860000), 5_000, replace=False)
+    for name, columns in COLUMNS.items():
+        df = pd.DataFrame({'date': rng.choice(dates, rows),
+                           'state': rng.choice(['Bihar', 'Kerala', 'Goa'], rows),
+                           'district': rng.choice(['North', 'South'], rows),
+                           'pincode': rng.choice(pincodes, rows)})
+        for column in columns:
+            df[column] = rng.integers(0, 30, rows)
+        df.to_csv(data_dir / f'{name}_cleaned.csv', index=False)
+
+
+def test_parse_size():
+    assert memory_budget.parse_size('512M') == 512 * 2 ** 20
+    assert memory_budget.parse_size('1.5g') == int(1.5 * 2 ** 30)
+    assert memory_budget.parse_size('800MB') == 800 * 2 ** 20
+    with pytest.raises(ValueError):
+        memory_budget.parse_size('lots')
+
+
+def test_spilling_aggregator_matches_groupby(tmp_path):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({'pincode': rng.integers(0, 500, 20_000), 'count': rng.integers(0, 9, 20_000)})
+    aggregator = memory_budget.SpillingAggregator(['pincode'], ['count'], limit=8_000, buckets=4,
+                                                  directory=tmp_path / 'spill')
+    for start in range(0, len(df), 1_000):
+        aggregator.add(df.iloc[start:start + 1_000])
+    assert aggregator.spilled
+
+    expected = df.groupby('pincode', as_index=False)['count'].sum()
+    result = aggregator.result().sort_values('pincode').reset_index(drop=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    buckets = pd.concat([aggregator.bucket(b) for b in range(4)]).sort_values('pincode')
+    pd.testing.assert_frame_equal(buckets.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_budget_falls_back_to_minimum_chunks_when_no_headroom():
+    budget = memory_budget.MemoryBudget('1M')
+    assert budget.available == memory_budget.MIN_AVAILABLE
+    assert budget.chunk_rows(10_000) == memory_budget.MIN_CHUNK_ROWS
+
+
+def test_powerbi_partials_stay_within_budget(tmp_path):
+    probe = _RssProbe()
+    if not probe.resettable:
+        pytest.skip("per-stage peak RSS needs a resettable VmHWM (Linux)")
+    write_cleaned(tmp_path, 300_000)
+    budget = memory_budget.MemoryBudget(int(probe.current() * 2 ** 20) + 48 * 2 ** 20)
+    budget.start_stage()
+    partials = memory_budget.powerbi_partials(budget, data_dir=tmp_path, directory=tmp_path / 'spill')
+    assert probe.peak() * 2 ** 20 <= budget.limit
+
+    frames = prepare_powerbi_data.prepare_frames(
+        *(pd.read_csv(tmp_path / f'{name}_cleaned.csv') for name in ('biometric', 'demographic', 'enrolment')))
+    expected = pincode_hierarchy.build_prefix_rollups(*frames)
+    actual = pincode_hierarchy.build_prefix_rollups(None, None, None, totals=partials['prefix_totals'])
+    pd.testing.assert_frame_equal(actual, expected)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+import misuse_score
+
+
+def brute_force_top(scores, k):
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))[:k]
+    return [(i, float(scores[i])) for i in order]
+
+
+def test_top_k_heap_follows_score_updates():
+    rng = np.random.default_rng(7)
+    # Few distinct values, so ties between positions are common
+    scores = rng.integers(0, 20, 200).astype(float)
+    top = misuse_score.TopK(10)
+    top.reselect(scores)
+    assert top.ranked() == brute_force_top(scores, 10)
+
+    for _ in range(300):
+        changed = np.unique(rng.integers(0, len(scores), rng.integers(1, 15)))
+        scores[changed] = np.maximum(scores[changed] + rng.integers(-6, 7, len(changed)), 0)
+        top.update(scores, changed)
+        assert top.ranked() == brute_force_top(scores, 10)
+
+
+def test_top_k_with_fewer_positions_than_k():
+    top = misuse_score.TopK(5)
+    top.reselect(np.array([1.0, 3.0]))
+    top.update(np.array([1.0, 3.0, 2.0]), [2])
+    assert top.ranked() == [(1, 3.0), (2, 2.0), (0, 1.0)]
+
+
+def activity_frames(seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-03-01', periods=120).strftime('%d-%m-%Y')
+    n = 600
+    enrol = pd.DataFrame({'date': rng.choice(dates, n), 'pincode': rng.integers(100000, 100030, n),
+                          'age_0_5': rng.integers(0, 5, n), 'age_5_17': rng.integers(0, 5, n),
+                          'age_18_greater': rng.integers(0, 5, n)})
+    bio = pd.DataFrame({'date': rng.choice(dates, n), 'pincode': rng.integers(100000, 100030, n),
+                        'bio_age_5_17': rng.integers(0, 5, n), 'bio_age_17_': rng.integers(0, 5, n)})
+    return enrol, bio
+
+
+def window_sum(df, columns, end, days):
+    dates = pd.to_datetime(df['date'], format='%d-%m-%Y')
+    inside = (dates > end - pd.Timedelta(days=days)) & (dates <= end)
+    return df[inside].groupby('pincode')[columns].sum().sum(axis=1)
+
+
+def test_score_history_matches_brute_force_windows():
+    enrol, bio = activity_frames()
+    scorer = misuse_score.score_history(enrol, bio, k=5)
+    table = scorer.score_table().set_index('pincode')
+    end = scorer.last_date
+
+    for w in misuse_score.WINDOWS:
+        e = window_sum(enrol, ['age_0_5', 'age_5_17', 'age_18_greater'], end, w)
+        b = window_sum(bio, ['bio_age_5_17', 'bio_age_17_'], end, w)
+        e, b = e.reindex(table.index, fill_value=0), b.reindex(table.index, fill_value=0)
+        assert (table[f'enrolment_{w}d'] == e).all()
+        assert (table[f'biometric_{w}d'] == b).all()
+        expected = pd.Series(misuse_score.misuse_score(e, b), index=table.index)
+        np.testing.assert_allclose(table[f'score_{w}d'], expected.round(3))
+
+        top = scorer.top_table().query('window_days == @w')
+        brute = expected.sort_values(ascending=False, kind='stable').round(3).head(5)
+        assert list(top['score']) == list(brute)
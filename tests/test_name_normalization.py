@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+import name_normalization
+
+
+def frame_with_missing_districts():
+    return pd.DataFrame({
+        'state': ['Bihar', 'Kerala', 'Kerala', 'Bihar', np.nan, 'Kerala'],
+        'district': ['Patna', np.nan, 'Ernakulam', np.nan, 'Patna', 'Ernakulam'],
+    })
+
+
+def test_missing_districts_keep_their_state():
+    df = frame_with_missing_districts()
+    (out,) = name_normalization.normalize_frames(df, region_col='region')
+    assert list(out['state'].fillna('-')) == ['Bihar', 'Kerala', 'Kerala', 'Bihar', '-', 'Kerala']
+    assert list(out['district'].fillna('-')) == ['Patna', '-', 'Ernakulam', '-', 'Patna', 'Ernakulam']
+    assert list(out['region'].fillna('-')) == ['BIHAR - PATNA', '-', 'KERALA - ERNAKULAM', '-', '-',
+                                               'KERALA - ERNAKULAM']
+
+
+def test_name_counts_separate_missing_districts_by_state():
+    counts = name_normalization.name_counts(frame_with_missing_districts())
+    assert counts == {('Bihar', 'Patna'): 1, ('Bihar', None): 1, ('Kerala', None): 1,
+                      ('Kerala', 'Ernakulam'): 2, (None, 'Patna'): 1}
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+import ranking_index
+
+
+def tied_table():
+    return pd.DataFrame({'region': list('abcdefgh'),
+                         'total_activity': [1, 2, 2, 2, 3, np.nan, 2, 3]})
+
+
+def test_top_k_matches_stable_descending_sort():
+    df = tied_table()
+    index = ranking_index.RankingIndex.build(df, ['total_activity'])
+    expected = df.sort_values('total_activity', ascending=False, kind='stable').dropna()
+    for k in range(1, len(expected) + 1):
+        assert list(index.top_k('total_activity', k)['region']) == list(expected['region'][:k])
+
+
+def test_bottom_k_matches_stable_ascending_sort():
+    df = tied_table()
+    index = ranking_index.RankingIndex.build(df, ['total_activity'])
+    expected = df.sort_values('total_activity', kind='stable').dropna()
+    for k in range(1, len(expected) + 1):
+        assert list(index.bottom_k('total_activity', k)['region']) == list(expected['region'][:k])
+
+
+def test_saved_index_keeps_descending_order(tmp_path):
+    df = tied_table()
+    path = tmp_path / 'ranking_index.npz'
+    ranking_index.save_indexes(ranking_index.build_indexes({'state_summary.csv': df}), path)
+    index = ranking_index.get_index('state_summary.csv', df, path)
+    expected = df.sort_values('total_activity', ascending=False, kind='stable')
+    assert list(index.top_k('total_activity', 7)['region']) == list(expected['region'][:7])
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+import region_correlation
+
+
+def test_batched_matrices_match_per_region_corrcoef():
+    rng = np.random.default_rng(11)
+    series = rng.poisson(3.0, (20, 40, 3)).astype(float)
+    series[4, :, 1] = 7.0                      # flat demographic series
+    series[9] = 0.0                            # no activity at all
+
+    corr = region_correlation.correlation_matrices(series)
+    for r in range(len(series)):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            expected = np.corrcoef(series[r].T)
+        flat = series[r].std(axis=0) == 0
+        expected[flat, :] = expected[:, flat] = np.nan
+        np.testing.assert_allclose(corr[r], expected, atol=1e-12)
+
+
+def daily_frames(seed=5):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-06-01', periods=30).strftime('%d-%m-%Y')
+    frames = []
+    for columns in region_correlation.SERIES_COLUMNS.values():
+        n = 500
+        df = pd.DataFrame({'date': rng.choice(dates, n), 'pincode': rng.integers(400001, 400012, n)})
+        for column in columns:
+            df[column] = rng.integers(0, 6, n)
+        frames.append(df)
+    return frames
+
+
+def test_chunked_region_correlations_match_pandas():
+    enrol, demo, bio = daily_frames()
+    table = region_correlation.region_correlations(enrol, demo, bio, 'pincode', chunk_size=4)
+
+    series = {}
+    for name, df in zip(region_correlation.SERIES_COLUMNS, (enrol, demo, bio)):
+        totals = df[region_correlation.SERIES_COLUMNS[name]].sum(axis=1)
+        dates = pd.to_datetime(df['date'], format='%d-%m-%Y')
+        series[name] = totals.groupby([df['pincode'].astype(str), dates]).sum().unstack(fill_value=0)
+    all_dates = sorted(set().union(*(s.columns for s in series.values())))
+    series = {name: s.reindex(columns=all_dates, fill_value=0) for name, s in series.items()}
+
+    for _, row in table.iterrows():
+        for a, b in region_correlation.PAIRS:
+            expected = np.corrcoef(series[a].loc[row['region']], series[b].loc[row['region']])[0, 1]
+            assert np.isclose(row[f'corr_{a}_{b}'], expected)
+        assert row['enrolment'] == series['enrol'].loc[row['region']].sum()
+
+
+def test_decoupling_ranks_unranks_short_and_flat_regions():
+    correlations = pd.DataFrame({'region': ['a', 'b', 'c', 'd'],
+                                 'corr_enrol_demo': [0.9, -0.5, np.nan, 0.1],
+                                 'corr_enrol_bio': [0.7, -0.1, 0.2, 0.1],
+                                 'corr_demo_bio': [0.5, 0.5, 0.5, 0.5],
+                                 'active_days': [20, 20, 20, 3],
+                                 'enrolment': 1, 'demographic': 1, 'biometric': 1})
+    ranked = region_correlation.decoupling_table(correlations, min_active_days=10)
+    assert list(ranked['region']) == ['b', 'a']
+    assert list(ranked['decoupling']) == [1.3, 0.2]
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import region_variance
+
+
+def activity(n_rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-09-01', periods=40).strftime('%d-%m-%Y')
+    return pd.DataFrame({
+        'date': rng.choice(dates, n_rows),
+        'state': rng.choice(['Bihar', 'Kerala'], n_rows),
+        'district': rng.choice(['North', 'South', 'East'], n_rows),
+        'pincode': rng.integers(800000, 800050, n_rows),
+        'count_a': rng.integers(0, 50, n_rows),
+        'count_b': rng.integers(0, 50, n_rows),
+    })
+
+
+def frames(seed=0):
+    df = activity(seed=seed)
+    return (df.rename(columns={'count_a': 'age_0_5', 'count_b': 'age_18_greater'}),
+            df.rename(columns={'count_a': 'demo_age_5_17', 'count_b': 'demo_age_17_'}),
+            df.rename(columns={'count_a': 'bio_age_5_17', 'count_b': 'bio_age_17_'}))
+
+
+def test_moments_merge_matches_direct_computation():
+    rng = np.random.default_rng(1)
+    keys = rng.choice(list('abc'), 500)
+    values = rng.normal(100, 30, 500)
+    merged = (region_variance.Moments.from_values(keys[:180], values[:180])
+              .merge(region_variance.Moments.from_values(keys[180:], values[180:])))
+    direct = pd.Series(values).groupby(keys)
+    assert np.allclose(merged.stats['mean'], direct.mean())
+    assert np.allclose(merged.std(), direct.std())
+
+
+def test_daily_totals_over_row_chunks_match_accumulate():
+    enrolment, demographic, biometric = frames()
+    daily = region_variance.DailyTotals()
+    daily.COMPACT_EVERY = 3
+    for dataset, df in (('enrol', enrolment), ('demo', demographic), ('bio', biometric)):
+        for start in range(0, len(df), 70):  # chunks split days across several pieces
+            daily.add(dataset, df.iloc[start:start + 70])
+    expected = region_variance.accumulate(enrolment, demographic, biometric).to_frame()
+    pd.testing.assert_frame_equal(daily.variance().to_frame(), expected)
+
+
+def test_days_cannot_be_accumulated_twice():
+    enrolment, demographic, biometric = frames()
+    variance = region_variance.RegionVariance().update(enrolment, demographic, biometric)
+    with pytest.raises(ValueError):
+        variance.update(enrolment, demographic, biometric)
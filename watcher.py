@@ -0,0 +1,392 @@
+"""
+Drop-Directory Watcher for Incremental Anomaly Updates
+======================================================
+Polls the ``api_data_aadhar_*`` folders and ingests every new raw chunk
+(.csv, .csv.gz, .csv.zst) as soon as it has finished landing (its size is
+unchanged across two polls):
+
+1. validate the chunk and append failures to quarantine.csv
+2. update the per-dataset date/pincode sets and the common sets; rows
+   (from any dataset) whose keys just became common are pulled in too
+3. append the newly cleaned rows to the cleaned CSVs
+4. update the per-pincode and per-date aggregates with those rows
+5. re-evaluate the misuse, imbalance and mass-registration flags for the
+   touched pincodes and dates only, and append raised/cleared alerts to
+   cleaned_data/alerts/alert_deltas.csv (current state: active_alerts.csv)
+
+Thresholds (percentiles, z-score bands) are recomputed from the aggregate
+tables on every update, which is cheap. A pincode or date whose metric a
+threshold has just moved across counts as touched too, so the active
+alerts always match what anomaly_detection.py would flag.
+
+On start the chunks processed before (listed in alerts/processed_chunks.txt;
+on the first run, every chunk on disk) are loaded to rebuild the in-memory
+state, and chunks that landed while the watcher was down are then ingested
+like new ones. Flags are reconciled with the persisted active alerts, so a
+restart reports only what changed.
+
+Usage:
+    python watcher.py                 # poll every 2 seconds
+    python watcher.py --once          # process what is new, then exit
+"""
+
+import argparse
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import anomaly_detection
+import data_cleaning_sync as sync
+import data_validation
+import raw_chunks
+
+DATA_DIR = sync.OUTPUT_DIR
+ALERT_DIR = DATA_DIR / "alerts"
+POLL_SECONDS = 2.0
+
+SOURCE_DIRS = {
+    'enrolment': sync.ENROLMENT_DIR,
+    'demographic': sync.DEMOGRAPHIC_DIR,
+    'biometric': sync.BIOMETRIC_DIR,
+}
+CLEANED_FILES = {name: f"{name}_cleaned.csv" for name in SOURCE_DIRS}
+
+ALERT_COLUMNS = ['pattern', 'key', 'state', 'district', 'metric', 'value', 'threshold']
+DELTA_COLUMNS = ['detected_at', 'source', 'change'] + ALERT_COLUMNS
+
+
+def _in(values: pd.Series, keys: set) -> np.ndarray:
+    return values.isin(keys).to_numpy() if keys else np.zeros(len(values), dtype=bool)
+
+
+def _between(values: pd.Series, old, new) -> np.ndarray:
+    """Values a threshold moved across when it went from ``old`` to ``new``."""
+    if old is None or pd.isna(old) or pd.isna(new) or old == new:
+        return np.zeros(len(values), dtype=bool)
+    return values.between(min(old, new), max(old, new)).to_numpy()
+
+
+def _alert_ids(alerts: pd.DataFrame) -> pd.Series:
+    return alerts['pattern'] + '|' + alerts['key'].astype(str)
+
+
+class IncrementalState:
+    """Raw rows, common key sets and the aggregates behind the three patterns."""
+
+    def __init__(self):
+        self.raw = {name: [] for name in SOURCE_DIRS}
+        self.dates = {name: set() for name in SOURCE_DIRS}
+        self.pincodes = {name: set() for name in SOURCE_DIRS}
+        self.common_dates = set()
+        self.common_pincodes = set()
+        self.by_pincode = pd.DataFrame(
+            {col: pd.Series(dtype=float) for col in
+             ['enrolment_count', 'child_enrolment', 'biometric_update_count',
+              'adult_demographic_count']})
+        self.pincode_names = pd.DataFrame({'state': pd.Series(dtype=object),
+                                           'district': pd.Series(dtype=object)})
+        self.daily = pd.DataFrame({name: pd.Series(dtype=float) for name in SOURCE_DIRS})
+        self.thresholds = {}
+
+    def ingest(self, name: str, df: pd.DataFrame):
+        """
+        Add validated, standardized rows of one dataset.
+        Returns (newly cleaned rows per dataset, touched pincodes, touched dates).
+        """
+        old_dates, old_pincodes = self.common_dates, self.common_pincodes
+        self.dates[name] |= set(df[sync.DATE_COL].unique())
+        self.pincodes[name] |= set(df[sync.PINCODE_COL].unique())
+        self.common_dates = set.intersection(*self.dates.values())
+        self.common_pincodes = set.intersection(*self.pincodes.values())
+        new_dates = self.common_dates - old_dates
+        new_pincodes = self.common_pincodes - old_pincodes
+
+        added = {}
+        for dataset in SOURCE_DIRS:
+            parts = []
+            if new_dates or new_pincodes:
+                # Earlier rows whose date or pincode has just become common
+                for old in self.raw[dataset]:
+                    dates, pins = old[sync.DATE_COL], old[sync.PINCODE_COL]
+                    mask = ((_in(pins, new_pincodes) & _in(dates, self.common_dates))
+                            | (_in(dates, new_dates) & _in(pins, self.common_pincodes)))
+                    parts.append(old[mask])
+            if dataset == name:
+                parts.append(df[_in(df[sync.DATE_COL], self.common_dates)
+                                & _in(df[sync.PINCODE_COL], self.common_pincodes)])
+            added[dataset] = pd.concat(parts, ignore_index=True) if parts else self._empty(dataset)
+        self.raw[name].append(df)
+
+        touched_pincodes, touched_dates = set(), set()
+        for rows in added.values():
+            touched_pincodes |= set(rows[sync.PINCODE_COL].unique())
+            touched_dates |= set(rows[sync.DATE_COL].unique())
+        self._aggregate(added)
+        return added, touched_pincodes, touched_dates
+
+    def _empty(self, dataset):
+        if self.raw[dataset]:
+            return self.raw[dataset][0].iloc[:0]
+        return pd.DataFrame({col: pd.Series(dtype='int64') for col in
+                             ['date', 'state', 'district', 'pincode']
+                             + data_validation.COUNT_COLUMNS[dataset]})
+
+    def _aggregate(self, added: dict):
+        enrol, demo, bio = added['enrolment'], added['demographic'], added['biometric']
+        partial = pd.DataFrame({
+            'enrolment_count': (enrol['age_0_5'] + enrol['age_5_17'] + enrol['age_18_greater'])
+                               .groupby(enrol['pincode']).sum(),
+            'child_enrolment': (enrol['age_0_5'] + enrol['age_5_17']).groupby(enrol['pincode']).sum(),
+            'biometric_update_count': (bio['bio_age_5_17'] + bio['bio_age_17_'])
+                                      .groupby(bio['pincode']).sum(),
+            'adult_demographic_count': demo['demo_age_17_'].groupby(demo['pincode']).sum(),
+        }).fillna(0)
+        self.by_pincode = self.by_pincode.add(partial, fill_value=0)
+
+        names = enrol.groupby('pincode')[['state', 'district']].first()
+        names = names[~names.index.isin(self.pincode_names.index)]
+        if len(names):
+            self.pincode_names = pd.concat([self.pincode_names, names])
+
+        totals = pd.DataFrame({
+            'enrolment': (enrol['age_0_5'] + enrol['age_5_17'] + enrol['age_18_greater'])
+                         .groupby(enrol['date']).sum(),
+            'demographic': (demo['demo_age_5_17'] + demo['demo_age_17_']).groupby(demo['date']).sum(),
+            'biometric': (bio['bio_age_5_17'] + bio['bio_age_17_']).groupby(bio['date']).sum(),
+        })
+        self.daily = self.daily.add(totals, fill_value=0)
+
+    def evaluate(self, pincodes=None, dates=None):
+        """
+        Alerts among the given pincodes and dates (all when None), with
+        thresholds computed over every pincode and date. Keys whose metric
+        a threshold has just moved across are re-evaluated as well, so the
+        result matches a full run. Returns (alerts, pincode scope, date
+        scope); a scope of None means everything was evaluated.
+        """
+        alerts = []
+        previous, self.thresholds = self.thresholds, {}
+        table = self.by_pincode.join(self.pincode_names)
+        if len(table):
+            table.index.name = 'pincode'
+            merged = table.reset_index()
+            merged['biometric_rate'] = np.where(
+                merged['enrolment_count'] > 0,
+                merged['biometric_update_count'] / merged['enrolment_count'] * 100, 0)
+
+            high_enrol, low_bio = anomaly_detection.misuse_thresholds(merged)
+            high_adult, low_child = anomaly_detection.imbalance_thresholds(merged)
+            self.thresholds.update({'enrolment_count': high_enrol, 'biometric_rate': low_bio,
+                                    'adult_demographic_count': high_adult,
+                                    'child_enrolment': low_child})
+            if pincodes is not None:
+                crossed = np.zeros(len(merged), dtype=bool)
+                for metric, value in self.thresholds.items():
+                    crossed |= _between(merged[metric], previous.get(metric), value)
+                pincodes = set(pincodes) | set(merged.loc[crossed, 'pincode'])
+            scope = merged['pincode'].isin(pincodes) if pincodes is not None else True
+
+            misuse = merged[anomaly_detection.is_misuse(merged, high_enrol, low_bio) & scope]
+            alerts.append(pd.DataFrame({
+                'pattern': 'misuse', 'key': misuse['pincode'].astype(str),
+                'state': misuse['state'], 'district': misuse['district'],
+                'metric': 'biometric_rate', 'value': misuse['biometric_rate'].round(2),
+                'threshold': round(low_bio, 2)}))
+
+            imbalanced = merged[anomaly_detection.is_imbalanced(merged, high_adult, low_child) & scope]
+            alerts.append(pd.DataFrame({
+                'pattern': 'imbalance', 'key': imbalanced['pincode'].astype(str),
+                'state': imbalanced['state'], 'district': imbalanced['district'],
+                'metric': 'child_enrolment', 'value': imbalanced['child_enrolment'],
+                'threshold': low_child}))
+
+        daily = self.daily.dropna()
+        if len(daily) > 1:
+            mean, std = daily.mean(), daily.std(ddof=0)
+            bands = {'lower': mean - anomaly_detection.SPIKE_THRESHOLD * std,
+                     'upper': mean + anomaly_detection.SPIKE_THRESHOLD * std}
+            if dates is not None:
+                crossed = np.zeros(len(daily), dtype=bool)
+                for side, band in bands.items():
+                    for name in daily.columns:
+                        crossed |= _between(daily[name], previous.get((side, name)), band[name])
+                dates = set(dates) | set(daily.index[crossed])
+            self.thresholds.update({(side, name): band[name]
+                                    for side, band in bands.items() for name in daily.columns})
+
+            z = ((daily - mean) / std).abs()
+            spikes = daily[(z > anomaly_detection.SPIKE_THRESHOLD).all(axis=1)]
+            if dates is not None:
+                spikes = spikes[spikes.index.isin(dates)]
+            alerts.append(pd.DataFrame({
+                'pattern': 'mass_registration', 'key': spikes.index.astype(str),
+                'state': None, 'district': None, 'metric': 'total_activity',
+                'value': spikes.sum(axis=1).to_numpy(), 'threshold': np.nan}))
+
+        alerts = [a for a in alerts if len(a)]
+        alerts = (pd.concat(alerts, ignore_index=True)[ALERT_COLUMNS] if alerts
+                  else pd.DataFrame(columns=ALERT_COLUMNS))
+        return alerts, pincodes, dates
+
+
+class Watcher:
+    """Polls the raw folders and feeds landed chunks through an IncrementalState."""
+
+    def __init__(self, data_dir: Path = DATA_DIR, alert_dir: Path = ALERT_DIR,
+                 source_dirs: dict = None):
+        self.data_dir = Path(data_dir)
+        self.alert_dir = Path(alert_dir)
+        self.source_dirs = source_dirs or SOURCE_DIRS
+        self.state = IncrementalState()
+        self.seen = set()
+        self.pending = {}
+        self.active = pd.DataFrame(columns=ALERT_COLUMNS)
+
+    def scan(self) -> dict:
+        """Chunk path -> (dataset, size) for every raw chunk on disk."""
+        found = {}
+        for name, directory in self.source_dirs.items():
+            for path in raw_chunks.find_chunks(directory):
+                found[path] = (name, path.stat().st_size)
+        return found
+
+    def _load(self, name, path, quarantine=True):
+        df = raw_chunks.read_chunk(path)
+        valid, quarantined, _ = data_validation.validate_dataset(df, name)
+        if quarantine and len(quarantined):
+            quarantine = self.data_dir / "quarantine.csv"
+            quarantined.to_csv(quarantine, mode='a', header=not quarantine.exists(), index=False)
+        valid = sync.standardize_date(valid, sync.DATE_COL)
+        return sync.standardize_pincode(valid, sync.PINCODE_COL)
+
+    def bootstrap(self):
+        """
+        Rebuild the state from the chunks processed before (all chunks on
+        disk on the very first run) and reconcile the active alerts. Chunks
+        that arrived while the watcher was down are left for ``poll``.
+        """
+        started = time.perf_counter()
+        files = self.scan()
+        processed_path = self.alert_dir / "processed_chunks.txt"
+        if processed_path.exists():
+            known = set(processed_path.read_text().split())
+            files = {p: f for p, f in files.items() if p.name in known}
+        self.seen = set(files)
+        added = {}
+        for name in self.source_dirs:
+            paths = sorted(p for p, (n, _) in files.items() if n == name)
+            if paths:
+                frame = pd.concat([self._load(name, p, quarantine=False) for p in paths],
+                                  ignore_index=True)
+                rows, _, _ = self.state.ingest(name, frame)
+                for dataset, part in rows.items():
+                    added.setdefault(dataset, []).append(part)
+
+        if any(not (self.data_dir / f).exists() for f in CLEANED_FILES.values()):
+            # No cleaned data yet: write it from the bootstrap state
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            for name, parts in added.items():
+                pd.concat(parts, ignore_index=True).to_csv(self.data_dir / CLEANED_FILES[name], index=False)
+
+        active_path = self.alert_dir / "active_alerts.csv"
+        if active_path.exists():
+            self.active = pd.read_csv(active_path, dtype={'key': str})
+        self._publish(*self.state.evaluate(), 'startup')
+        self._record_processed()
+        print(f"  Bootstrapped from {len(files)} chunk(s): {len(self.state.common_pincodes):,} pincodes, "
+              f"{len(self.state.common_dates):,} dates, {len(self.active):,} active alerts "
+              f"({time.perf_counter() - started:.1f}s)")
+
+    def _record_processed(self):
+        self.alert_dir.mkdir(parents=True, exist_ok=True)
+        (self.alert_dir / "processed_chunks.txt").write_text(
+            ''.join(f"{p.name}\n" for p in sorted(self.seen)))
+
+    def process(self, name, path):
+        """Ingest one landed chunk and publish the alert deltas it causes."""
+        started = time.perf_counter()
+        rows, pincodes, dates = self.state.ingest(name, self._load(name, path))
+        for dataset, part in rows.items():
+            if len(part):
+                target = self.data_dir / CLEANED_FILES[dataset]
+                part.to_csv(target, mode='a', header=not target.exists(), index=False)
+        current, pincodes, dates = self.state.evaluate(pincodes, dates)
+        raised, cleared = self._publish(current, pincodes, dates, path.name)
+        self._record_processed()
+        print(f"  {path.name}: +{sum(len(p) for p in rows.values()):,} cleaned rows, "
+              f"{len(pincodes):,} pincodes / {len(dates):,} dates re-evaluated, "
+              f"{raised} raised, {cleared} cleared ({time.perf_counter() - started:.2f}s)")
+
+    def _publish(self, current, pincodes, dates, source):
+        """Diff ``current`` against the active alerts within the touched keys."""
+        active = self.active
+        in_scope = pd.Series(True, index=active.index)
+        if pincodes is not None:
+            keys = {str(p) for p in pincodes}
+            in_scope = np.where(active['pattern'] == 'mass_registration',
+                                active['key'].isin({str(d) for d in dates}), active['key'].isin(keys))
+            in_scope = pd.Series(in_scope, index=active.index)
+
+        before = active[in_scope]
+        raised = current[~_alert_ids(current).isin(_alert_ids(before))]
+        cleared = before[~_alert_ids(before).isin(_alert_ids(current))]
+        self.active = pd.concat([a for a in (active[~in_scope], current) if len(a)] or [current],
+                                ignore_index=True)
+
+        self.alert_dir.mkdir(parents=True, exist_ok=True)
+        self.active.to_csv(self.alert_dir / "active_alerts.csv", index=False)
+        deltas = pd.concat([raised.assign(change='raised'), cleared.assign(change='cleared')],
+                           ignore_index=True)
+        if len(deltas):
+            deltas['detected_at'] = datetime.now().isoformat(timespec='seconds')
+            deltas['source'] = source
+            path = self.alert_dir / "alert_deltas.csv"
+            deltas[DELTA_COLUMNS].to_csv(path, mode='a', header=not path.exists(), index=False)
+        return len(raised), len(cleared)
+
+    def poll(self):
+        """Process every chunk whose size was stable since the previous poll."""
+        for path, (name, size) in sorted(self.scan().items()):
+            if path in self.seen:
+                continue
+            if self.pending.get(path) == size:
+                del self.pending[path]
+                self.seen.add(path)
+                self.process(name, path)
+            else:
+                self.pending[path] = size
+
+    def run(self, interval=POLL_SECONDS, once=False):
+        self.bootstrap()
+        if once:
+            # Two polls so chunks that are present now count as landed
+            self.poll()
+            self.poll()
+            return
+        print(f"\nWatching {len(self.source_dirs)} folders every {interval:g}s (Ctrl+C to stop)...")
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\nStopped.")
+
+
+def main(interval=POLL_SECONDS, once=False):
+    print("=" * 70)
+    print("DROP-DIRECTORY WATCHER - INCREMENTAL ANOMALY ALERTS")
+    print("=" * 70)
+    watcher = Watcher()
+    watcher.run(interval, once)
+    return watcher
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the raw folders and raise anomaly alerts")
+    parser.add_argument('--interval', type=float, default=POLL_SECONDS, help="Seconds between polls")
+    parser.add_argument('--once', action='store_true', help="Process new chunks once and exit")
+    args = parser.parse_args()
+    main(args.interval, args.once)